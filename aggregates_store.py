@@ -0,0 +1,79 @@
+import os
+import json
+import hashlib
+from typing import Dict, Any, Callable, Optional
+
+from logger import logger
+
+
+class MonthAggregatesStore:
+    """
+    Persists the per-month category aggregates, next to a manifest with the
+    hash/mtime/size of each source file. Only new or changed month files are
+    loaded and aggregated again; the rest come from the stored aggregates.
+    """
+    def __init__(self, manifest_path: str = "tmp/aggregates_manifest.json"):
+        self.manifest_path = manifest_path
+        self.files: Dict[str, Dict[str, Any]] = self._load_manifest()
+        self._dirty = False
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)["files"]
+        except (OSError, ValueError, KeyError) as error:
+            logger.error("Error leyendo %s:%s", self.manifest_path, str(error))
+            return {}
+
+    def save(self):
+        if not self._dirty:
+            return
+
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._dirty = False
+
+    def get_or_compute(self, path: str, compute: Callable[[Dict[str, Any]], Dict[str, float]],
+                       signature: str = "", load: Callable[[bytes], Dict[str, Any]] = json.loads) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"month", "str_month", "agrupations"} for the month file.
+        `compute` receives the month data decoded by `load` and is only called when
+        the file (or the `signature` of the categorization rules) changed since the last run.
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.files.get(key)
+
+        if entry and entry["signature"] == signature \
+                and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return entry
+
+        with open(path, "rb") as f:
+            content = f.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+
+        if entry and entry["signature"] == signature and entry["sha256"] == sha256:
+            # touched but not modified
+            entry.update(mtime=stat.st_mtime, size=stat.st_size)
+            self._dirty = True
+            return entry
+
+        logger.info("Computing aggregates for %s", path)
+        month_data = load(content)
+        entry = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "sha256": sha256,
+            "signature": signature,
+            "month": month_data["month"],
+            "str_month": month_data["str_month"],
+            "agrupations": compute(month_data),
+        }
+        self.files[key] = entry
+        self._dirty = True
+        return entry
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Any, Optional
+
+from logger import logger
+
+
+class AIResponseCache:
+    """
+    On-disk cache for the Gemini responses.
+    Entries are keyed by the decrypted PDF content, the prompt and the model name,
+    so an unchanged statement never goes to the network again.
+    Only the raw response is kept: the transactions are built from it on every hit,
+    so a change in the normalization never serves rows in an old format.
+    """
+    def __init__(self, cache_dir: str = "cache/ai", max_entries: int = 200, max_age_days: int = 180):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+
+    @staticmethod
+    def build_key(pdf_content: bytes, prompt: str, model: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(pdf_content).digest())
+        digest.update(model.encode("utf-8"))
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+
+        if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+            logger.info("Cache entry expired: %s", key)
+            os.remove(path)
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as error:
+            logger.error("Error leyendo cache %s: %s", path, str(error))
+            return None
+
+        logger.info("Cache hit: %s", key)
+        return entry
+
+    def set(self, key: str, response_text: str):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            "created_at": time.time(),
+            "response_text": response_text,
+        }
+
+        # write + rename, so an interrupted run never leaves a half written entry
+        path = self._entry_path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def evict(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        now = time.time()
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                mtime = os.path.getmtime(path)
+                if now - mtime > self.max_age_seconds:
+                    os.remove(path)
+                else:
+                    entries.append((mtime, path))
+            except FileNotFoundError:
+                # already evicted by another worker
+                continue
+
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
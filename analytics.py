@@ -0,0 +1,193 @@
+import os
+import json
+import math
+from typing import List, Dict, Any, Optional
+
+from logger import logger
+
+
+# months kept per account for deltas, rolling means and percentiles
+RECENT_MONTHS = 12
+ROLLING_MONTHS = 3
+# the anomaly test needs some history of the category
+MIN_HISTORY_MONTHS = 3
+ANOMALY_P_VALUE = 0.05
+
+
+def _add(stats: Dict[str, float], value: float):
+    "Welford update: running count, mean and sum of squared deviations"
+    stats["n"] += 1
+    delta = value - stats["mean"]
+    stats["mean"] += delta / stats["n"]
+    stats["m2"] += delta * (value - stats["mean"])
+
+
+def _remove(stats: Dict[str, float], value: float):
+    if stats["n"] <= 1:
+        stats.update(n=0, mean=0.0, m2=0.0)
+        return
+    mean = (stats["n"] * stats["mean"] - value) / (stats["n"] - 1)
+    stats["m2"] = max(stats["m2"] - (value - mean) * (value - stats["mean"]), 0.0)
+    stats["mean"] = mean
+    stats["n"] -= 1
+
+
+def _without(stats: Dict[str, float], value: float) -> Dict[str, float]:
+    others = dict(stats)
+    _remove(others, value)
+    return others
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    "Linear interpolation between the closest ranks (numpy's default method)"
+    position = (len(sorted_values) - 1) * q
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class CategoryAnalytics:
+    """
+    Statistics of the monthly category series of each account (key: "{bank}_{currency}").
+    Keeps running state instead of the whole history: the count/mean/variance of every
+    category since the first month, and the agrupations of the last `recent_months` months.
+    Adding a month costs O(categories); a month already seen is only updated when its
+    agrupations changed. Months up to the last one dropped from the recent ones are not
+    revisited (their values are not kept anymore).
+    The state is persisted in `state_path` (nothing is saved if None).
+    """
+    def __init__(self, state_path: Optional[str] = "tmp/analytics_state.json", recent_months: int = RECENT_MONTHS,
+                 rolling_months: int = ROLLING_MONTHS, p_value: float = ANOMALY_P_VALUE):
+        self.state_path = state_path
+        self.recent_months = recent_months
+        self.rolling_months = rolling_months
+        self.p_value = p_value
+        self.accounts: Dict[str, Dict[str, Any]] = self._load_state()
+        self._dirty = False
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)["accounts"]
+        except (OSError, ValueError, KeyError) as error:
+            logger.error("Error leyendo %s:%s", self.state_path, str(error))
+            return {}
+
+    def save(self):
+        if not self._dirty or not self.state_path:
+            return
+
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"accounts": self.accounts}, f)
+        os.replace(tmp_path, self.state_path)
+        self._dirty = False
+
+    @staticmethod
+    def _empty_state(signature: str) -> Dict[str, Any]:
+        return {"signature": signature, "dropped": None, "categories": {}, "recent": {}}
+
+    def update(self, key: str, data: List[Dict[str, Any]], signature: str = "") -> Dict[str, Any]:
+        """
+        Adds the months of `data` ([{"period", "agrupations"}], as built by the report) to the state of `key`.
+        A new `signature` (categorization rules changed) restarts the state from `data`.
+        """
+        state = self.accounts.get(key)
+        if state is None or state["signature"] != signature:
+            if state is not None:
+                logger.info("Reglas de categorias cambiaron, reiniciando analytics de %s", key)
+            state = self.accounts[key] = self._empty_state(signature)
+            self._dirty = True
+
+        recent = state["recent"]
+        categories = state["categories"]
+        if "periods" in state:
+            # saved before "dropped" replaced the list of every month seen
+            older = [period for period in state.pop("periods") if period not in recent]
+            state["dropped"] = max(older, default=None)
+            self._dirty = True
+        # newest month dropped from `recent`
+        dropped = state["dropped"]
+
+        for entry in data:
+            period, agrupations = entry["period"], entry["agrupations"]
+            previous = recent.get(period)
+            if previous == agrupations:
+                continue
+            if previous is None and dropped is not None and period <= dropped:
+                # older than the recent months: already counted (or too old to be added)
+                continue
+
+            for category, amount in (previous or {}).items():
+                _remove(categories[category], amount)
+            for category, amount in agrupations.items():
+                _add(categories.setdefault(category, {"n": 0, "mean": 0.0, "m2": 0.0}), amount)
+
+            recent[period] = dict(agrupations)
+            self._dirty = True
+
+        # oldest first, so the last one deleted is the newest dropped month
+        for period in sorted(recent)[:-self.recent_months]:
+            del recent[period]
+            state["dropped"] = period
+        return state
+
+    def analyze(self, key: str, period: str) -> Dict[str, Dict[str, Any]]:
+        """
+        {category: {"amount", "previous", "delta", "delta_pct", "rolling_mean", "p50", "p90",
+        "percentile", "p_value", "anomaly"}} of the `period` month of `key`.
+        The month is compared (Student t prediction interval) with every other month of the
+        category: it is an anomaly when the two-sided p-value is below `p_value`.
+        """
+        state = self.accounts[key]
+        recent = state["recent"]
+        history = sorted(recent_period for recent_period in recent if recent_period <= period)
+        current = recent[period]
+        previous = recent[history[-2]] if len(history) > 1 else None
+        rolling = history[-self.rolling_months:]
+
+        t_values = {}
+        degrees = {}
+        for category, amount in current.items():
+            others = _without(state["categories"][category], amount)
+            if others["n"] >= MIN_HISTORY_MONTHS and others["m2"] > 0:
+                std = math.sqrt(others["m2"] / (others["n"] - 1))
+                t_values[category] = (amount - others["mean"]) / (std * math.sqrt(1 + 1 / others["n"]))
+                degrees[category] = others["n"] - 1
+
+        p_values = {}
+        if t_values:
+            from scipy.special import stdtr
+
+            tested = list(t_values)
+            two_sided = 2 * stdtr([degrees[category] for category in tested],
+                                  [-abs(t_values[category]) for category in tested])
+            p_values = dict(zip(tested, two_sided.tolist()))
+
+        result = {}
+        for category, amount in current.items():
+            previous_amount = previous.get(category) if previous else None
+            delta = amount - previous_amount if previous_amount is not None else None
+            values = sorted(recent[history_period].get(category, 0.0) for history_period in history)
+            p_value = p_values.get(category)
+            result[category] = {
+                "amount": amount,
+                "previous": previous_amount,
+                "delta": delta,
+                "delta_pct": delta / abs(previous_amount) * 100 if delta is not None and previous_amount else None,
+                "rolling_mean": sum(recent[rolling_period].get(category, 0.0) for rolling_period in rolling) / len(rolling),
+                "p50": _percentile(values, 0.5),
+                "p90": _percentile(values, 0.9),
+                "percentile": sum(value <= amount for value in values) / len(values) * 100,
+                "p_value": p_value,
+                "anomaly": p_value is not None and p_value < self.p_value,
+            }
+        return result
+
+    def get_month_analytics(self, key: str, data: List[Dict[str, Any]], signature: str = "") -> Dict[str, Dict[str, Any]]:
+        "Updates the state with `data` and analyzes its last month"
+        self.update(key, data, signature)
+        return self.analyze(key, data[-1]["period"])
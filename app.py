@@ -1,32 +1,213 @@
 import argparse
 import os
-import glob
-from dotenv import load_dotenv
-from report_service import ReportService
-from transactions_parser import AITransactionsParserService
+import sys
+
 from logger import logger
+from metrics import metrics
+from utils import BATCH_FILE_EXTENSION
 
+# Each subcommand imports its own backends (PyPDF2, google-genai, matplotlib, numpy...)
+# inside its handler, so short runs only pay for what they use.
+# test/test_startup.py fails if one of them is imported eagerly again.
 
-def get_args():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("pdf_file", help="PDF filename (ex: santander_2025-05.pdf)")
+# same as report_service.REPORT_WINDOW_MONTHS, without importing the report backends
+DEFAULT_WINDOW = 6
+# failed emails are retried (with backoff) for up to this long before the command ends
+EMAIL_RETRY_SECONDS = 300
+
+
+def add_account_args(parser: argparse.ArgumentParser):
     parser.add_argument("--bank", default="SANTANDER", help="Bank name (default: SANTANDER)")
     parser.add_argument("--currency", default="UY$", help="Currency (default: UY$)")
-    parser.add_argument("--month", help="Month in format YYYY-MM (ej: 2025-05)")
-    parser.add_argument("--send-email", action="store_true", help="Send report by email")    
-    return parser.parse_args()
+    parser.add_argument("--db", help="SQLite database used as storage (ex: data/transactions.db)")
 
 
-def get_matching_json_files(bank: str, currency: str) -> list:
-    pattern = f"data/{bank}_*_{currency}.json"
-    matching_files = glob.glob(pattern)
-    matching_files.sort()
-    return matching_files
+def add_window_arg(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--window", type=int, default=DEFAULT_WINDOW,
+        help=f"Months of history in the report, 0 = all (default: {DEFAULT_WINDOW})"
+    )
 
 
-def main():
-    load_dotenv()
-    args = get_args()
+def add_ai_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the AI responses cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached AI responses and update the cache")
+    parser.add_argument(
+        "--pages-per-chunk", type=int,
+        help="Send long statements to the AI in chunks of N pages, extracted concurrently (default: whole PDF)"
+    )
+
+
+def get_args(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--metrics", action="store_true", help="Log the time spent in each stage (also: METRICS=1)")
+    parser.add_argument(
+        "--metrics-output", default=os.getenv("METRICS_OUTPUT"),
+        help="Also save the metrics as Prometheus text (.prom) or json (ex: tmp/metrics.prom)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parse_ai = subparsers.add_parser("parse-ai", help="Parse a bank PDF statement and generate the report")
+    parse_ai.add_argument("pdf_file", help="PDF filename (ex: santander_2025-05.pdf)")
+    add_account_args(parse_ai)
+    add_ai_args(parse_ai)
+    parse_ai.add_argument("--month", help="Month in format YYYY-MM (ej: 2025-05)")
+    parse_ai.add_argument(
+        "--parser", choices=["local", "ai"], default="local",
+        help="local: bank template, with AI fallback. ai: always use AI (default: local)"
+    )
+    parse_ai.add_argument("--skip-report", action="store_true", help="Only parse and save the transactions")
+    parse_ai.add_argument("--send-email", action="store_true", help="Send report by email")
+    add_window_arg(parse_ai)
+    parse_ai.set_defaults(func=parse_ai_main)
+
+    parse_manual = subparsers.add_parser("parse-manual", help="Parse a manual input/*.txt file")
+    parse_manual.add_argument("input_file", help="Input file (ex: input/santander_2025-04_uy$.txt)")
+    add_account_args(parse_manual)
+    parse_manual.add_argument("--month", help="Month in format YYYY-MM (default: from the filename)")
+    parse_manual.add_argument("--batch-format", action="store_true", help=f"Also save a columnar {BATCH_FILE_EXTENSION} file")
+    parse_manual.set_defaults(func=parse_manual_main)
+
+    import_input = subparsers.add_parser("import-input", help="Import every input/*.txt file into SQLite")
+    import_input.add_argument("--input-dir", default="input", help="Folder with {bank}_{YYYY-MM}_{currency}.txt files (default: input)")
+    import_input.add_argument("--db", default="data/transactions.db", help="SQLite database (default: data/transactions.db)")
+    import_input.add_argument("--chunk-size", type=int, default=5000, help="Transactions inserted per chunk (default: 5000)")
+    import_input.set_defaults(func=import_input_main)
+
+    batch = subparsers.add_parser("batch", help="Parse every pdfs/{bank}_{YYYY-MM}.pdf concurrently")
+    batch.add_argument("--pdfs-dir", default="pdfs", help="Folder with {bank}_{YYYY-MM}.pdf files (default: pdfs)")
+    batch.add_argument("--currency", default="UY$", help="Currency (default: UY$)")
+    batch.add_argument("--db", help="SQLite database used as storage (ex: data/transactions.db)")
+    add_ai_args(batch)
+    batch.add_argument("--concurrency", type=int, default=4, help="Max parallel statements (default: 4)")
+    batch.add_argument("--rpm", type=int, default=15, help="Max Gemini requests per minute, 0 = no limit (default: 15)")
+    batch.add_argument("--send-email", action="store_true", help="Send reports by email")
+    add_window_arg(batch)
+    batch.set_defaults(func=batch_main)
+
+    report = subparsers.add_parser("report", help="Generate the report of an account")
+    add_account_args(report)
+    report.add_argument("--all", action="store_true", help="Report every bank/currency found in data/ (or in --db)")
+    add_window_arg(report)
+    report.set_defaults(func=report_main, send_email=False)
+
+    email = subparsers.add_parser("email", help="Generate the report of an account and send it by email")
+    add_account_args(email)
+    email.add_argument("--all", action="store_true", help="Report every bank/currency found in data/ (or in --db)")
+    add_window_arg(email)
+    email.set_defaults(func=report_main, send_email=True)
+
+    watch = subparsers.add_parser("watch", help="Keep running and process new files in pdfs/ and input/")
+    watch.add_argument("--pdfs-dir", default="pdfs", help="Folder with {bank}_{YYYY-MM}.pdf files (default: pdfs)")
+    watch.add_argument("--input-dir", default="input", help="Folder with {bank}_{YYYY-MM}_{currency}.txt files (default: input)")
+    watch.add_argument("--currency", default="UY$", help="Currency of the PDF statements (default: UY$)")
+    watch.add_argument("--db", help="SQLite database used as storage (ex: data/transactions.db)")
+    watch.add_argument("--send-email", action="store_true", help="Send the regenerated reports by email")
+    watch.add_argument("--dashboard", metavar="OUTPUT_DIR", help="Also update the static dashboard in OUTPUT_DIR")
+    add_window_arg(watch)
+    watch.add_argument("--settle-seconds", type=float, default=2, help="Seconds a file must stay unchanged before parsing it (default: 2)")
+    watch.add_argument("--poll-interval", type=float, default=5, help="Seconds between scans when inotify is not available (default: 5)")
+    watch.set_defaults(func=watch_main)
+
+    dashboard = subparsers.add_parser("dashboard", help="Write the static HTML dashboard of every month in data/")
+    dashboard.add_argument("--output-dir", default="dashboard", help="Folder of the generated site (default: dashboard)")
+    dashboard.add_argument("--data-dir", default="data", help="Folder with the month files (default: data)")
+    dashboard.add_argument("--full", action="store_true", help="Rewrite every page, not only the ones affected by new months")
+    dashboard.set_defaults(func=dashboard_main)
+
+    serve = subparsers.add_parser("serve", help="Local read-only json API over the month files in data/")
+    serve.add_argument("--host", default="127.0.0.1", help="Listen address (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="Listen port (default: 8765)")
+    serve.add_argument("--data-dir", default="data", help="Folder with the month files (default: data)")
+    serve.add_argument("--reload-interval", type=float, default=5, help="Seconds between checks for changed months, 0 = never (default: 5)")
+    serve.add_argument("--cache-size", type=int, default=1024, help="Query results kept in the LRU cache (default: 1024)")
+    serve.set_defaults(func=serve_main)
+
+    send_outbox = subparsers.add_parser("send-outbox", help="Send (or retry) the emails waiting in the outbox")
+    send_outbox.set_defaults(func=send_outbox_main)
+
+    # backwards compatible: `app.py santander_2025-05.pdf ...` is `app.py parse-ai santander_2025-05.pdf ...`
+    if argv and not argv[0].startswith("-") and argv[0] not in subparsers.choices:
+        argv = ["parse-ai", *argv]
+
+    return parser.parse_args(argv)
+
+
+def get_matching_json_files(bank: str, currency: str, window: int = None) -> list:
+    """
+    Month files of the account (the `window` most recent ones), in calendar order.
+    When a month also has a columnar .tbatch copy, the newest of the two files is used.
+    """
+    from month_index import MonthIndex
+
+    return MonthIndex("data").get_month_files(bank, currency, window)
+
+
+def get_storage(db_path: str):
+    if not db_path:
+        return None
+    from storage import SQLiteStorage
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    return SQLiteStorage(db_path)
+
+
+def generate_report(bank: str, currency: str, storage=None, send_email: bool = False, json_files: list = None,
+                    window: int = DEFAULT_WINDOW):
+    from report_service import ReportService
+    from aggregates_store import MonthAggregatesStore
+    from analytics import CategoryAnalytics
+
+    report = ReportService(
+        currency=currency,
+        bank=bank,
+        json_files=json_files or get_matching_json_files(bank, currency, window),
+        storage=storage,
+        aggregates_store=MonthAggregatesStore(),
+        analytics=CategoryAnalytics(),
+        window=window,
+    )
+    report.generate(send_email=send_email)
+
+
+def send_pending_emails():
+    """
+    Sends every email left in the outbox by the reports, over a single SMTP connection.
+    Transient send errors are retried for up to EMAIL_RETRY_SECONDS, then left for `send-outbox`.
+    """
+    from email_outbox import EmailOutbox, SMTPSender
+
+    with metrics.span("email.smtp_drain") as span:
+        sent = span.items = SMTPSender.from_env().drain(EmailOutbox(), max_wait_seconds=EMAIL_RETRY_SECONDS)
+    logger.info("Emails enviados: %s", sent)
+
+
+def get_ai_env(require_ai_key: bool = True):
+    """
+    Returns (pdf password, Gemini key). The key is only required when every statement goes to the AI,
+    the local parser works without it (no AI fallback).
+    """
+    pdf_password = os.getenv("CI_PASSW_PDF")
+    google_ai_api_key = os.getenv("GOOGLE_AI_API_KEY")
+
+    if not pdf_password or (require_ai_key and not google_ai_api_key):
+        logger.error("Missing env variables")
+        return None, None
+    if not google_ai_api_key:
+        logger.warning("GOOGLE_AI_API_KEY not set, statements without a matching bank template can't be parsed")
+    return pdf_password, google_ai_api_key
+
+
+def get_ai_cache(args):
+    if args.no_cache:
+        return None
+    from ai_cache import AIResponseCache
+
+    return AIResponseCache()
+
+
+def parse_ai_main(args):
+    from transactions_parser import AITransactionsParserService, TemplateTransactionsParserService
 
     pdf_path = f"pdfs/{args.pdf_file}"
     if not os.path.exists(pdf_path):
@@ -41,38 +222,193 @@ def main():
         else:
             logger.error("Error parsing month.")
             return
-    
-    pdf_password = os.getenv("CI_PASSW_PDF")
-    google_ai_api_key = os.getenv("GOOGLE_AI_API_KEY")
-    
-    if not pdf_password or not google_ai_api_key:
-        logger.error("Missing env variables")
+
+    pdf_password, google_ai_api_key = get_ai_env(require_ai_key=args.parser == "ai")
+    if not pdf_password:
         return
 
-    parser = AITransactionsParserService(
+    parser_class = TemplateTransactionsParserService if args.parser == "local" else AITransactionsParserService
+    parser = parser_class(
         bank_name=args.bank,
         currency=args.currency,
         month=args.month,
         pdf_path=pdf_path,
         google_ai_api_key=google_ai_api_key,
-        pdf_password=pdf_password
+        pdf_password=pdf_password,
+        cache=get_ai_cache(args),
+        refresh_cache=args.refresh,
+        pages_per_chunk=args.pages_per_chunk,
     )
 
     json_output_path = f"data/{args.bank}_{args.month}_{args.currency}.json"
 
-    _, _ = parser.get_transactions(json_output_path)
+    storage = get_storage(args.db)
+    _, _ = parser.get_transactions(json_output_path, storage)
+
+    if args.skip_report:
+        return
 
-    json_files = get_matching_json_files(args.bank, args.currency)
-    
+    json_files = get_matching_json_files(args.bank, args.currency, args.window)
     if not json_files:
         json_files = [json_output_path]
     print(json_files)
-    report = ReportService(
+    generate_report(args.bank, args.currency, storage, args.send_email, json_files, args.window)
+    if args.send_email:
+        send_pending_emails()
+
+
+def parse_manual_main(args):
+    from transactions_parser import ManualTransactionsParserService, INPUT_FILENAME_PATTERN
+
+    if not os.path.exists(args.input_file):
+        logger.error("El archivo no existe: %s", args.input_file)
+        return
+
+    match = INPUT_FILENAME_PATTERN.match(os.path.basename(args.input_file))
+    month = args.month or (match and match["month"])
+    if not month:
+        logger.error("Error parsing month.")
+        return
+
+    parser = ManualTransactionsParserService(args.bank, args.currency, month, args.input_file)
+    json_output_path = f"data/{args.bank}_{month}_{args.currency}.json"
+    transactions, total = parser.get_transactions(json_output_path, get_storage(args.db))
+
+    if args.batch_format:
+        parser.save_transactions_in_batch(transactions, f"data/{args.bank}_{month}_{args.currency}{BATCH_FILE_EXTENSION}")
+    logger.info("Parsed %s transactions from %s", total, args.input_file)
+
+
+def import_input_main(args):
+    from transactions_parser import import_input_directory
+
+    imported = import_input_directory(args.input_dir, get_storage(args.db), args.chunk_size)
+    logger.info("Imported %s transactions from %s files", sum(imported.values()), len(imported))
+
+
+def batch_main(args):
+    from batch_processor import BatchProcessor, find_statements
+
+    # the batch uses the bank templates, Gemini is only the fallback
+    pdf_password, google_ai_api_key = get_ai_env(require_ai_key=False)
+    if not pdf_password:
+        return
+
+    statements = find_statements(args.pdfs_dir, args.currency)
+    if not statements:
+        logger.error("No PDF files found in: %s", args.pdfs_dir)
+        return
+
+    storage = get_storage(args.db)
+    processor = BatchProcessor(
+        google_ai_api_key=google_ai_api_key,
+        pdf_password=pdf_password,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        cache=get_ai_cache(args),
+        refresh_cache=args.refresh,
+        storage=storage,
+        pages_per_chunk=args.pages_per_chunk,
+    )
+    written_files = processor.process(statements)
+
+    # one report per (bank, currency), once all of its months are written
+    for bank, currency in sorted(written_files):
+        generate_report(bank, currency, storage, args.send_email, window=args.window)
+    if args.send_email:
+        send_pending_emails()
+
+
+def report_main(args):
+    if args.all:
+        from multi_account_report import MultiAccountReportService
+
+        service = MultiAccountReportService(storage=get_storage(args.db), window=args.window)
+        print(service.generate(send_email=args.send_email))
+    else:
+        generate_report(args.bank, args.currency, get_storage(args.db), args.send_email, window=args.window)
+
+    if args.send_email:
+        send_pending_emails()
+
+
+def watch_main(args):
+    import signal
+    from ai_cache import AIResponseCache
+    from batch_processor import BatchProcessor
+    from watcher import WatchDaemon
+
+    pdf_password = os.getenv("CI_PASSW_PDF")
+    google_ai_api_key = os.getenv("GOOGLE_AI_API_KEY")
+    if not pdf_password or not google_ai_api_key:
+        logger.warning("CI_PASSW_PDF / GOOGLE_AI_API_KEY not set, only unencrypted PDFs with a bank template can be parsed")
+
+    storage = get_storage(args.db)
+
+    def on_accounts_changed(accounts):
+        for bank, currency in sorted(accounts):
+            generate_report(bank, currency, storage, args.send_email, window=args.window)
+        if args.dashboard:
+            from dashboard import DashboardBuilder
+
+            DashboardBuilder(args.dashboard).build()
+        if args.send_email:
+            send_pending_emails()
+
+    daemon = WatchDaemon(
+        on_accounts_changed,
+        pdfs_dir=args.pdfs_dir,
+        input_dir=args.input_dir,
         currency=args.currency,
-        bank=args.bank,
-        json_files=json_files
-    )   
-    report.generate(send_email=args.send_email)
+        storage=storage,
+        processor=BatchProcessor(
+            google_ai_api_key=google_ai_api_key,
+            pdf_password=pdf_password,
+            cache=AIResponseCache(),
+            storage=storage,
+        ),
+        settle_seconds=args.settle_seconds,
+        poll_interval=args.poll_interval,
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        logger.info("Watch stopped")
+
+
+def dashboard_main(args):
+    from dashboard import DashboardBuilder
+
+    DashboardBuilder(args.output_dir, args.data_dir).build(full=args.full)
+
+
+def serve_main(args):
+    from query_service import serve
+
+    serve(args.data_dir, args.host, args.port, args.reload_interval, args.cache_size)
+
+
+def send_outbox_main(args):
+    send_pending_emails()
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    args = get_args(sys.argv[1:] if argv is None else argv)
+    if args.metrics or args.metrics_output:
+        metrics.enable()
+
+    try:
+        with metrics.span(f"command.{args.command}"):
+            return args.func(args)
+    finally:
+        if metrics.enabled:
+            metrics.log_summary()
+            if args.metrics_output:
+                metrics.export(args.metrics_output)
 
 
 if __name__ == "__main__":
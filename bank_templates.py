@@ -0,0 +1,33 @@
+import re
+from typing import Dict, Optional
+
+
+class BankTemplate:
+    """
+    Layout of the movements table of a bank statement, as extracted by PyPDF2.
+    `row_pattern` must define the groups: date, concept and amount.
+    `opening_pattern` / `closing_pattern` match the previous and the new balance,
+    used to validate that no row was lost: opening + sum(rows) == closing.
+    """
+    def __init__(self, bank: str, row_pattern: str, opening_pattern: str, closing_pattern: str):
+        self.bank = bank
+        self.row_pattern = re.compile(row_pattern)
+        self.opening_pattern = re.compile(opening_pattern)
+        self.closing_pattern = re.compile(closing_pattern)
+
+
+_AMOUNT = r"-?[\d.]+,\d{2}-?"
+
+BANK_TEMPLATES: Dict[str, BankTemplate] = {
+    # 27/03/2025   650   UBER   TRIP   260,70
+    "SANTANDER": BankTemplate(
+        bank="SANTANDER",
+        row_pattern=rf"^\s*(?P<date>\d{{2}}/\d{{2}}/\d{{4}})\s+\d+\s+(?P<concept>.+?)\s+(?P<amount>{_AMOUNT})\s*$",
+        opening_pattern=rf"SALDO ANTERIOR\s+(?P<amount>{_AMOUNT})\s*$",
+        closing_pattern=rf"SALDO CONTADO\s+(?P<amount>{_AMOUNT})\s*$",
+    ),
+}
+
+
+def get_bank_template(bank_name: str) -> Optional[BankTemplate]:
+    return BANK_TEMPLATES.get(bank_name.upper())
@@ -0,0 +1,108 @@
+import os
+import re
+import glob
+from typing import List, Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from transactions_parser import TemplateTransactionsParserService, decrypt_pdf_file
+from ai_cache import AIResponseCache
+from rate_limiter import RateLimiter
+from storage import SQLiteStorage
+from logger import logger
+
+
+PDF_FILENAME_PATTERN = re.compile(r"^(?P<bank>[A-Za-z0-9]+)_(?P<month>\d{4}-\d{2})\.pdf$")
+
+
+class Statement:
+    def __init__(self, pdf_path: str, bank: str, month: str, currency: str):
+        self.pdf_path = pdf_path
+        self.bank = bank
+        self.month = month
+        self.currency = currency
+
+    @property
+    def json_output_path(self) -> str:
+        return f"data/{self.bank}_{self.month}_{self.currency}.json"
+
+
+def find_statements(pdfs_dir: str, currency: str) -> List[Statement]:
+    statements = []
+    for pdf_path in sorted(glob.glob(os.path.join(pdfs_dir, "*.pdf"))):
+        match = PDF_FILENAME_PATTERN.match(os.path.basename(pdf_path))
+        if not match:
+            logger.warning("Skipping file with unexpected name: %s", pdf_path)
+            continue
+        statements.append(Statement(pdf_path, match["bank"].upper(), match["month"], currency.upper()))
+    return statements
+
+
+class BatchProcessor:
+    """
+    Parses many statements at once: decryption runs in a process pool and the
+    Gemini calls run in a thread pool of `concurrency` workers, limited to
+    `requests_per_minute`. Reports are generated once per (bank, currency).
+    """
+    def __init__(self, google_ai_api_key: str, pdf_password: str, concurrency: int = 4,
+                 requests_per_minute: int = 15, cache: AIResponseCache = None, refresh_cache: bool = False,
+                 storage: SQLiteStorage = None, pages_per_chunk: int = None):
+        self.google_ai_api_key = google_ai_api_key
+        self.pdf_password = pdf_password
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.storage = storage
+        self.pages_per_chunk = pages_per_chunk
+
+    def _parse_statement(self, statement: Statement, pdf_data: bytes):
+        parser = TemplateTransactionsParserService(
+            bank_name=statement.bank,
+            currency=statement.currency,
+            month=statement.month,
+            pdf_path=statement.pdf_path,
+            google_ai_api_key=self.google_ai_api_key,
+            cache=self.cache,
+            refresh_cache=self.refresh_cache,
+            rate_limiter=self.rate_limiter,
+            pdf_data=pdf_data,
+            pages_per_chunk=self.pages_per_chunk,
+        )
+        return parser.get_transactions(statement.json_output_path, self.storage)
+
+    def process(self, statements: List[Statement]) -> Dict[Tuple[str, str], List[str]]:
+        """
+        Parses all statements and returns the written json files grouped by (bank, currency).
+        """
+        written_files: Dict[Tuple[str, str], List[str]] = {}
+
+        with ProcessPoolExecutor(max_workers=self.concurrency) as decrypt_pool, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as ai_pool:
+            decrypt_futures = {
+                decrypt_pool.submit(decrypt_pdf_file, statement.pdf_path, self.pdf_password): statement
+                for statement in statements
+            }
+
+            # each statement goes to the AI pool as soon as its decryption finishes
+            parse_futures = {}
+            for future in as_completed(decrypt_futures):
+                statement = decrypt_futures[future]
+                try:
+                    pdf_data = future.result()
+                except Exception as error:
+                    logger.error("Error decrypting %s: %s", statement.pdf_path, str(error))
+                    continue
+                parse_futures[ai_pool.submit(self._parse_statement, statement, pdf_data)] = statement
+
+            for future in as_completed(parse_futures):
+                statement = parse_futures[future]
+                try:
+                    future.result()
+                except Exception as error:
+                    logger.error("Error parsing %s: %s", statement.pdf_path, str(error))
+                    continue
+                written_files.setdefault((statement.bank, statement.currency), []).append(
+                    statement.json_output_path
+                )
+
+        return written_files
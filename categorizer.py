@@ -0,0 +1,128 @@
+import re
+import json
+import hashlib
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+from logger import logger
+
+
+DEFAULT_CATEGORIES_PATH = "categories.json"
+
+RULE_TYPES = ("substring", "prefix", "regex")
+
+
+class CategoryRule:
+    def __init__(self, category: str, pattern: str, type: str = "substring", priority: int = 0, bank: str = None):
+        if type not in RULE_TYPES:
+            raise ValueError(f"Invalid rule type '{type}' for category {category}, expected one of {RULE_TYPES}")
+        self.category = category
+        self.pattern = pattern
+        self.type = type
+        self.priority = priority
+        self.bank = bank.upper() if bank else None
+
+    def to_regex(self) -> str:
+        if self.type == "substring":
+            return re.escape(self.pattern)
+        if self.type == "prefix":
+            return rf"\A{re.escape(self.pattern)}"
+        return rf"(?:{self.pattern})"
+
+
+class RuleMatcher:
+    """
+    Finds the first rule, in priority order, that matches a concept.
+    The rules are joined in plain alternations (no lookaheads, no groups), which `re` scans
+    quickly. The leftmost match is not always the best rule, so after each match only the
+    rules with a better priority are searched again, from the next position.
+    """
+    def __init__(self, rules: List[CategoryRule]):
+        self.rules = rules
+        self._regexes = [rule.to_regex() for rule in rules]
+        # which rule matched at a position: the alternation tries them in priority order
+        ranker = "|".join(f"(?P<r{rank}>{regex})" for rank, regex in enumerate(self._regexes))
+        self._ranker = re.compile(ranker or r"(?!)", re.DOTALL)
+        # group number -> rank (regex rules may have groups of their own)
+        self._ranks = {self._ranker.groupindex[f"r{rank}"]: rank for rank in range(len(rules))}
+        # rank -> alternation of the rules before it, compiled when first needed
+        self._finders: Dict[int, re.Pattern] = {}
+
+    def _get_finder(self, rank: int) -> re.Pattern:
+        finder = self._finders.get(rank)
+        if finder is None:
+            finder = self._finders[rank] = re.compile("|".join(self._regexes[:rank]) or r"(?!)", re.DOTALL)
+        return finder
+
+    def find(self, concept: str) -> Optional[CategoryRule]:
+        finders = self._finders
+        rank = len(self.rules)
+        match = (finders.get(rank) or self._get_finder(rank)).search(concept)
+        while match:
+            start = match.start()
+            rank = self._ranks[self._ranker.match(concept, start).lastindex]
+            if rank == 0 or start >= len(concept):
+                break
+            match = (finders.get(rank) or self._get_finder(rank)).search(concept, start + 1)
+        return self.rules[rank] if rank < len(self.rules) else None
+
+
+class Categorizer:
+    """
+    Assigns a category to each transaction concept.
+    The rules are compiled into a matcher per bank (global rules + bank overrides),
+    sorted by priority, so the first matching rule wins.
+    Results are memoized in a bounded LRU, since merchant strings repeat constantly.
+    """
+    def __init__(self, rules: List[CategoryRule], other: str = "OTHER", cache_size: int = 4096, signature: str = ""):
+        self.rules = rules
+        self.other = other
+        self.signature = signature
+        self._matchers: Dict[Optional[str], RuleMatcher] = {}
+        self.categorize = lru_cache(maxsize=cache_size)(self._categorize)
+
+        # categories in priority order, used to build the agrupations
+        self.categories: List[str] = []
+        for _, rule in self._sorted_rules(None, include_all_banks=True):
+            if rule.category not in self.categories:
+                self.categories.append(rule.category)
+        if other not in self.categories:
+            self.categories.append(other)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **kwargs) -> "Categorizer":
+        rules = [CategoryRule(**rule) for rule in config["rules"]]
+        signature = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+        return cls(rules, other=config.get("other", "OTHER"), signature=signature, **kwargs)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_CATEGORIES_PATH, **kwargs) -> "Categorizer":
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        logger.info("Loaded %s category rules from %s", len(config["rules"]), path)
+        return cls.from_config(config, **kwargs)
+
+    def _sorted_rules(self, bank: Optional[str], include_all_banks: bool = False) -> List[Tuple[int, CategoryRule]]:
+        rules = [
+            (index, rule) for index, rule in enumerate(self.rules)
+            if include_all_banks or rule.bank is None or rule.bank == bank
+        ]
+        # higher priority first; bank overrides before global rules; then file order
+        rules.sort(key=lambda item: (-item[1].priority, item[1].bank is None, item[0]))
+        return rules
+
+    def _get_matcher(self, bank: Optional[str]) -> RuleMatcher:
+        if bank not in self._matchers:
+            self._matchers[bank] = RuleMatcher([rule for _, rule in self._sorted_rules(bank)])
+        return self._matchers[bank]
+
+    def _categorize(self, concept: str, bank: str = None) -> str:
+        rule = self._get_matcher(bank.upper() if bank else None).find(concept)
+        return rule.category if rule else self.other
+
+    def empty_agrupations(self) -> Dict[str, float]:
+        return {category: 0.0 for category in self.categories}
+
+
+def get_default_categorizer() -> Categorizer:
+    return Categorizer.from_file(DEFAULT_CATEGORIES_PATH)
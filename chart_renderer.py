@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+from typing import List, Dict, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+from logger import logger
+
+
+def render_chart(data: List[Dict[str, Any]], output_path: str):
+    """
+    Renders the evolution of the categories with the object-oriented matplotlib API
+    on the Agg canvas: no pyplot global state and no GUI backend, so it is safe to
+    run in parallel workers.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+
+    months = [entry["month"] for entry in data]
+    # Get all the categories (assuming they are the same for all months)
+    categories = data[0]["agrupations"].keys()
+
+    for category in categories:
+        values = [entry["agrupations"][category] for entry in data]
+        ax.plot(months, values, marker="o", linestyle="-", label=category)
+
+        # Add the text with the value next to each point
+        for month, val in zip(months, values):
+            ax.text(month, val, f"{val:,.1f}", fontsize=10, ha="left", va="bottom")
+
+    ax.set_title("Evolución de Conceptos")
+    ax.set_xlabel("Mes")
+    ax.set_ylabel("Importe ($)")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.grid(True)
+    ax.legend()
+
+    # write + rename, so a concurrent reader never sees a half written image
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    figure.savefig(tmp_path, format="png")
+    os.replace(tmp_path, output_path)
+
+
+class ChartRenderer:
+    """
+    Renders the report charts into per-report paths under `output_dir`.
+    The file name includes a hash of the aggregated series, so unchanged
+    inputs reuse the existing image instead of rendering it again.
+    Only the current chart of each report is kept: the older ones are removed after each render.
+    """
+    HASH_LENGTH = 16
+
+    def __init__(self, output_dir: str = "tmp/charts"):
+        self.output_dir = output_dir
+
+    @staticmethod
+    def series_hash(data: List[Dict[str, Any]]) -> str:
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get_chart_path(self, name: str, data: List[Dict[str, Any]]) -> str:
+        return os.path.join(self.output_dir, f"{name}_{self.series_hash(data)[:self.HASH_LENGTH]}.png")
+
+    def evict(self, chart_paths: Dict[str, str]):
+        """
+        Removes the charts of the `chart_paths` names ({name: current chart path}) rendered from older data.
+        """
+        if not os.path.isdir(self.output_dir):
+            return
+
+        current = {os.path.basename(path) for path in chart_paths.values()}
+        # {name}_{hash}.png: other names may share the prefix, the length tells them apart
+        lengths = {f"{name}_": len(name) + 1 + self.HASH_LENGTH + len(".png") for name in chart_paths}
+        for filename in os.listdir(self.output_dir):
+            if filename in current or not filename.endswith(".png"):
+                continue
+            if not any(filename.startswith(prefix) and len(filename) == length for prefix, length in lengths.items()):
+                continue
+            try:
+                os.remove(os.path.join(self.output_dir, filename))
+            except FileNotFoundError:
+                # already removed by another report
+                continue
+            logger.info("Chart removed: %s", filename)
+
+    def render(self, name: str, data: List[Dict[str, Any]]) -> str:
+        chart_path = self.get_chart_path(name, data)
+        if os.path.exists(chart_path):
+            logger.info("Chart unchanged, using %s", chart_path)
+            return chart_path
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        render_chart(data, chart_path)
+        logger.info("Chart saved in: %s", chart_path)
+        self.evict({name: chart_path})
+        return chart_path
+
+    def render_many(self, charts: List[Tuple[str, List[Dict[str, Any]]]], max_workers: int = None) -> Dict[str, str]:
+        """
+        Renders the (name, data) charts in a process pool, skipping the cached ones.
+        Returns {name: chart_path}.
+        """
+        chart_paths = {name: self.get_chart_path(name, data) for name, data in charts}
+        pending = [
+            (data, chart_paths[name]) for name, data in charts
+            if not os.path.exists(chart_paths[name])
+        ]
+
+        if pending:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                list(pool.map(render_chart, *zip(*pending)))
+            logger.info("Rendered %s charts (%s cached)", len(pending), len(charts) - len(pending))
+            self.evict(chart_paths)
+
+        return chart_paths
@@ -0,0 +1,355 @@
+import os
+import re
+import json
+import hashlib
+from html import escape
+from string import Template
+from urllib.parse import quote
+from typing import List, Dict, Any, Iterable, Set, Tuple
+
+from logger import logger
+from categorizer import Categorizer, get_default_categorizer
+from month_index import MonthIndex, Account, load_month_transactions
+from metrics import metrics
+from utils import format_amount
+
+
+# templates are parsed once, when the module is imported
+PAGE_TEMPLATE = Template("""\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>$title</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        table { border-collapse: collapse; margin-top: 10px; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        th { background-color: #f2f2f2; font-weight: bold; }
+        tr:nth-child(even) { background-color: #f9f9f9; }
+        td.amount { text-align: right; }
+        nav { margin-bottom: 10px; }
+    </style>
+</head>
+<body>
+    <nav>$breadcrumbs</nav>
+    <h2>$title</h2>
+$content
+</body>
+</html>
+""")
+TABLE_TEMPLATE = Template("""\
+    <table>
+        <tr>$headers</tr>
+$rows
+    </table>""")
+LINK_TEMPLATE = Template('<a href="$href">$text</a>')
+
+INDEX_ROW_TEMPLATE = Template("""\
+        <tr><td>$account</td><td>$months</td><td>$last_month</td><td class="amount">$last_total</td></tr>""")
+ACCOUNT_ROW_TEMPLATE = Template("""\
+        <tr><td>$month</td><td>$count</td><td class="amount">$total</td></tr>""")
+MONTH_ROW_TEMPLATE = Template("""\
+        <tr><td>$category</td><td>$count</td><td class="amount">$total</td></tr>""")
+TRANSACTION_ROW_TEMPLATE = Template("""\
+        <tr><td>$date</td><td>$concept</td><td class="amount">$amount</td></tr>""")
+
+TEMPLATES = [
+    PAGE_TEMPLATE, TABLE_TEMPLATE, LINK_TEMPLATE, INDEX_ROW_TEMPLATE,
+    ACCOUNT_ROW_TEMPLATE, MONTH_ROW_TEMPLATE, TRANSACTION_ROW_TEMPLATE,
+]
+# a change in the templates rebuilds the whole site
+TEMPLATES_VERSION = hashlib.sha256("".join(template.template for template in TEMPLATES).encode("utf-8")).hexdigest()
+
+INDEX_PAGE = "index.html"
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_$-]", "_", text)
+
+
+def get_account_dir(bank: str, currency: str) -> str:
+    return _slug(f"{bank}_{currency}")
+
+
+def get_account_page(bank: str, currency: str) -> str:
+    return f"{get_account_dir(bank, currency)}/index.html"
+
+
+def get_month_page(bank: str, currency: str, period: str) -> str:
+    return f"{get_account_dir(bank, currency)}/{period}.html"
+
+
+def get_category_page(bank: str, currency: str, period: str, category: str) -> str:
+    return f"{get_account_dir(bank, currency)}/{period}/{_slug(category)}.html"
+
+
+class DependencyGraph:
+    """
+    page -> the nodes it is rendered from: month files or other pages.
+    `affected` follows the edges backwards, so a changed month file reaches its
+    month pages, the account page and, through it, the index.
+    """
+    def __init__(self, edges: Dict[str, Iterable[str]] = None):
+        self.edges: Dict[str, Set[str]] = {page: set(deps) for page, deps in (edges or {}).items()}
+
+    def set(self, page: str, deps: Iterable[str]):
+        self.edges[page] = set(deps)
+
+    def remove(self, page: str):
+        self.edges.pop(page, None)
+
+    def pages_of(self, node: str) -> List[str]:
+        "Pages rendered only from `node`"
+        return [page for page, deps in self.edges.items() if deps == {node}]
+
+    def affected(self, nodes: Iterable[str]) -> Set[str]:
+        dependents: Dict[str, List[str]] = {}
+        for page, deps in self.edges.items():
+            for dep in deps:
+                dependents.setdefault(dep, []).append(page)
+
+        affected = set()
+        pending = list(nodes)
+        while pending:
+            for page in dependents.get(pending.pop(), []):
+                if page not in affected:
+                    affected.add(page)
+                    pending.append(page)
+        return affected
+
+    def to_json(self) -> Dict[str, List[str]]:
+        return {page: sorted(deps) for page, deps in sorted(self.edges.items())}
+
+
+class DashboardBuilder:
+    """
+    Writes a static dashboard of the month files in `data_dir` into `output_dir`:
+    index -> account page (months) -> month page (categories) -> category page (transactions).
+    The manifest keeps the size/mtime and a summary of every month file plus the
+    dependency graph of the pages, so a new or changed month only rewrites its own
+    pages, its account page and the index.
+    """
+    def __init__(self, output_dir: str = "dashboard", data_dir: str = "data", categorizer: Categorizer = None,
+                 month_index: MonthIndex = None, manifest_path: str = None):
+        self.output_dir = output_dir
+        self.data_dir = data_dir
+        self.categorizer = categorizer or get_default_categorizer()
+        self.month_index = month_index or MonthIndex(data_dir)
+        self.manifest_path = manifest_path or os.path.join(output_dir, ".manifest.json")
+        self.version = hashlib.sha256(f"{TEMPLATES_VERSION}:{self.categorizer.signature}".encode("utf-8")).hexdigest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        empty = {"version": self.version, "sources": {}, "graph": {}}
+        if not os.path.exists(self.manifest_path):
+            return empty
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as error:
+            logger.error("Error leyendo %s:%s", self.manifest_path, str(error))
+            return empty
+        if manifest.get("version") != self.version:
+            logger.info("Templates o categorias cambiaron, regenerando el dashboard completo")
+            return empty
+        return manifest
+
+    def _save_manifest(self, sources: Dict[str, Any], graph: DependencyGraph):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "sources": sources, "graph": graph.to_json()}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _write_page(self, page: str, html: str):
+        path = os.path.join(self.output_dir, page)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+
+    def _delete_page(self, page: str):
+        path = os.path.join(self.output_dir, page)
+        if os.path.exists(path):
+            os.remove(path)
+        directory = os.path.dirname(path)
+        if os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+
+    @staticmethod
+    def _link(from_page: str, to_page: str, text: str) -> str:
+        href = os.path.relpath(to_page, os.path.dirname(from_page) or ".")
+        return LINK_TEMPLATE.substitute(href=quote(href), text=escape(text))
+
+    def _render_page(self, page: str, title: str, crumbs: List[Tuple[str, str]], headers: List[str], rows: List[str]) -> str:
+        breadcrumbs = " / ".join(self._link(page, crumb_page, text) for crumb_page, text in crumbs)
+        return PAGE_TEMPLATE.substitute(
+            title=escape(title),
+            breadcrumbs=breadcrumbs,
+            content=TABLE_TEMPLATE.substitute(
+                headers="".join(f"<th>{escape(header)}</th>" for header in headers),
+                rows="\n".join(rows),
+            ),
+        )
+
+    def render_month(self, entry: Dict[str, str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Loads a month file. Returns its summary and {page: html} of the month page and its category pages.
+        """
+        bank, currency, period = entry["bank"], entry["currency"], entry["month"]
+        month_data, transactions = load_month_transactions(entry["path"])
+        str_month = month_data.get("str_month", period)
+
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for transaction in transactions:
+            by_category.setdefault(self.categorizer.categorize(transaction["concept"], bank), []).append(transaction)
+        categories = [category for category in self.categorizer.categories if category in by_category]
+
+        account_page = get_account_page(bank, currency)
+        month_page = get_month_page(bank, currency, period)
+        crumbs = [(INDEX_PAGE, "Inicio"), (account_page, f"{bank} {currency}")]
+        pages = {}
+
+        summary = {
+            "bank": bank, "currency": currency, "period": period, "str_month": str_month,
+            "count": len(transactions),
+            "total": sum(transaction["amount"] for transaction in transactions),
+            "categories": {},
+        }
+        month_rows = []
+        for category in categories:
+            category_transactions = by_category[category]
+            total = sum(transaction["amount"] for transaction in category_transactions)
+            summary["categories"][category] = {"count": len(category_transactions), "total": total}
+
+            category_page = get_category_page(bank, currency, period, category)
+            month_rows.append(MONTH_ROW_TEMPLATE.substitute(
+                category=self._link(month_page, category_page, category),
+                count=len(category_transactions),
+                total=format_amount(total),
+            ))
+            pages[category_page] = self._render_page(
+                category_page, f"{bank} {currency} - {str_month} - {category}",
+                crumbs + [(month_page, str_month)],
+                ["Fecha", "Concepto", "Importe"],
+                [
+                    TRANSACTION_ROW_TEMPLATE.substitute(
+                        date=escape(str(transaction["date"])),
+                        concept=escape(transaction["concept"]),
+                        amount=format_amount(transaction["amount"]),
+                    )
+                    for transaction in category_transactions
+                ],
+            )
+
+        pages[month_page] = self._render_page(
+            month_page, f"{bank} {currency} - {str_month}", crumbs, ["Categoría", "Movimientos", "Importe"], month_rows
+        )
+        return summary, pages
+
+    def render_account(self, account: Account, summaries: List[Dict[str, Any]]) -> str:
+        bank, currency = account
+        account_page = get_account_page(bank, currency)
+        rows = [
+            ACCOUNT_ROW_TEMPLATE.substitute(
+                month=self._link(account_page, get_month_page(bank, currency, summary["period"]), summary["str_month"]),
+                count=summary["count"],
+                total=format_amount(summary["total"]),
+            )
+            for summary in reversed(summaries)
+        ]
+        return self._render_page(
+            account_page, f"{bank} {currency}", [(INDEX_PAGE, "Inicio")], ["Mes", "Movimientos", "Importe"], rows
+        )
+
+    def render_index(self, accounts: Dict[Account, List[Dict[str, Any]]]) -> str:
+        rows = []
+        for (bank, currency), summaries in sorted(accounts.items()):
+            last = summaries[-1]
+            rows.append(INDEX_ROW_TEMPLATE.substitute(
+                account=self._link(INDEX_PAGE, get_account_page(bank, currency), f"{bank} {currency}"),
+                months=len(summaries),
+                last_month=self._link(INDEX_PAGE, get_month_page(bank, currency, last["period"]), last["str_month"]),
+                last_total=format_amount(last["total"]),
+            ))
+        return self._render_page(INDEX_PAGE, "Reportes", [], ["Cuenta", "Meses", "Ultimo mes", "Importe"], rows)
+
+    @metrics.timed("dashboard.build", count=lambda result: result["written"])
+    def build(self, full: bool = False) -> Dict[str, int]:
+        """
+        Rewrites the pages affected by the month files added, changed or removed since the last build
+        (every page if `full`). Returns the number of "written", "deleted" and "unchanged" pages.
+        """
+        manifest = {"version": self.version, "sources": {}, "graph": {}} if full else self._load_manifest()
+        sources: Dict[str, Dict[str, Any]] = manifest["sources"]
+        graph = DependencyGraph(manifest["graph"])
+
+        self.month_index.refresh()
+        entries = {os.path.abspath(entry["path"]): entry for entry in self.month_index.get_entries()}
+
+        changed = set()
+        for path in entries:
+            stat = os.stat(path)
+            source = sources.get(path)
+            if not source or source["mtime_ns"] != stat.st_mtime_ns or source["size"] != stat.st_size:
+                changed.add(path)
+        removed = set(sources) - set(entries)
+
+        # pages that depended on the old version of the months
+        affected = graph.affected(changed | removed)
+        stale = set()
+        for path in changed | removed:
+            for page in graph.pages_of(path):
+                graph.remove(page)
+                stale.add(page)
+        for path in removed:
+            del sources[path]
+
+        pages: Dict[str, str] = {}
+        for path in sorted(changed):
+            try:
+                summary, month_pages = self.render_month(entries[path])
+            except Exception as error:
+                logger.error("Error leyendo %s:%s", path, str(error))
+                sources.pop(path, None)
+                continue
+            stat = os.stat(path)
+            sources[path] = {**summary, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+            for page in month_pages:
+                graph.set(page, [path])
+            pages.update(month_pages)
+
+        accounts: Dict[Account, List[Dict[str, Any]]] = {}
+        account_sources: Dict[Account, List[str]] = {}
+        for path, summary in sorted(sources.items(), key=lambda item: item[1]["period"]):
+            account = (summary["bank"], summary["currency"])
+            accounts.setdefault(account, []).append(summary)
+            account_sources.setdefault(account, []).append(path)
+
+        for page in [page for page in graph.edges if page.endswith("/index.html")]:
+            graph.remove(page)
+        for account, paths in account_sources.items():
+            graph.set(get_account_page(*account), paths)
+        graph.set(INDEX_PAGE, [get_account_page(*account) for account in accounts])
+        affected |= graph.affected(changed | removed)
+
+        for account, summaries in accounts.items():
+            account_page = get_account_page(*account)
+            if account_page in affected:
+                pages[account_page] = self.render_account(account, summaries)
+        if INDEX_PAGE in affected or not os.path.exists(os.path.join(self.output_dir, INDEX_PAGE)):
+            pages[INDEX_PAGE] = self.render_index(accounts)
+
+        stale |= affected - set(graph.edges)
+        stale -= set(pages)
+        for page, html in pages.items():
+            self._write_page(page, html)
+        for page in stale:
+            self._delete_page(page)
+        self._save_manifest(sources, graph)
+
+        result = {"written": len(pages), "deleted": len(stale), "unchanged": len(graph.edges) - len(pages)}
+        logger.info("Dashboard %s: %s paginas escritas, %s borradas, %s sin cambios",
+                    self.output_dir, result["written"], result["deleted"], result["unchanged"])
+        return result
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import uuid
+import smtplib
+from email import message_from_bytes, policy
+from email.message import Message
+from typing import List, Callable, Optional, Tuple
+
+from logger import logger
+
+
+class EmailOutbox:
+    """
+    Local spool of rendered messages: reports only write the email here and
+    never wait for the mail server. `SMTPSender.drain` sends them later.
+    Each message is a .eml file, with a .json sidecar that keeps the retry state.
+    """
+    def __init__(self, spool_dir: str = "tmp/outbox"):
+        self.spool_dir = spool_dir
+        self.failed_dir = os.path.join(spool_dir, "failed")
+
+    def enqueue(self, msg: Message) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        name = f"{time.time():.6f}_{uuid.uuid4().hex}"
+        path = os.path.join(self.spool_dir, f"{name}.eml")
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(msg.as_bytes())
+        os.replace(tmp_path, path)
+
+        logger.info("Email encolado: %s", path)
+        return path
+
+    def _state_path(self, path: str) -> str:
+        return f"{path[:-len('.eml')]}.json"
+
+    def get_state(self, path: str) -> dict:
+        try:
+            with open(self._state_path(path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"attempts": 0, "next_attempt_at": 0, "last_error": None}
+
+    def pending(self, now: float = None) -> List[str]:
+        """
+        Messages ready to be sent, oldest first.
+        """
+        if not os.path.isdir(self.spool_dir):
+            return []
+        now = time.time() if now is None else now
+        paths = sorted(
+            os.path.join(self.spool_dir, filename)
+            for filename in os.listdir(self.spool_dir) if filename.endswith(".eml")
+        )
+        return [path for path in paths if self.get_state(path)["next_attempt_at"] <= now]
+
+    def next_attempt_at(self) -> Optional[float]:
+        "When the next message is due, None if the outbox is empty"
+        if not os.path.isdir(self.spool_dir):
+            return None
+        return min((
+            self.get_state(os.path.join(self.spool_dir, filename))["next_attempt_at"]
+            for filename in os.listdir(self.spool_dir) if filename.endswith(".eml")
+        ), default=None)
+
+    def load(self, path: str) -> Message:
+        with open(path, "rb") as f:
+            return message_from_bytes(f.read(), policy=policy.SMTP)
+
+    def mark_sent(self, path: str):
+        os.remove(path)
+        if os.path.exists(self._state_path(path)):
+            os.remove(self._state_path(path))
+
+    def mark_failed(self, path: str, error: Exception, max_attempts: int, backoff_seconds: float):
+        state = self.get_state(path)
+        state["attempts"] += 1
+        state["last_error"] = str(error)
+        # exponential backoff: backoff, 2 * backoff, 4 * backoff...
+        state["next_attempt_at"] = time.time() + backoff_seconds * 2 ** (state["attempts"] - 1)
+
+        if state["attempts"] >= max_attempts:
+            os.makedirs(self.failed_dir, exist_ok=True)
+            os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+            if os.path.exists(self._state_path(path)):
+                os.remove(self._state_path(path))
+            logger.error("Email descartado luego de %s intentos (%s): %s", state["attempts"], error, path)
+            return
+
+        with open(self._state_path(path), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        logger.warning("Error al enviar %s (intento %s): %s", path, state["attempts"], error)
+
+
+class SMTPSender:
+    """
+    Drains the outbox over one authenticated SMTP connection per batch,
+    so a run with many reports pays the TLS and login cost once.
+    Host and port are configurable (SMTP_HOST / SMTP_PORT), ex: to use a local SMTP server in tests.
+    """
+    def __init__(self, host: str = "smtp.gmail.com", port: int = 587, username: str = None, password: str = None,
+                 starttls: bool = True, timeout: float = 30, smtp_factory: Callable[..., smtplib.SMTP] = smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.smtp_factory = smtp_factory
+
+    @classmethod
+    def from_env(cls) -> "SMTPSender":
+        return cls(
+            host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            username=os.getenv("SENDER_EMAIL"),
+            password=os.getenv("PASSW_APPLICATION_EMAIL"),
+            starttls=os.getenv("SMTP_STARTTLS", "1") == "1",
+        )
+
+    def connect(self) -> smtplib.SMTP:
+        server = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return server
+
+    def drain(self, outbox: EmailOutbox, max_attempts: int = 5, backoff_seconds: float = 60,
+              max_wait_seconds: float = 0) -> int:
+        """
+        Sends every pending message. Failed messages stay in the outbox with exponential backoff:
+        they are retried in this call while they come due within `max_wait_seconds`, later ones
+        are left for the next drain. When the server can't be reached (connect/login errors)
+        the drain stops, and no message is charged an attempt.
+        Returns the number of sent emails.
+        """
+        deadline = time.time() + max_wait_seconds
+        sent = 0
+        paths = outbox.pending()
+        while paths:
+            batch_sent, connected = self._send(outbox, paths, max_attempts, backoff_seconds)
+            sent += batch_sent
+            next_attempt_at = outbox.next_attempt_at()
+            if not connected or next_attempt_at is None or next_attempt_at > deadline:
+                break
+            time.sleep(max(next_attempt_at - time.time(), 0))
+            paths = outbox.pending()
+        return sent
+
+    def _send(self, outbox: EmailOutbox, paths: List[str], max_attempts: int, backoff_seconds: float) -> Tuple[int, bool]:
+        """
+        Sends `paths` over one connection. Returns the sent count and False if the server was unreachable.
+        """
+        sent = 0
+        server: Optional[smtplib.SMTP] = None
+        try:
+            for path in paths:
+                if server is None:
+                    try:
+                        server = self.connect()
+                    except (smtplib.SMTPException, OSError) as error:
+                        logger.error("Error conectando a %s:%s, %s emails pendientes: %s",
+                                     self.host, self.port, len(paths) - sent, error)
+                        return sent, False
+                try:
+                    server.send_message(outbox.load(path))
+                except (smtplib.SMTPException, OSError) as error:
+                    outbox.mark_failed(path, error, max_attempts, backoff_seconds)
+                    # the connection may be broken, reconnect for the next message
+                    self._close(server)
+                    server = None
+                    continue
+                outbox.mark_sent(path)
+                sent += 1
+                logger.info("Email enviado")
+        finally:
+            self._close(server)
+
+        return sent, True
+
+    @staticmethod
+    def _close(server: Optional[smtplib.SMTP]):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
@@ -0,0 +1,152 @@
+import io
+import time
+import atexit
+import hashlib
+import threading
+from typing import Dict, Any, Callable, Tuple
+
+from logger import logger
+from metrics import metrics
+
+
+# Gemini deletes uploaded files after 48 h, they are reused for less than that
+UPLOAD_TTL_SECONDS = 47 * 3600
+CLEANUP_INTERVAL_SECONDS = 600
+
+
+def _default_client_factory(api_key: str):
+    from google import genai
+
+    return genai.Client(api_key=api_key)
+
+
+class GeminiSession:
+    """
+    One Gemini client per process (and API key), shared by every statement.
+    Uploaded files are remembered by the sha256 of their content, so retries and
+    repeated statements don't upload the same bytes again. A background thread
+    deletes the remote files once their TTL expires.
+    Tests can pass a `client_factory` that returns a local fake client.
+    """
+    def __init__(self, api_key: str, client_factory: Callable[[str], Any] = _default_client_factory,
+                 upload_ttl: float = UPLOAD_TTL_SECONDS, cleanup_interval: float = CLEANUP_INTERVAL_SECONDS):
+        self.api_key = api_key
+        self.client_factory = client_factory
+        self.upload_ttl = upload_ttl
+        self.cleanup_interval = cleanup_interval
+        self._client = None
+        self._lock = threading.Lock()
+        # sha256 -> (remote file, expires_at)
+        self._uploads: Dict[str, Tuple[Any, float]] = {}
+        self._upload_locks: Dict[str, threading.Lock] = {}
+        self._stop = threading.Event()
+        self._cleanup_thread: threading.Thread = None
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self.client_factory(self.api_key)
+            return self._client
+
+    def upload(self, content: bytes, mime_type: str = "application/pdf", before_upload: Callable[[], None] = None):
+        """
+        Returns the remote file of `content`, uploading it only if it is not already uploaded.
+        `before_upload` is called right before a real upload (ex: to wait for the rate limiter).
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            upload_lock = self._upload_locks.setdefault(digest, threading.Lock())
+
+        # the same content uploaded from two threads is only sent once
+        with upload_lock:
+            with self._lock:
+                uploaded = self._uploads.get(digest)
+            if uploaded and uploaded[1] > time.time():
+                metrics.record("ai.upload_reused", 0.0, items=1, size=len(content))
+                return uploaded[0]
+
+            if before_upload:
+                before_upload()
+            with metrics.span("ai.upload", size=len(content)):
+                remote_file = self.client.files.upload(file=io.BytesIO(content), config={"mime_type": mime_type})
+
+            with self._lock:
+                self._uploads[digest] = (remote_file, time.time() + self.upload_ttl)
+            self._start_cleanup()
+            return remote_file
+
+    def _delete_remote(self, remote_file):
+        try:
+            self.client.files.delete(name=remote_file.name)
+        except Exception as error:
+            logger.warning("Error borrando el archivo remoto %s: %s", getattr(remote_file, "name", remote_file), str(error))
+
+    def expire(self, now: float = None) -> int:
+        """
+        Forgets and deletes the uploads whose TTL expired. Returns the number of deleted files.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [digest for digest, (_, expires_at) in self._uploads.items() if expires_at <= now]
+            remote_files = [self._uploads.pop(digest)[0] for digest in expired]
+            for digest in expired:
+                self._upload_locks.pop(digest, None)
+
+        for remote_file in remote_files:
+            self._delete_remote(remote_file)
+        return len(remote_files)
+
+    def _cleanup_loop(self):
+        while not self._stop.wait(self.cleanup_interval):
+            self.expire()
+
+    def _start_cleanup(self):
+        with self._lock:
+            if self._cleanup_thread is not None:
+                return
+            self._cleanup_thread = threading.Thread(target=self._cleanup_loop, name="gemini-cleanup", daemon=True)
+            self._cleanup_thread.start()
+
+    def close(self, delete_uploads: bool = True):
+        """
+        Stops the cleanup thread and (by default) deletes every remote file of this session.
+        """
+        self._stop.set()
+        if delete_uploads:
+            self.expire(now=float("inf"))
+
+
+_sessions: Dict[str, GeminiSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(api_key: str) -> GeminiSession:
+    "Process-wide session of `api_key`"
+    with _sessions_lock:
+        session = _sessions.get(api_key)
+        if session is None:
+            session = _sessions[api_key] = GeminiSession(api_key)
+        return session
+
+
+def set_session(session: GeminiSession):
+    """
+    Replaces the process-wide session of `session.api_key` (ex: with one built on a fake client).
+    """
+    with _sessions_lock:
+        previous = _sessions.get(session.api_key)
+        _sessions[session.api_key] = session
+    if previous and previous is not session:
+        previous.close()
+
+
+def close_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+atexit.register(close_sessions)
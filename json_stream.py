@@ -0,0 +1,138 @@
+import re
+import json
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+
+from logger import logger
+
+
+_STRUCTURE_CHARS = re.compile(r'[\[\]{}",]')
+_STRING_CHARS = re.compile(r'["\\]')
+
+
+class JSONArrayStream:
+    """
+    Incremental parser of a JSON array of objects, fed with the text chunks of a
+    streamed response. Each object is decoded as soon as its closing brace arrives.
+    Anything that is not a valid object (broken json, scalars, a truncated last item)
+    is quarantined in `malformed` as (text, reason) instead of failing the whole array.
+    Text before the array (ex: a Markdown ```json fence) is ignored.
+    """
+    def __init__(self):
+        self.malformed: List[Tuple[str, str]] = []
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._item_start = None
+        self._separator_end = 0
+        self._started = False
+        self._closed = False
+
+    def _quarantine(self, text: str, reason: str):
+        logger.warning("Item descartado (%s): %r", reason, text[:200])
+        self.malformed.append((text, reason))
+
+    def _decode(self, text: str) -> Iterator[Dict[str, Any]]:
+        try:
+            item = json.loads(text)
+        except ValueError as error:
+            self._quarantine(text, str(error))
+            return
+        if not isinstance(item, dict):
+            self._quarantine(text, "not an object")
+            return
+        yield item
+
+    def _check_junk(self, end: int):
+        junk = self._buffer[self._separator_end:end].strip()
+        if junk:
+            self._quarantine(junk, "not an object")
+
+    def feed(self, text: str) -> Iterator[Dict[str, Any]]:
+        if self._closed:
+            return
+        self._buffer += text
+        buffer = self._buffer
+
+        while True:
+            if self._in_string:
+                match = _STRING_CHARS.search(buffer, self._pos)
+                if not match:
+                    self._pos = len(buffer)
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(buffer):
+                        # escaped char not received yet
+                        self._pos = match.start()
+                        break
+                    self._pos = match.end() + 1
+                    continue
+                self._in_string = False
+                self._pos = match.end()
+                continue
+
+            match = _STRUCTURE_CHARS.search(buffer, self._pos)
+            if not match:
+                self._pos = len(buffer)
+                break
+            char, index = match.group(), match.start()
+            self._pos = match.end()
+
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                    self._depth = 1
+                    self._separator_end = self._pos
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 1:
+                    self._check_junk(index)
+                    self._item_start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._item_start is not None:
+                    yield from self._decode(buffer[self._item_start:self._pos])
+                    self._item_start = None
+                    self._separator_end = self._pos
+                elif self._depth == 0:
+                    self._check_junk(index)
+                    self._closed = True
+                    break
+            elif char == "," and self._depth == 1:
+                self._check_junk(index)
+                self._separator_end = self._pos
+
+        # keep only the text of the item in progress
+        cut = self._item_start if self._item_start is not None else min(self._separator_end, self._pos)
+        if self._started and cut:
+            self._buffer = buffer[cut:]
+            self._pos -= cut
+            self._separator_end = max(self._separator_end - cut, 0)
+            if self._item_start is not None:
+                self._item_start -= cut
+
+    def close(self):
+        """
+        Ends the stream: a truncated last item is quarantined.
+        """
+        if not self._started:
+            raise ValueError("No JSON array found in the response")
+        if self._item_start is not None:
+            self._quarantine(self._buffer[self._item_start:], "truncated item")
+            self._item_start = None
+        self._closed = True
+
+
+def iter_json_array(chunks: Iterable[str], stream: JSONArrayStream = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the objects of a JSON array while its text chunks arrive.
+    Pass `stream` to read the quarantined items afterwards.
+    """
+    stream = stream or JSONArrayStream()
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+    stream.close()
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import threading
+from functools import wraps
+from typing import Dict, Any, Callable
+
+from logger import logger
+
+
+class Span:
+    "Timing of one run of a stage, `items` and `bytes` can be set inside the `with` block"
+    def __init__(self, metrics: "Metrics", name: str, items: int = None, size: int = None):
+        self.metrics = metrics
+        self.name = name
+        self.items = items
+        self.bytes = size
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.name, time.perf_counter() - self.start, self.items, self.bytes, error=exc_type is not None)
+        return False
+
+
+class _NullSpan:
+    """
+    Returned when the metrics are disabled: nothing is timed nor recorded.
+    Shared by every caller, so the values set on it are dropped (never read them back).
+    """
+    __slots__ = ()
+    items = None
+    bytes = None
+
+    def __setattr__(self, name: str, value: Any):
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """
+    Per-stage timings of a run (decrypt, upload, generate, parse, transform, save,
+    load, aggregate, chart, email...). Disabled by default: `span` then returns a
+    shared no-op span, so the instrumented code pays almost nothing.
+
+        with metrics.span("parser.transform") as span:
+            ...
+            span.items = len(transactions)
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def span(self, name: str, items: int = None, size: int = None):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, items, size)
+
+    def timed(self, name: str, count: Callable[[Any], int] = None) -> Callable:
+        """
+        Decorator version of `span`. `count(result)` gives the number of items of the call.
+        """
+        def decorator(fn: Callable) -> Callable:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with Span(self, name) as span:
+                    result = fn(*args, **kwargs)
+                    if count and result is not None:
+                        span.items = count(result)
+                    return result
+            return wrapper
+        return decorator
+
+    def record(self, name: str, seconds: float, items: int = None, size: int = None, error: bool = False):
+        with self._lock:
+            stage = self._stages.setdefault(name, {
+                "calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0, "items": 0, "bytes": 0,
+            })
+            stage["calls"] += 1
+            stage["errors"] += int(error)
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            stage["items"] += items or 0
+            stage["bytes"] += size or 0
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: dict(stage) for name, stage in sorted(self._stages.items())}
+
+    def log_summary(self):
+        for name, stage in self.summary().items():
+            logger.info(
+                "Metrics %s: %s calls, %.3f s (max %.3f s), %s items, %s bytes%s",
+                name, stage["calls"], stage["seconds"], stage["max_seconds"], stage["items"], stage["bytes"],
+                f", {stage['errors']} errors" if stage["errors"] else "",
+            )
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric, key, help_text in (
+            ("pipeline_stage_calls_total", "calls", "Runs of the stage"),
+            ("pipeline_stage_errors_total", "errors", "Runs of the stage that raised an error"),
+            ("pipeline_stage_seconds_total", "seconds", "Time spent in the stage"),
+            ("pipeline_stage_max_seconds", "max_seconds", "Slowest run of the stage"),
+            ("pipeline_stage_items_total", "items", "Items processed by the stage"),
+            ("pipeline_stage_bytes_total", "bytes", "Bytes processed by the stage"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {'gauge' if key == 'max_seconds' else 'counter'}")
+            for name, stage in self.summary().items():
+                lines.append(f'{metric}{{stage="{name}"}} {stage[key]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """
+        Writes the summary as Prometheus text (.prom) or json (any other extension).
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.summary(), indent=2)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        logger.info("Metrics saved in: %s", path)
+
+
+# process wide instance, enabled with `app.py --metrics` or METRICS=1
+metrics = Metrics(enabled=os.getenv("METRICS") == "1")
@@ -0,0 +1,143 @@
+import os
+import json
+from typing import List, Dict, Any, Tuple, Optional
+
+from logger import logger
+from utils import BATCH_FILE_EXTENSION, parse_data_filename
+
+
+Account = Tuple[str, str]
+
+
+def load_month_transactions(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Reads a month file (json or .tbatch): returns (month info, transactions).
+    """
+    if path.endswith(BATCH_FILE_EXTENSION):
+        from transaction_batch import TransactionBatch
+
+        batch = TransactionBatch.load(path)
+        return batch.meta, batch.to_transactions()
+    with open(path, "r", encoding="utf-8") as f:
+        month_data = json.load(f)
+    return month_data, month_data["transactions"]
+
+
+def select_window(paths: List[str], window: Optional[int]) -> List[str]:
+    """
+    Sorts month files in calendar order and keeps the `window` most recent ones (all if None/0).
+    Files whose name has no month keep their relative order, before the dated ones.
+    """
+    def month_key(path: str) -> str:
+        parsed = parse_data_filename(path)
+        return parsed[1] if parsed else ""
+
+    paths = sorted(paths, key=month_key)
+    return paths[-window:] if window else paths
+
+
+class MonthIndex:
+    """
+    Manifest of the month files available in `data_dir`: (bank, currency, month, path).
+    Directory listings are cached by the directory mtime, so resolving the
+    months of a report doesn't depend on how many files the archive has, and
+    only the selected month files are ever opened.
+    When a month has both a .json and a .tbatch file, the newest one is indexed.
+    """
+    def __init__(self, data_dir: str = "data", manifest_path: str = "tmp/month_index.json"):
+        self.data_dir = data_dir
+        self.manifest_path = manifest_path
+        self._entries: List[Dict[str, str]] = None
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)["dirs"]
+        except (OSError, ValueError, KeyError) as error:
+            logger.error("Error leyendo %s:%s", self.manifest_path, str(error))
+            return {}
+
+    def _save_manifest(self, dirs: Dict[str, Any]):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dirs": dirs}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def scan(self) -> List[Dict[str, str]]:
+        months: Dict[Tuple[str, str, str], Dict[str, str]] = {}
+
+        for filename in os.listdir(self.data_dir):
+            parsed = parse_data_filename(filename)
+            if not parsed:
+                continue
+            bank, month, currency = parsed
+            key = (bank.upper(), currency.upper(), month)
+            path = os.path.join(self.data_dir, filename)
+            if key in months and not self._is_newer(path, months[key]["path"]):
+                continue
+            months[key] = {
+                "bank": key[0],
+                "currency": key[1],
+                "month": month,
+                "path": path,
+            }
+
+        return [months[key] for key in sorted(months)]
+
+    @staticmethod
+    def _is_newer(path: str, other_path: str) -> bool:
+        "Between two files of the same month, the last written one wins (the .tbatch one on ties)"
+        mtime, other_mtime = os.stat(path).st_mtime_ns, os.stat(other_path).st_mtime_ns
+        if mtime != other_mtime:
+            return mtime > other_mtime
+        return path.endswith(BATCH_FILE_EXTENSION)
+
+    def get_entries(self) -> List[Dict[str, str]]:
+        """
+        Every indexed month, sorted by bank, currency and month.
+        """
+        if self._entries is not None:
+            return self._entries
+        if not os.path.isdir(self.data_dir):
+            return []
+
+        dir_key = os.path.abspath(self.data_dir)
+        dir_mtime = os.stat(self.data_dir).st_mtime_ns
+        dirs = self._load_manifest()
+        cached = dirs.get(dir_key)
+
+        if cached and cached["mtime_ns"] == dir_mtime:
+            self._entries = cached["entries"]
+        else:
+            self._entries = self.scan()
+            dirs[dir_key] = {"mtime_ns": dir_mtime, "entries": self._entries}
+            self._save_manifest(dirs)
+        return self._entries
+
+    def refresh(self):
+        "Forgets the entries loaded by this instance (the manifest is checked again on the next read)"
+        self._entries = None
+
+    def get_month_files(self, bank: str, currency: str, window: Optional[int] = None) -> List[str]:
+        """
+        Paths of the `window` most recent months of the account (all if None/0), in calendar order.
+        """
+        bank, currency = bank.upper(), currency.upper()
+        paths = [
+            entry["path"] for entry in self.get_entries()
+            if entry["bank"] == bank and entry["currency"] == currency
+        ]
+        return paths[-window:] if window else paths
+
+    def get_accounts(self, window: Optional[int] = None) -> Dict[Account, List[str]]:
+        "{(bank, currency): [paths]}, with the `window` most recent months of each account"
+        accounts: Dict[Account, List[str]] = {}
+        for entry in self.get_entries():
+            accounts.setdefault((entry["bank"], entry["currency"]), []).append(entry["path"])
+        return {
+            account: paths[-window:] if window else paths
+            for account, paths in accounts.items()
+        }
@@ -0,0 +1,143 @@
+from typing import List, Dict, Any, Tuple
+
+from logger import logger
+from report_service import ReportService, REPORT_WINDOW_MONTHS
+from aggregates_store import MonthAggregatesStore
+from analytics import CategoryAnalytics
+from categorizer import Categorizer, get_default_categorizer
+from chart_renderer import ChartRenderer
+from month_index import MonthIndex, Account
+from storage import SQLiteStorage
+
+
+def discover_accounts(data_dir: str = "data", window: int = None) -> Dict[Account, List[str]]:
+    """
+    Groups the month files under `data_dir` by (bank, currency), in month order
+    (only the `window` most recent months of each account, if given).
+    When a month has both a .json and a .tbatch file, the newest one is used.
+    """
+    return MonthIndex(data_dir).get_accounts(window)
+
+
+class MultiAccountReportService:
+    """
+    Generates the report of every bank/currency combination in one pass:
+    each month file is loaded (or taken from the aggregates store) once, all the
+    charts are rendered together, and a consolidated summary per currency is built.
+    """
+    def __init__(self, data_dir: str = "data", storage: SQLiteStorage = None,
+                 aggregates_store: MonthAggregatesStore = None, categorizer: Categorizer = None,
+                 chart_renderer: ChartRenderer = None, window: int = REPORT_WINDOW_MONTHS,
+                 analytics: CategoryAnalytics = None):
+        self.data_dir = data_dir
+        self.window = window
+        self.storage = storage
+        self.aggregates_store = aggregates_store or MonthAggregatesStore()
+        self.categorizer = categorizer or get_default_categorizer()
+        self.chart_renderer = chart_renderer or ChartRenderer()
+        self.analytics = analytics or CategoryAnalytics()
+
+    def _build_report(self, bank: str, currency: str, json_files: List[str] = None) -> ReportService:
+        return ReportService(
+            currency=currency,
+            bank=bank,
+            json_files=json_files,
+            aggregates_store=self.aggregates_store,
+            window=self.window,
+            categorizer=self.categorizer,
+            chart_renderer=self.chart_renderer,
+            analytics=self.analytics,
+        )
+
+    def _get_reports_data_from_storage(self) -> Dict[Account, Tuple[ReportService, List[Dict[str, Any]]]]:
+        accounts_months: Dict[Account, List[Dict[str, Any]]] = {}
+        for month_data in self.storage.get_all_months():
+            accounts_months.setdefault((month_data["bank"], month_data["currency"]), []).append(month_data)
+        if self.window:
+            accounts_months = {account: months[-self.window:] for account, months in accounts_months.items()}
+
+        # only the months inside the window are categorized and summed
+        categorize = self.categorizer.categorize
+        sums = self.storage.get_all_category_sums(
+            lambda concept, bank: categorize(concept, bank), self.categorizer.categories,
+            since_months={account: months[0]["month"] for account, months in accounts_months.items()}
+        )
+
+        reports = {}
+        for account, months in accounts_months.items():
+            reports[account] = (self._build_report(*account), [
+                {
+                    "month": month_data["str_month"],
+                    "period": month_data["month"],
+                    "agrupations": sums.get(account, {}).get(month_data["month"], self.categorizer.empty_agrupations()),
+                }
+                for month_data in months
+            ])
+        return reports
+
+    def get_reports_data(self) -> Dict[Account, Tuple[ReportService, List[Dict[str, Any]]]]:
+        """
+        Returns {(bank, currency): (report, monthly agrupations)}.
+        """
+        if self.storage:
+            return self._get_reports_data_from_storage()
+
+        reports = {}
+        for (bank, currency), json_files in discover_accounts(self.data_dir, self.window).items():
+            report = self._build_report(bank, currency, json_files)
+            reports[(bank, currency)] = (report, report.get_agrupations_by_months_and_concepts())
+        return reports
+
+    def get_consolidated_summary(self, reports_data: Dict[Account, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Cross-account summary. Amounts are only added up within the same currency:
+        {currency: [{"period", "month", "total", "accounts": {bank: total}, "agrupations": {category: amount}}]}
+        """
+        summary: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+        for (bank, currency), data in reports_data.items():
+            currency_summary = summary.setdefault(currency, {})
+            for entry in data:
+                period = currency_summary.setdefault(entry["period"], {
+                    "period": entry["period"],
+                    "month": entry["month"],
+                    "total": 0.0,
+                    "accounts": {},
+                    "agrupations": self.categorizer.empty_agrupations(),
+                })
+                account_total = sum(entry["agrupations"].values())
+                period["total"] += account_total
+                period["accounts"][bank] = period["accounts"].get(bank, 0.0) + account_total
+                for category, amount in entry["agrupations"].items():
+                    period["agrupations"][category] = period["agrupations"].get(category, 0.0) + amount
+
+        return {
+            currency: [periods[period] for period in sorted(periods)]
+            for currency, periods in sorted(summary.items())
+        }
+
+    def generate(self, send_email: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        reports = self.get_reports_data()
+        self.aggregates_store.save()
+        if not reports:
+            logger.error("No data found in %s", self.storage.db_path if self.storage else self.data_dir)
+            return {}
+
+        charts = self.chart_renderer.render_many([
+            (f"{bank}_{currency}", data) for (bank, currency), (_, data) in reports.items() if data
+        ])
+
+        for (bank, currency), (report, data) in reports.items():
+            if data:
+                report.publish(data, charts[f"{bank}_{currency}"], send_email)
+
+        summary = self.get_consolidated_summary({account: data for account, (_, data) in reports.items()})
+        for currency, periods in summary.items():
+            if periods:
+                last_period = periods[-1]
+                logger.info(
+                    "Consolidated %s %s: %.2f (%s)",
+                    currency, last_period["month"], last_period["total"],
+                    ", ".join(f"{bank}: {total:.2f}" for bank, total in last_period["accounts"].items())
+                )
+        return summary
@@ -0,0 +1,125 @@
+import re
+from datetime import date
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+
+
+class LocaleProfile:
+    """
+    Number and date format of a bank's statements.
+    Uruguayan banks print amounts as 1.234,56 (and 1.234,56- for credits) and dates day first.
+    """
+    def __init__(self, thousands_separator: str = ".", decimal_separator: str = ",", day_first: bool = True):
+        self.thousands_separator = thousands_separator
+        self.decimal_separator = decimal_separator
+        self.day_first = day_first
+
+
+DEFAULT_LOCALE = LocaleProfile()
+
+LOCALE_PROFILES: Dict[str, LocaleProfile] = {
+    "SANTANDER": LocaleProfile(thousands_separator=".", decimal_separator=",", day_first=True),
+}
+
+
+def get_locale_profile(bank: str) -> LocaleProfile:
+    return LOCALE_PROFILES.get((bank or "").upper(), DEFAULT_LOCALE)
+
+
+_ISO_DATE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+_NUMERIC_DATE = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{2}|\d{4})$")
+
+
+@lru_cache(maxsize=8192)
+def parse_date(text: str, day_first: bool = True) -> str:
+    """
+    Statement date (DD/MM/YYYY, DD-MM-YY, ISO...) -> ISO date (YYYY-MM-DD).
+    Cached: the same few dates repeat in every row of a statement.
+    """
+    text = text.strip()
+    match = _ISO_DATE.match(text)
+    if match:
+        year, month, day = (int(part) for part in match.groups())
+    else:
+        match = _NUMERIC_DATE.match(text)
+        if not match:
+            raise ValueError(f"Unknown date format: {text!r}")
+        first, second, year = (int(part) for part in match.groups())
+        day, month = (first, second) if day_first else (second, first)
+        if year < 100:
+            year += 2000
+    return date(year, month, day).isoformat()
+
+
+class Normalizer:
+    """
+    Converts raw statement rows ({"date", "concept", "amount"} as text) into
+    transactions ({"date": ISO date, "amount": float, "concept"}), with the
+    patterns compiled once per parser instead of once per row.
+    Rows whose concept matches `skip_keywords` (balances, payments) are dropped.
+    """
+    def __init__(self, profile: LocaleProfile = DEFAULT_LOCALE, skip_keywords: Iterable[str] = ()):
+        self.profile = profile
+        skip_keywords = list(skip_keywords)
+        self.skip_pattern = re.compile("|".join(re.escape(word) for word in skip_keywords)) if skip_keywords else None
+        self._decimal_separator = profile.decimal_separator
+        self._thousands_separator = profile.thousands_separator
+        self._skipped: Dict[str, bool] = {}
+        thousands = re.escape(profile.thousands_separator)
+        # 1.234 / 1.234.567: only thousands separators, no decimals
+        self._thousands_only = re.compile(rf"^\d{{1,3}}({thousands}\d{{3}})+$")
+
+    @classmethod
+    def for_bank(cls, bank: str, skip_keywords: Iterable[str] = ()) -> "Normalizer":
+        return cls(get_locale_profile(bank), skip_keywords)
+
+    def parse_amount(self, text: str) -> float:
+        """
+        '1.234,56' -> 1234.56, '1.234,56-' and '-1.234,56' -> -1234.56.
+        Without decimal separator the text is read as a plain number ('1234.5'),
+        unless it only has thousands groups ('1.234' -> 1234).
+        """
+        text = text.strip()
+        if not text:
+            raise ValueError("empty amount")
+        negative = text[-1] == "-" or text[0] == "-"
+        text = text.strip("-")
+        if self._decimal_separator in text or (self._thousands_separator in text and self._thousands_only.match(text)):
+            text = text.replace(self._thousands_separator, "").replace(self._decimal_separator, ".")
+        amount = float(text)
+        return -amount if negative else amount
+
+    def parse_date(self, text: str) -> str:
+        return parse_date(text, self.profile.day_first)
+
+    def iter_normalize(self, rows: Iterable[Dict[str, Any]],
+                       rejected: List[Tuple[Dict[str, Any], str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the transactions of `rows`, without the skipped ones.
+        Malformed rows are appended to `rejected` as (row, error), or raise if `rejected` is None.
+        """
+        skip = self.skip_pattern.search if self.skip_pattern else None
+        skipped = self._skipped
+        day_first = self.profile.day_first
+        parse_amount = self.parse_amount
+
+        for row in rows:
+            try:
+                concept = row["concept"]
+                if skip:
+                    # concepts repeat a lot, the pattern runs once per distinct concept
+                    is_skipped = skipped.get(concept)
+                    if is_skipped is None:
+                        is_skipped = skipped[concept] = skip(concept) is not None
+                    if is_skipped:
+                        continue
+                iso_date = parse_date(row["date"], day_first)
+                amount = row["amount"]
+                if amount.__class__ is not float:
+                    amount = parse_amount(amount)
+            except (KeyError, TypeError, ValueError, AttributeError, IndexError) as error:
+                if rejected is None:
+                    raise
+                rejected.append((row, str(error) or type(error).__name__))
+                continue
+            yield {"date": iso_date, "amount": amount, "concept": concept}
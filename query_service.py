@@ -0,0 +1,297 @@
+import os
+import json
+import asyncio
+import threading
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qsl
+from typing import List, Dict, Any, Set, Tuple
+
+from logger import logger
+from categorizer import Categorizer, get_default_categorizer
+from month_index import MonthIndex, Account, load_month_transactions
+
+
+MAX_SEARCH_LIMIT = 1000
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class QueryError(ValueError):
+    "Invalid query parameters (HTTP 400)"
+
+
+class MonthData:
+    """
+    One month file in memory: its transactions grouped by category and the per category totals.
+    """
+    def __init__(self, entry: Dict[str, str], categorizer: Categorizer):
+        self.bank = entry["bank"]
+        self.currency = entry["currency"]
+        self.period = entry["month"]
+        self.path = entry["path"]
+        stat = os.stat(self.path)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+
+        month_data, transactions = load_month_transactions(self.path)
+        self.str_month = month_data.get("str_month", self.period)
+        # file order, and the same rows grouped by category
+        self.transactions: List[Dict[str, Any]] = []
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for transaction in transactions:
+            category = categorizer.categorize(transaction["concept"], self.bank)
+            row = {
+                "date": transaction["date"],
+                "concept": transaction["concept"],
+                "amount": transaction["amount"],
+                "category": category,
+                # lowercased once, for the concept searches
+                "_search": transaction["concept"].lower(),
+            }
+            self.transactions.append(row)
+            self.by_category.setdefault(category, []).append(row)
+        self.totals = {
+            category: {"total": sum(transaction["amount"] for transaction in rows), "count": len(rows)}
+            for category, rows in self.by_category.items()
+        }
+
+    def summary(self, category: str = None) -> Dict[str, Any]:
+        totals = self.totals if category is None else {category: self.totals[category]} if category in self.totals else {}
+        return {
+            "bank": self.bank,
+            "currency": self.currency,
+            "period": self.period,
+            "month": self.str_month,
+            "total": sum(values["total"] for values in totals.values()),
+            "count": sum(values["count"] for values in totals.values()),
+            "categories": totals,
+        }
+
+
+class QueryIndex:
+    """
+    In-memory index of the month files in `data_dir`: account -> month -> category -> transactions.
+    `refresh` only loads the month files that are new or changed (size/mtime) and drops the
+    removed ones. Query results are kept in a bounded LRU, keyed by the index version, so a
+    reload never serves stale results.
+    """
+    def __init__(self, data_dir: str = "data", categorizer: Categorizer = None, month_index: MonthIndex = None,
+                 cache_size: int = 1024):
+        self.data_dir = data_dir
+        self.categorizer = categorizer or get_default_categorizer()
+        self.month_index = month_index or MonthIndex(data_dir)
+        self.months: Dict[str, MonthData] = {}
+        self.accounts: Dict[Account, Dict[str, MonthData]] = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        self.query = lru_cache(maxsize=cache_size)(self._query)
+
+    def refresh(self) -> Set[Account]:
+        """
+        Reloads the new/changed months and forgets the removed ones. Returns the affected accounts.
+        """
+        with self._lock:
+            self.month_index.refresh()
+            entries = {entry["path"]: entry for entry in self.month_index.get_entries()}
+            months = dict(self.months)
+            changed: Set[Account] = set()
+
+            for path in set(months) - set(entries):
+                month = months.pop(path)
+                changed.add((month.bank, month.currency))
+
+            for path, entry in entries.items():
+                month = months.get(path)
+                try:
+                    if month is not None:
+                        stat = os.stat(path)
+                        if month.signature == (stat.st_mtime_ns, stat.st_size):
+                            continue
+                    months[path] = MonthData(entry, self.categorizer)
+                except Exception as error:
+                    logger.error("Error leyendo %s:%s", path, str(error))
+                    months.pop(path, None)
+                changed.add((entry["bank"], entry["currency"]))
+
+            if not changed:
+                return changed
+
+            accounts: Dict[Account, Dict[str, MonthData]] = {}
+            for month in sorted(months.values(), key=lambda month: month.period):
+                accounts.setdefault((month.bank, month.currency), {})[month.period] = month
+
+            # swapped at once: the queries always see a complete index
+            self.months, self.accounts = months, accounts
+            self.version += 1
+            self.query.cache_clear()
+            logger.info("Indice actualizado: %s meses, cuentas con cambios: %s", len(months), sorted(changed))
+            return changed
+
+    def _select_months(self, params: Dict[str, str]) -> List[MonthData]:
+        bank, currency = params.get("bank", "").upper(), params.get("currency", "").upper()
+        since = params.get("from") or params.get("month") or ""
+        until = params.get("to") or params.get("month") or "9999-99"
+        return [
+            month
+            for (account_bank, account_currency), months in sorted(self.accounts.items())
+            if (not bank or account_bank == bank) and (not currency or account_currency == currency)
+            for period, month in months.items()
+            if since <= period <= until
+        ]
+
+    def get_accounts(self, params: Dict[str, str]) -> Dict[str, Any]:
+        return {"accounts": [
+            {"bank": bank, "currency": currency, "months": list(months)}
+            for (bank, currency), months in sorted(self.accounts.items())
+        ]}
+
+    def get_aggregates(self, params: Dict[str, str]) -> Dict[str, Any]:
+        category = params.get("category")
+        return {"results": [month.summary(category) for month in self._select_months(params)]}
+
+    def get_series(self, params: Dict[str, str]) -> Dict[str, Any]:
+        if not params.get("bank") or not params.get("currency"):
+            raise QueryError("bank and currency are required")
+        category = params.get("category")
+        series = []
+        for month in self._select_months(params):
+            summary = month.summary(category)
+            series.append({"period": month.period, "total": summary["total"], "count": summary["count"]})
+        return {"bank": params["bank"].upper(), "currency": params["currency"].upper(), "category": category, "series": series}
+
+    def search(self, params: Dict[str, str]) -> Dict[str, Any]:
+        text = params.get("q", "").lower()
+        category = params.get("category")
+        try:
+            limit = min(int(params.get("limit", 100)), MAX_SEARCH_LIMIT)
+        except ValueError:
+            raise QueryError("limit must be a number")
+
+        results = []
+        count = 0
+        for month in self._select_months(params):
+            transactions = month.by_category.get(category, []) if category else month.transactions
+            for transaction in transactions:
+                if text in transaction["_search"]:
+                    count += 1
+                    if len(results) < limit:
+                        results.append({
+                            "bank": month.bank, "currency": month.currency, "period": month.period,
+                            "date": transaction["date"], "concept": transaction["concept"],
+                            "amount": transaction["amount"], "category": transaction["category"],
+                        })
+        return {"count": count, "transactions": results}
+
+    ROUTES = {
+        "/accounts": get_accounts,
+        "/aggregates": get_aggregates,
+        "/series": get_series,
+        "/transactions": search,
+    }
+
+    def _query(self, version: int, path: str, params: Tuple[Tuple[str, str], ...]) -> bytes:
+        return json.dumps(self.ROUTES[path](self, dict(params)), ensure_ascii=False).encode("utf-8")
+
+    def get(self, target: str) -> bytes:
+        """
+        Answers a request target (ex: "/aggregates?bank=SANTANDER&month=2025-01") with the json body.
+        Raises KeyError for unknown paths and QueryError for invalid parameters.
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+        if path not in self.ROUTES:
+            raise KeyError(path)
+        return self.query(self.version, path, tuple(sorted(parse_qsl(url.query))))
+
+
+class QueryServer:
+    """
+    Read-only HTTP/1.1 server (asyncio, keep-alive) over a QueryIndex.
+    GET /accounts, /aggregates, /series, /transactions and /health return json.
+    The index is refreshed every `reload_interval` seconds in a worker thread.
+    """
+    def __init__(self, index: QueryIndex, host: str = "127.0.0.1", port: int = 8765, reload_interval: float = 5):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.reload_interval = reload_interval
+        self.server: asyncio.AbstractServer = None
+
+    def _respond(self, target: str) -> Tuple[int, bytes]:
+        if urlsplit(target).path.rstrip("/") == "/health":
+            return 200, json.dumps({"months": len(self.index.months), "version": self.index.version}).encode("utf-8")
+        try:
+            return 200, self.index.get(target)
+        except KeyError:
+            return 404, b'{"error": "not found"}'
+        except QueryError as error:
+            return 400, json.dumps({"error": str(error)}).encode("utf-8")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    status, body = 400, b'{"error": "bad request"}'
+                elif parts[0] != "GET":
+                    status, body = 405, b'{"error": "method not allowed"}'
+                else:
+                    status, body = self._respond(parts[1])
+
+                keep_alive = len(parts) == 3 and parts[2] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _reload_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await loop.run_in_executor(None, self.index.refresh)
+            except Exception as error:
+                logger.error("Error actualizando el indice: %s", str(error))
+
+    async def start(self):
+        self.index.refresh()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info("Query service en http://%s:%s (%s meses)", self.host, self.port, len(self.index.months))
+
+    async def serve_forever(self):
+        await self.start()
+        reload_task = asyncio.create_task(self._reload_loop()) if self.reload_interval else None
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            if reload_task:
+                reload_task.cancel()
+
+
+def serve(data_dir: str = "data", host: str = "127.0.0.1", port: int = 8765, reload_interval: float = 5,
+          cache_size: int = 1024):
+    server = QueryServer(QueryIndex(data_dir, cache_size=cache_size), host, port, reload_interval)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Query service stopped")
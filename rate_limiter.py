@@ -0,0 +1,25 @@
+import time
+import threading
+
+
+class RateLimiter:
+    """
+    Thread safe limiter that spaces calls to keep under `requests_per_minute`.
+    A value of 0 (or None) disables the limit.
+    """
+    def __init__(self, requests_per_minute: int = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+
+        if wait > 0:
+            time.sleep(wait)
@@ -1,46 +1,115 @@
 import os
 import json
+from string import Template
 from typing import List, Dict, Any
 
-import matplotlib.pyplot as plt
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 from dotenv import load_dotenv
 
 from logger import logger
-
-
-class Concept:
-    PEDIDOS_YA = "PEDIDOSYA"
-    UBER = "UBER"
-    DEVOTO = "DEVOTO"
-    LAVOMAT = "LAVOMAT"
-    MERPAGO = "MERPAGO"
-    OTHER = "OTHER"
+from storage import SQLiteStorage
+from aggregates_store import MonthAggregatesStore
+from analytics import CategoryAnalytics
+from categorizer import Categorizer, get_default_categorizer
+from chart_renderer import ChartRenderer
+from email_outbox import EmailOutbox, SMTPSender
+from month_index import select_window
+from metrics import metrics
+from utils import BATCH_FILE_EXTENSION, format_amount
+
+
+# months of history in the report
+REPORT_WINDOW_MONTHS = 6
+
+# email templates, parsed once
+EMAIL_TEMPLATE = Template("""\
+        <html>
+        <head>
+            <style>
+                table {
+                    border-collapse: collapse;
+                    width: 50%;
+                    margin-top: 10px;
+                    font-family: Arial, sans-serif;
+                }
+                th, td {
+                    border: 1px solid #ddd;
+                    padding: 8px;
+                    text-align: left;
+                }
+                th {
+                    background-color: #f2f2f2;
+                    font-weight: bold;
+                }
+                tr:nth-child(even) { background-color: #f9f9f9; }
+            </style>
+        </head>
+        <body>
+            <h3>Datos del ultimo mes ($month)</h3>
+            <table border="1">
+            <tr>
+                <th>Categoría</th>
+                <th>Importe ($$)</th>$analytics_headers
+            </tr>
+$rows
+            </table>
+            <p>Adjunto se encuentra la gráfica de la evolución de conceptos en $history.</p>
+        </body>
+        </html>
+        """)
+EMAIL_ANALYTICS_HEADERS = """
+                <th>vs mes anterior</th>
+                <th>Media 3 meses</th>
+                <th>Percentil</th>
+                <th>Alerta</th>"""
+EMAIL_ROW_TEMPLATE = Template("""\
+            <tr$style>
+                <td>$cat</td>
+                <td>$value</td>$stats
+            </tr>""")
+EMAIL_STATS_TEMPLATE = Template("""
+                <td>$delta</td>
+                <td>$rolling_mean</td>
+                <td>$percentile</td>
+                <td>$alert</td>""")
 
 
 class ReportService:
     """
-    Logic to generate a report for the last 6 months based on available history.
+    Logic to generate a report for the last `window` months (6 by default) based on available history.
     Compare by concept grouping and send an email with the information.
+    Only the month files inside the window are read.
     """
-    def __init__(self, currency: str, bank: str, json_files: List[str]):
+    def __init__(self, currency: str, bank: str, json_files: List[str] = None, storage: SQLiteStorage = None,
+                 aggregates_store: MonthAggregatesStore = None, categorizer: Categorizer = None,
+                 chart_renderer: ChartRenderer = None, outbox: EmailOutbox = None,
+                 window: int = REPORT_WINDOW_MONTHS, analytics: CategoryAnalytics = None):
         self.currency = currency.upper()
         self.bank = bank.upper()
-        self.json_files = json_files
-
+        self.window = window
+        self.json_files = select_window(json_files or [], window)
+        self.storage = storage
+        self.aggregates_store = aggregates_store
+        self.categorizer = categorizer or get_default_categorizer()
+        self.chart_renderer = chart_renderer or ChartRenderer()
+        self.outbox = outbox or EmailOutbox()
+        # without a persisted state, the statistics only cover the months of the report
+        self.analytics = analytics or CategoryAnalytics(state_path=None)
+
+    @metrics.timed("report.load", count=len)
     def get_data_from_json_files(self) -> List[Dict[str, Any]]:
-        # filter: bank & currency configs
-        # json_data_files = [
-        #     file for file in self.json_files if self.bank in file and self.currency in file
-        # ]
-        json_data_files = self.json_files
         data = []
 
-        for path in json_data_files:
+        for path in self.json_files:
             try:
+                if path.endswith(BATCH_FILE_EXTENSION):
+                    from transaction_batch import TransactionBatch
+
+                    batch = TransactionBatch.load(path)
+                    data.append({**batch.meta, "batch": batch})
+                    continue
                 with open(path, "r", encoding="utf-8") as f:
                     json_info = json.load(f)
                     data.append(json_info)
@@ -48,129 +117,176 @@ class ReportService:
                 logger.error("Error leyendo %s:%s", path, str(error))
         return data
 
+    @metrics.timed("report.aggregate")
     def _get_agrupations_by_months_and_concepts(self, month_data: Dict[str, Any]):
-        agrupations = {
-            Concept.PEDIDOS_YA: 0.0,
-            Concept.UBER: 0.0,
-            Concept.DEVOTO: 0.0,
-            Concept.LAVOMAT: 0.0,
-            Concept.MERPAGO: 0.0,
-            Concept.OTHER: 0.0,
-        }
-        transactions = month_data["transactions"]
-
-        for transaction in transactions:
-            concept = transaction["concept"]
-
-            if Concept.PEDIDOS_YA in concept:
-                agrupations[Concept.PEDIDOS_YA] += transaction["amount"]
-            elif Concept.UBER in concept:
-                agrupations[Concept.UBER] += transaction["amount"]
-            elif Concept.DEVOTO in concept:
-                agrupations[Concept.DEVOTO] += transaction["amount"]
-            elif Concept.LAVOMAT in concept:
-                agrupations[Concept.LAVOMAT] += transaction["amount"]
-            elif Concept.MERPAGO in concept:
-                agrupations[Concept.MERPAGO] += transaction["amount"]
-            else:
-                agrupations[Concept.OTHER] += transaction["amount"]
+        bank = month_data.get("bank", self.bank)
+        categorize = self.categorizer.categorize
+
+        if "batch" in month_data:
+            return month_data["batch"].sum_by_category(
+                lambda concept: categorize(concept, bank), self.categorizer.categories
+            )
+
+        agrupations = self.categorizer.empty_agrupations()
+
+        for transaction in month_data["transactions"]:
+            agrupations[categorize(transaction["concept"], bank)] += transaction["amount"]
 
         return agrupations
 
-    def get_agrupations_by_months_and_concepts(self) -> List[Dict[str, float]]:
-        all_transactions_data = self.data
+    @metrics.timed("report.storage_aggregate", count=len)
+    def _get_agrupations_from_storage(self) -> List[Dict[str, Any]]:
+        months = self.storage.get_months(self.bank, self.currency, self.window)
+        if not months:
+            return []
+
+        sums = self.storage.get_category_sums(
+            self.bank, self.currency,
+            lambda concept: self.categorizer.categorize(concept, self.bank),
+            self.categorizer.categories,
+            since_month=months[0]["month"],
+        )
+
+        return [
+            {
+                "month": month_data["str_month"],
+                "period": month_data["month"],
+                "agrupations": sums.get(month_data["month"], self.categorizer.empty_agrupations()),
+            }
+            for month_data in months
+        ]
+
+    @staticmethod
+    def _load_month_content(path: str, content: bytes) -> Dict[str, Any]:
+        if path.endswith(BATCH_FILE_EXTENSION):
+            from transaction_batch import load_month_content
+
+            return load_month_content(path, content)
+        return json.loads(content)
+
+    @metrics.timed("report.aggregates_store", count=len)
+    def _get_agrupations_from_aggregates_store(self) -> List[Dict[str, Any]]:
+        signature = self.categorizer.signature
         data = []
 
-        for month_data in all_transactions_data:
+        for path in self.json_files:
+            try:
+                entry = self.aggregates_store.get_or_compute(
+                    path, self._get_agrupations_by_months_and_concepts, signature,
+                    load=lambda content: self._load_month_content(path, content),
+                )
+            except Exception as error:
+                logger.error("Error leyendo %s:%s", path, str(error))
+                continue
             data.append({
-                "month": month_data["str_month"],
-                "agrupations": self._get_agrupations_by_months_and_concepts(month_data),
+                "month": entry["str_month"],
+                "period": entry["month"],
+                "agrupations": entry["agrupations"],
             })
 
-        # Create the plot
-        plt.figure(figsize=(10, 6))
-
-        # Get all the categories (assuming they are the same for all months)
-        categories = data[0]["agrupations"].keys()
-
-        # Plot the data for the category
-        for category in categories:
-            # Get the values for each month for the current category
-            values = [entry["agrupations"][category] for entry in data]
-            months = [entry["month"] for entry in data]
-            
-            plt.plot(months, values, marker="o", linestyle="-", label=category)
-
-            # Add the text with the value next to each point
-            for i, val in enumerate(values):
-                plt.text(months[i], val, f"{val:,.1f}", fontsize=10, ha="left", va="bottom")
+        self.aggregates_store.save()
+        return data
 
-        plt.title("Evolución de Conceptos")
-        plt.xlabel("Mes")
-        plt.ylabel("Importe ($)")
-        plt.xticks(rotation=45)
+    def get_monthly_agrupations(self) -> List[Dict[str, Any]]:
+        if self.storage:
+            return self._get_agrupations_from_storage()
+        if self.aggregates_store:
+            return self._get_agrupations_from_aggregates_store()
 
-        plt.grid(True)
-        plt.legend()
+        self.data = self.get_data_from_json_files()
+        data = []
 
-        # plt.tight_layout()
-        # plt.show()
-        plt.savefig("tmp/grafica.png")
-        plt.close()
+        for month_data in self.data:
+            data.append({
+                "month": month_data["str_month"],
+                "period": month_data["month"],
+                "agrupations": self._get_agrupations_by_months_and_concepts(month_data),
+            })
         return data
 
-    def get_html_table(self, data: Dict[str, Any]) -> str:
-        html = """\
-        <html>
-        <head>
-            <style>
-                table {
-                    border-collapse: collapse;
-                    width: 50%;
-                    margin-top: 10px;
-                    font-family: Arial, sans-serif;
-                }
-                th, td {
-                    border: 1px solid #ddd;
-                    padding: 8px;
-                    text-align: left;
-                }
-                th {
-                    background-color: #f2f2f2;
-                    font-weight: bold;
-                }
-                tr:nth-child(even) { background-color: #f9f9f9; }
-            </style>
-        </head>
-        <body>
-            <h3>Datos del ultimo mes ({**month**})</h3>
-            <table border="1">
-            <tr>
-                <th>Categoría</th>
-                <th>Importe ($)</th>
-            </tr>
-        """.replace("{**month**}", data["month"])
-
-        for cat, value in data["agrupations"].items():
-            formatted_value = f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-            html += """\
-            <tr>
-                <td>{cat}</td>
-                <td>{value}</td>
-            </tr>""".format(cat=cat, value=formatted_value)
+    def get_agrupations_by_months_and_concepts(self) -> List[Dict[str, float]]:
+        return self.get_monthly_agrupations()
 
-        html += """\
-            </table>
-            <p>Adjunto se encuentra la gráfica de la evolución de conceptos en los ultimos 6 meses de historico.</p>
-        </body>
-        </html>
+    @metrics.timed("report.chart")
+    def render_chart(self, data: List[Dict[str, Any]]) -> str:
+        """
+        Returns the path of the chart of this report (only rendered when the data changed).
         """
-        return html
+        return self.chart_renderer.render(f"{self.bank}_{self.currency}", data)
 
-    def send_email(self, agg_categories_data: List[Dict[str, float]]):
+    @metrics.timed("report.analytics")
+    def get_analytics(self, data: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Statistics of the last month of `data` per category (see CategoryAnalytics.analyze).
+        """
+        analytics = self.analytics.get_month_analytics(f"{self.bank}_{self.currency}", data, self.categorizer.signature)
+        self.analytics.save()
+
+        for category, stats in analytics.items():
+            if stats["anomaly"]:
+                logger.info(
+                    "Gasto anomalo %s %s %s: %.2f (media 3 meses %.2f, p=%.4f)",
+                    self.bank, self.currency, category, stats["amount"], stats["rolling_mean"], stats["p_value"]
+                )
+        return analytics
+
+    @metrics.timed("report.html")
+    def get_html_table(self, data: Dict[str, Any], analytics: Dict[str, Dict[str, Any]] = None,
+                       months: int = None) -> str:
+        """
+        `months`: months in the chart, the report window by default.
+        """
+        rows = []
+        for cat, value in data["agrupations"].items():
+            stats = analytics.get(cat) if analytics else None
+            rows.append(EMAIL_ROW_TEMPLATE.substitute(
+                cat=cat,
+                value=format_amount(value),
+                style=' style="background-color: #fdecea;"' if stats and stats["anomaly"] else "",
+                stats=self._get_html_stats(stats) if stats else "",
+            ))
+
+        return EMAIL_TEMPLATE.substitute(
+            month=data["month"],
+            analytics_headers=EMAIL_ANALYTICS_HEADERS if analytics else "",
+            rows="".join(rows),
+            history=self._get_history_text(months or self.window),
+        )
+
+    @staticmethod
+    def _get_history_text(months: int = None) -> str:
+        if not months:
+            return "todo el historico"
+        if months == 1:
+            return "el ultimo mes"
+        return f"los ultimos {months} meses de historico"
+
+    @staticmethod
+    def _get_html_stats(stats: Dict[str, Any]) -> str:
+        if stats["delta"] is None:
+            delta = "-"
+        elif stats["delta_pct"] is None:
+            delta = format_amount(stats["delta"])
+        else:
+            delta = f"{format_amount(stats['delta'])} ({stats['delta_pct']:+.0f}%)"
+
+        return EMAIL_STATS_TEMPLATE.substitute(
+            delta=delta,
+            rolling_mean=format_amount(stats["rolling_mean"]),
+            percentile=f"{stats['percentile']:.0f}",
+            alert=f"Gasto inusual (p={stats['p_value']:.3f})" if stats["anomaly"] else "",
+        )
+
+    def send_email(self, agg_categories_data: List[Dict[str, float]], chart_path: str,
+                   analytics: Dict[str, Dict[str, Any]] = None):
+        """
+        Renders the email and leaves it in the outbox, the SMTP send happens in `SMTPSender.drain`.
+        """
         agrupations_current_month = agg_categories_data[-1]
         sender_email = os.getenv("SENDER_EMAIL")
-        html_table = self.get_html_table(agrupations_current_month)
+        if analytics is None:
+            analytics = self.get_analytics(agg_categories_data)
+        html_table = self.get_html_table(agrupations_current_month, analytics, len(agg_categories_data))
 
         msg = MIMEMultipart()
         msg["From"] = sender_email
@@ -180,25 +296,28 @@ class ReportService:
         msg.attach(MIMEText(html_table, "html"))
 
         try:
-            with open("tmp/grafica.png", "rb") as f:
+            with open(chart_path, "rb") as f:
                 img = MIMEImage(f.read())
                 img.add_header("Content-ID", "<grafica>")
                 msg.attach(img)
 
-            with smtplib.SMTP("smtp.gmail.com", 587) as server:
-                server.starttls()
-                server.login(sender_email, os.getenv("PASSW_APPLICATION_EMAIL"))
-                server.send_message(msg)
-                logger.info("Email enviado")
+            with metrics.span("report.email_enqueue"):
+                self.outbox.enqueue(msg)
         except Exception as e:
-            logger.error(f"Error al enviar el correo: {e}")
+            logger.error(f"Error al generar el correo: {e}")
 
     def generate(self, send_email: bool = False):
-        self.data = self.get_data_from_json_files()
         agg_categories_data = self.get_agrupations_by_months_and_concepts()
+        if not agg_categories_data:
+            logger.error("No data for the report %s %s", self.bank, self.currency)
+            return
+
+        self.publish(agg_categories_data, self.render_chart(agg_categories_data), send_email)
 
+    def publish(self, agg_categories_data: List[Dict[str, Any]], chart_path: str, send_email: bool = False):
+        analytics = self.get_analytics(agg_categories_data)
         if send_email:
-            return self.send_email(agg_categories_data)
+            return self.send_email(agg_categories_data, chart_path, analytics)
         print(agg_categories_data)
 
 
@@ -214,5 +333,8 @@ if __name__ == "__main__":
             "data/example_manual.json",
             "data/example_ai.json",
         ],
+        aggregates_store=MonthAggregatesStore(),
+        analytics=CategoryAnalytics(),
     )
     report.generate(send_email=True)
+    SMTPSender.from_env().drain(report.outbox)
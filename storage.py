@@ -0,0 +1,252 @@
+import sys
+import glob
+import json
+import sqlite3
+import itertools
+from contextlib import closing
+from typing import List, Dict, Any, Iterable, Callable, Tuple
+
+from logger import logger
+import utils
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS months (
+    bank TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    month TEXT NOT NULL,
+    str_month TEXT NOT NULL,
+    transactions_total_amount REAL NOT NULL,
+    PRIMARY KEY (bank, currency, month)
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    bank TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    month TEXT NOT NULL,
+    date TEXT NOT NULL,
+    concept TEXT NOT NULL,
+    amount REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_account_month ON transactions (bank, currency, month);
+CREATE INDEX IF NOT EXISTS idx_transactions_concept ON transactions (concept);
+"""
+
+
+class SQLiteStorage:
+    """
+    Local SQLite storage for the parsed transactions, replacing the data/*.json files.
+    A connection is opened per operation, so the same instance can be shared between threads.
+    """
+    def __init__(self, db_path: str = "data/transactions.db"):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def save_month(self, bank: str, currency: str, month: str, transactions: List[Dict[str, Any]]):
+        """
+        Replaces the transactions of the month in a single database transaction.
+        """
+        self.save_month_stream(bank, currency, month, transactions)
+
+    def save_month_stream(self, bank: str, currency: str, month: str, transactions: Iterable[Dict[str, Any]],
+                          chunk_size: int = 5000) -> int:
+        """
+        Same as `save_month`, but inserts `transactions` (any iterable, ex: a generator)
+        in chunks of `chunk_size`, so memory doesn't grow with the size of the month.
+        The rows are staged in a temp table while the iterable is consumed; the month is only
+        replaced once it is complete, in a short transaction, so slow producers don't hold the
+        write lock and a failed one leaves the previous data in place.
+        Returns the number of saved transactions.
+        """
+        bank, currency, month = bank.upper(), currency.upper(), month.upper()
+        transactions = iter(transactions)
+        count = 0
+        total_amount = 0.0
+
+        with closing(self._connect()) as conn:
+            conn.execute("CREATE TEMP TABLE staged_transactions (date TEXT, concept TEXT, amount REAL)")
+            with conn:
+                while True:
+                    rows = [
+                        (tran["date"], tran["concept"], tran["amount"])
+                        for tran in itertools.islice(transactions, chunk_size)
+                    ]
+                    if not rows:
+                        break
+                    conn.executemany("INSERT INTO temp.staged_transactions (date, concept, amount) VALUES (?, ?, ?)", rows)
+                    count += len(rows)
+                    total_amount += sum(row[2] for row in rows)
+
+            with conn:
+                conn.execute(
+                    "DELETE FROM transactions WHERE bank = ? AND currency = ? AND month = ?",
+                    (bank, currency, month)
+                )
+                conn.execute(
+                    """
+                    INSERT INTO transactions (bank, currency, month, date, concept, amount)
+                    SELECT ?, ?, ?, date, concept, amount FROM temp.staged_transactions ORDER BY rowid
+                    """,
+                    (bank, currency, month)
+                )
+                conn.execute(
+                    """
+                    INSERT INTO months (bank, currency, month, str_month, transactions_total_amount)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (bank, currency, month) DO UPDATE SET
+                        str_month = excluded.str_month,
+                        transactions_total_amount = excluded.transactions_total_amount
+                    """,
+                    (bank, currency, month, utils.month_str_to_month_name(month), total_amount)
+                )
+        logger.info("Saved %s transactions of %s %s %s in %s", count, bank, month, currency, self.db_path)
+        return count
+
+    def get_months(self, bank: str, currency: str, window: int = None) -> List[Dict[str, Any]]:
+        """
+        Months of the account in calendar order, only the `window` most recent ones if given.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT month, str_month, bank, currency, transactions_total_amount
+                FROM months
+                WHERE bank = ? AND currency = ?
+                ORDER BY month DESC
+                LIMIT ?
+                """,
+                (bank.upper(), currency.upper(), window or -1)
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def get_transactions(self, bank: str, currency: str, month: str) -> List[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT date, amount, concept
+                FROM transactions
+                WHERE bank = ? AND currency = ? AND month = ?
+                ORDER BY id
+                """,
+                (bank.upper(), currency.upper(), month.upper())
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_category_sums(self, bank: str, currency: str, categorize: Callable[[str], str],
+                          categories: List[str], since_month: str = "") -> Dict[str, Dict[str, float]]:
+        """
+        Sums the amounts per month and category in SQL, from `since_month` (YYYY-MM) on.
+        `categorize` is registered as a SQL function and only called once per
+        distinct (month, concept), after the per concept aggregate.
+        Returns {month: {category: amount}}, with every category present in each month.
+        """
+        with closing(self._connect()) as conn:
+            conn.create_function("categorize", 1, categorize, deterministic=True)
+            rows = conn.execute(
+                """
+                SELECT month, categorize(concept) AS category, SUM(amount) AS amount
+                FROM (
+                    SELECT month, concept, SUM(amount) AS amount
+                    FROM transactions
+                    WHERE bank = ? AND currency = ? AND month >= ?
+                    GROUP BY month, concept
+                )
+                GROUP BY month, category
+                ORDER BY month
+                """,
+                (bank.upper(), currency.upper(), since_month.upper())
+            ).fetchall()
+
+        sums: Dict[str, Dict[str, float]] = {}
+        for row in rows:
+            month_sums = sums.setdefault(row["month"], {category: 0.0 for category in categories})
+            month_sums[row["category"]] = row["amount"]
+        return sums
+
+    def get_all_months(self) -> List[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT month, str_month, bank, currency, transactions_total_amount
+                FROM months
+                ORDER BY bank, currency, month
+                """
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_all_category_sums(self, categorize: Callable[[str, str], str], categories: List[str],
+                              since_months: Dict[Tuple[str, str], str] = None) -> Dict[Tuple[str, str], Dict[str, Dict[str, float]]]:
+        """
+        Same as `get_category_sums`, for every account in a single query.
+        `categorize` receives (concept, bank).
+        `since_months` ({(bank, currency): YYYY-MM}) limits the sums to those accounts, from that month on.
+        Returns {(bank, currency): {month: {category: amount}}}.
+        """
+        if since_months is None:
+            source, params = "transactions", []
+        elif not since_months:
+            return {}
+        else:
+            # one range scan of the (bank, currency, month) index per account
+            source = f"""
+                transactions JOIN (VALUES {", ".join(["(?, ?, ?)"] * len(since_months))}) AS since
+                ON transactions.bank = since.column1 AND transactions.currency = since.column2
+                AND transactions.month >= since.column3
+            """
+            params = [
+                value
+                for (bank, currency), month in sorted(since_months.items())
+                for value in (bank.upper(), currency.upper(), month.upper())
+            ]
+
+        with closing(self._connect()) as conn:
+            conn.create_function("categorize", 2, categorize, deterministic=True)
+            rows = conn.execute(
+                f"""
+                SELECT bank, currency, month, categorize(concept, bank) AS category, SUM(amount) AS amount
+                FROM (
+                    SELECT transactions.bank AS bank, transactions.currency AS currency, transactions.month AS month,
+                           transactions.concept AS concept, SUM(transactions.amount) AS amount
+                    FROM {source}
+                    GROUP BY transactions.bank, transactions.currency, transactions.month, transactions.concept
+                )
+                GROUP BY bank, currency, month, category
+                ORDER BY bank, currency, month
+                """,
+                params
+            ).fetchall()
+
+        sums: Dict[Tuple[str, str], Dict[str, Dict[str, float]]] = {}
+        for row in rows:
+            account_sums = sums.setdefault((row["bank"], row["currency"]), {})
+            month_sums = account_sums.setdefault(row["month"], {category: 0.0 for category in categories})
+            month_sums[row["category"]] = row["amount"]
+        return sums
+
+    def import_json_files(self, json_files: Iterable[str]):
+        """
+        One shot importer for the data/*.json files written by the parsers.
+        """
+        for path in json_files:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    month_data = json.load(f)
+                self.save_month(
+                    month_data["bank"], month_data["currency"], month_data["month"], month_data["transactions"]
+                )
+            except Exception as error:
+                logger.error("Error importando %s:%s", path, str(error))
+
+
+if __name__ == "__main__":
+    # python storage.py [data/*.json ...]
+    files = sys.argv[1:] or sorted(glob.glob("data/*.json"))
+    SQLiteStorage().import_json_files(files)
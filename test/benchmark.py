@@ -0,0 +1,170 @@
+"""
+Benchmarks of the parsing/report hot paths over synthetic data (see synthetic_data.py).
+No network: the AI stages run over generated Gemini-like responses.
+
+    python test/benchmark.py --transactions 100000 --months 6
+    python test/benchmark.py --compare bench_results/<old>.json bench_results/<new>.json
+
+Results are written as json (one file per run, named after the commit) so
+regressions can be compared between commits.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from typing import List, Dict, Any, Callable
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic_data
+from transactions_parser import ManualTransactionsParserService, AITransactionsParserService
+from report_service import ReportService
+from categorizer import Categorizer
+from chart_renderer import render_chart
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Times `repeat` runs of `fn`, then runs it once more under tracemalloc for the peak memory
+    (tracing slows the code down, so it is kept out of the timings).
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+        "peak_memory_bytes": peak,
+        "repeat": repeat,
+    }
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(transactions: int, months: int, repeat: int, work_dir: str, seed: int = 0) -> Dict[str, Any]:
+    bank, currency = "SANTANDER", "UY$"
+    month_list = synthetic_data.months_range("2024-01", months)
+    month = month_list[-1]
+    categorizer = Categorizer.from_file(os.path.join(ROOT_DIR, "categories.json"))
+
+    input_lines = list(synthetic_data.generate_input_lines(month, transactions, seed))
+    ai_text = synthetic_data.generate_ai_response(month, transactions, seed)
+    json_files = synthetic_data.write_month_files(
+        os.path.join(work_dir, "data"), bank, currency, month_list, transactions, seed
+    )
+
+    manual_parser = ManualTransactionsParserService(bank, currency, month, input_path="synthetic")
+    ai_parser = AITransactionsParserService(bank, currency, month, pdf_path=None, google_ai_api_key=None)
+    ai_rows = ai_parser.json_ai_text_to_transactions(ai_text)
+    report = ReportService(currency, bank, json_files=json_files, categorizer=categorizer)
+    months_data = report.get_data_from_json_files()
+    agrupations = report.get_monthly_agrupations()
+    chart_path = os.path.join(work_dir, "chart.png")
+
+    benchmarks = {
+        "manual_parse_transactions": (lambda: manual_parser.parse_transactions(input_lines), transactions),
+        "ai_json_text_to_transactions": (lambda: ai_parser.json_ai_text_to_transactions(ai_text), transactions),
+        "ai_transform_transactions": (lambda: ai_parser.transform_transactions(ai_rows), transactions),
+        "report_get_data_from_json_files": (report.get_data_from_json_files, transactions * months),
+        "report_agrupations_by_month": (
+            lambda: [report._get_agrupations_by_months_and_concepts(month_data) for month_data in months_data],
+            transactions * months,
+        ),
+        "report_render_chart": (lambda: render_chart(agrupations, chart_path), months),
+        "report_get_analytics": (lambda: report.get_analytics(agrupations), len(agrupations[-1]["agrupations"])),
+        "report_get_html_table": (
+            lambda: report.get_html_table(agrupations[-1], report.get_analytics(agrupations)),
+            len(agrupations[-1]["agrupations"]),
+        ),
+    }
+
+    results = {}
+    for name, (fn, items) in benchmarks.items():
+        result = measure(fn, repeat)
+        result["items"] = items
+        result["items_per_second"] = items / result["seconds_min"] if result["seconds_min"] else None
+        results[name] = result
+        print(f"{name:36} {result['seconds_min'] * 1000:10.2f} ms {result['peak_memory_bytes'] / 2**20:10.2f} MiB")
+
+    return {
+        "commit": get_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "transactions_per_month": transactions,
+        "months": months,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(old_path: str, new_path: str) -> List[str]:
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)["results"]
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)["results"]
+
+    lines = []
+    for name in sorted(set(old) & set(new)):
+        time_ratio = new[name]["seconds_min"] / old[name]["seconds_min"]
+        memory_ratio = new[name]["peak_memory_bytes"] / max(old[name]["peak_memory_bytes"], 1)
+        lines.append(f"{name:36} time x{time_ratio:6.2f}   memory x{memory_ratio:6.2f}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parsers and the report over synthetic data")
+    parser.add_argument("--transactions", type=int, default=10000, help="Transactions per month (default: 10000)")
+    parser.add_argument("--months", type=int, default=6, help="Months of history (default: 6)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (default: 3)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default="bench_results", help="Folder for the json results (default: bench_results)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two results files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print("\n".join(compare(*args.compare)))
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        report = run_benchmarks(args.transactions, args.months, args.repeat, work_dir, args.seed)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(
+        args.output_dir, f"{report['commit']}_{args.transactions}x{args.months}_{int(time.time())}.json"
+    )
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved in: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
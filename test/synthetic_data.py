@@ -0,0 +1,129 @@
+"""
+Synthetic statements for tests and benchmarks: input/*.txt dumps, Gemini-like
+responses and data/*.json month files, from a few rows up to millions.
+Deterministic for a given seed, no network needed.
+"""
+import os
+import json
+import random
+import calendar
+from typing import List, Dict, Any, Iterator
+
+MERCHANTS = [
+    "PEDIDOSYA PROPINA", "PEDIDOSYA BURGER KING", "PEDIDOSYA COSTO DE EN", "UBER TRIP", "UBER EATS",
+    "DEVOTO SUC 12", "DEVOTO EXPRESS", "LAVOMAT POCITOS", "MERPAGO*MERCADOLIBRE", "MERPAGO*FARMASHOP",
+    "TIENDA INGLESA", "DISCO 7", "ANCAP ESTACION", "NETFLIX.COM", "SPOTIFY", "STEAM PURCHASE",
+    "FARMACIA SAN ROQUE", "ZARA MONTEVIDEO", "MCDONALDS", "AMAZON MKTPLACE",
+]
+# rows the parsers must skip
+SKIPPED_ROWS = ["SALDO ANTERIOR", "PAGOS", "SEGURO SALDO DEUDOR"]
+
+
+def format_amount(amount: float) -> str:
+    "1234.5 -> '1.234,50' and -1234.5 -> '1.234,50-', as printed in the statements"
+    text = f"{abs(amount):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return text + "-" if amount < 0 else text
+
+
+def months_range(start_month: str, count: int) -> List[str]:
+    year, month = (int(part) for part in start_month.split("-"))
+    months = []
+    for _ in range(count):
+        months.append(f"{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+
+def generate_rows(month: str, count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Yields {"date": "DD/MM/YYYY", "concept", "amount": float}, ~2% of them refunds.
+    """
+    rng = random.Random(f"{seed}-{month}")
+    year, month_number = (int(part) for part in month.split("-"))
+    days = calendar.monthrange(year, month_number)[1]
+
+    for _ in range(count):
+        amount = round(rng.lognormvariate(6, 1.2), 2)
+        if rng.random() < 0.02:
+            amount = -amount
+        yield {
+            "date": f"{rng.randint(1, days):02d}/{month_number:02d}/{year}",
+            "concept": rng.choice(MERCHANTS),
+            "amount": amount,
+        }
+
+
+def generate_input_lines(month: str, count: int, seed: int = 0) -> Iterator[str]:
+    "Lines like the ones pasted in input/*.txt: '27/03/2025 650 UBER TRIP 260,70'"
+    for row in generate_rows(month, count, seed):
+        yield f"{row['date']} 650 {row['concept']} {format_amount(row['amount'])}"
+
+
+def generate_ai_response(month: str, count: int, seed: int = 0) -> str:
+    "Gemini-like answer: a Markdown fenced json list with amounts as strings"
+    rows = [
+        {"date": row["date"], "concept": row["concept"], "amount": format_amount(row["amount"])}
+        for row in generate_rows(month, count, seed)
+    ]
+    rows.insert(0, {"date": f"01/{month[5:]}/{month[:4]}", "concept": SKIPPED_ROWS[0], "amount": "12.022,89"})
+    return "```json\n" + json.dumps(rows, indent=2, ensure_ascii=False) + "\n```"
+
+
+def generate_month_data(bank: str, currency: str, month: str, count: int, seed: int = 0) -> Dict[str, Any]:
+    "Month data in the data/*.json format written by the parsers"
+    transactions = [
+        {"date": row["date"].replace("/", "-"), "amount": row["amount"], "concept": row["concept"]}
+        for row in generate_rows(month, count, seed)
+    ]
+    return {
+        "month": month,
+        "str_month": month,
+        "bank": bank.upper(),
+        "currency": currency.upper(),
+        "transactions_total_amount": sum(tran["amount"] for tran in transactions),
+        "transactions": transactions,
+    }
+
+
+def write_input_files(input_dir: str, bank: str, currency: str, months: List[str], count: int, seed: int = 0) -> List[str]:
+    os.makedirs(input_dir, exist_ok=True)
+    paths = []
+    for month in months:
+        path = os.path.join(input_dir, f"{bank.lower()}_{month}_{currency.lower()}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for line in generate_input_lines(month, count, seed):
+                f.write(line + "\n")
+        paths.append(path)
+    return paths
+
+
+def write_month_files(data_dir: str, bank: str, currency: str, months: List[str], count: int, seed: int = 0) -> List[str]:
+    os.makedirs(data_dir, exist_ok=True)
+    paths = []
+    for month in months:
+        path = os.path.join(data_dir, f"{bank.upper()}_{month}_{currency.upper()}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(generate_month_data(bank, currency, month, count, seed), f)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write synthetic input/ and data/ files")
+    parser.add_argument("--output-dir", default="tmp/synthetic")
+    parser.add_argument("--bank", default="SANTANDER")
+    parser.add_argument("--currency", default="UY$")
+    parser.add_argument("--start-month", default="2024-01")
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--transactions", type=int, default=200, help="Transactions per month")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    month_list = months_range(args.start_month, args.months)
+    write_input_files(os.path.join(args.output_dir, "input"), args.bank, args.currency, month_list, args.transactions, args.seed)
+    write_month_files(os.path.join(args.output_dir, "data"), args.bank, args.currency, month_list, args.transactions, args.seed)
+    print(f"Written {args.months} months x {args.transactions} transactions in {args.output_dir}")
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_cache import AIResponseCache
+from transactions_parser import AITransactionsParserService
+
+RESPONSE = '[{"date": "01/03/2025", "concept": "UBER TRIP", "amount": "260,70"}]'
+
+
+class AIResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = AIResponseCache(os.path.join(self.tmp_dir.name, "cache"), max_entries=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_hit_and_miss(self):
+        key = AIResponseCache.build_key(b"%PDF", "prompt", "model")
+        self.assertIsNone(self.cache.get(key))
+
+        self.cache.set(key, RESPONSE)
+        self.assertEqual(self.cache.get(key)["response_text"], RESPONSE)
+        self.assertIsNone(self.cache.get(AIResponseCache.build_key(b"%PDF other", "prompt", "model")))
+
+    def test_key_changes_with_the_model_and_the_prompt(self):
+        key = AIResponseCache.build_key(b"%PDF", "prompt", "model")
+        self.assertEqual(key, AIResponseCache.build_key(b"%PDF", "prompt", "model"))
+        self.assertNotEqual(key, AIResponseCache.build_key(b"%PDF", "prompt", "other model"))
+        self.assertNotEqual(key, AIResponseCache.build_key(b"%PDF", "other prompt", "model"))
+
+    def test_corrupt_and_expired_entries_are_misses(self):
+        key = AIResponseCache.build_key(b"%PDF", "prompt", "model")
+        self.cache.set(key, RESPONSE)
+        path = os.path.join(self.cache.cache_dir, f"{key}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"response_text": "[')
+        self.assertIsNone(self.cache.get(key))
+
+        self.cache.set(key, RESPONSE)
+        os.utime(path, (0, 0))
+        self.assertIsNone(self.cache.get(key))
+        self.assertFalse(os.path.exists(path))
+
+    def test_only_the_newest_entries_are_kept(self):
+        keys = [AIResponseCache.build_key(bytes([index]), "prompt", "model") for index in range(3)]
+        created_at = time.time() - 100
+        for index, key in enumerate(keys):
+            self.cache.set(key, RESPONSE)
+            os.utime(os.path.join(self.cache.cache_dir, f"{key}.json"), (created_at + index, created_at + index))
+        self.cache.evict()
+        self.assertEqual([self.cache.get(key) is not None for key in keys], [False, True, True])
+
+
+class CachedParserTest(unittest.TestCase):
+    def test_hits_are_transformed_again(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = AIResponseCache(os.path.join(tmp_dir, "cache"))
+            parser = AITransactionsParserService("SANTANDER", "UY$", "2025-03", pdf_path=None,
+                                                 google_ai_api_key="key", cache=cache)
+            with mock.patch.object(parser, "decrypt_pdf", return_value=b"%PDF"):
+                with mock.patch.object(parser, "stream_pdf_data_with_ai", return_value=iter([RESPONSE])):
+                    first, _ = parser.get_transactions()
+
+                # entry of an older version, with the transactions already transformed
+                [filename] = os.listdir(cache.cache_dir)
+                with open(os.path.join(cache.cache_dir, filename), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                self.assertEqual(set(entry), {"created_at", "response_text"})
+                entry.update(transactions=[{"date": "01-03-2025", "amount": 260.7, "concept": "UBER TRIP"}], total=260.7)
+                with open(os.path.join(cache.cache_dir, filename), "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+
+                with mock.patch.object(parser, "stream_pdf_data_with_ai", side_effect=AssertionError("no cache hit")):
+                    second, total = parser.get_transactions()
+
+        self.assertEqual(second, first)
+        self.assertEqual(second[0]["date"], "2025-03-01")
+        self.assertAlmostEqual(total, 260.7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import sys
+import statistics
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import CategoryAnalytics
+from report_service import ReportService
+
+
+def build_data(amounts, start_month: int = 1):
+    return [
+        {
+            "month": f"Mes {index}",
+            "period": f"2024-{start_month + index:02d}",
+            "agrupations": {"UBER": amount, "OTHER": 100.0 + index % 2},
+        }
+        for index, amount in enumerate(amounts)
+    ]
+
+
+class CategoryAnalyticsTest(unittest.TestCase):
+    def test_incremental_state_matches_full_history(self):
+        amounts = [100.0, 110.0, 95.0, 105.0, 98.0, 102.0, 101.0, 99.0]
+        data = build_data(amounts)
+        analytics = CategoryAnalytics(state_path=None)
+        # report runs with a window of 3 months, one month more each time
+        for end in range(3, len(data) + 1):
+            analytics.update("SANTANDER_UY$", data[end - 3:end])
+
+        stats = analytics.accounts["SANTANDER_UY$"]["categories"]["UBER"]
+        self.assertEqual(stats["n"], len(amounts))
+        self.assertAlmostEqual(stats["mean"], statistics.mean(amounts))
+        self.assertAlmostEqual(stats["m2"] / (stats["n"] - 1), statistics.variance(amounts))
+
+    def test_changed_month_replaces_its_values(self):
+        data = build_data([100.0, 110.0, 95.0])
+        analytics = CategoryAnalytics(state_path=None)
+        analytics.update("SANTANDER_UY$", data)
+        data[-1]["agrupations"]["UBER"] = 200.0
+        analytics.update("SANTANDER_UY$", data)
+
+        stats = analytics.accounts["SANTANDER_UY$"]["categories"]["UBER"]
+        self.assertEqual(stats["n"], 3)
+        self.assertAlmostEqual(stats["mean"], statistics.mean([100.0, 110.0, 200.0]))
+
+    def test_state_does_not_grow_with_the_history(self):
+        data = build_data([100.0 + index for index in range(6)])
+        analytics = CategoryAnalytics(state_path=None, recent_months=3)
+        analytics.update("SANTANDER_UY$", data)
+        state = analytics.accounts["SANTANDER_UY$"]
+        self.assertEqual(sorted(state["recent"]), ["2024-04", "2024-05", "2024-06"])
+        self.assertEqual(state["dropped"], "2024-03")
+
+        # the dropped months are already counted: a longer window doesn't add them again
+        analytics.update("SANTANDER_UY$", data)
+        self.assertEqual(state["categories"]["UBER"]["n"], 6)
+
+        # state saved with the list of every month seen
+        legacy = analytics.accounts["ITAU_UY$"] = {
+            "signature": "", "periods": ["2024-01", "2024-02", "2024-03"],
+            "categories": {"UBER": {"n": 3, "mean": 1.0, "m2": 0.0}}, "recent": {"2024-03": {"UBER": 1.0}},
+        }
+        analytics.update("ITAU_UY$", build_data([1.0, 1.0, 1.0, 1.0]))
+        self.assertNotIn("periods", legacy)
+        self.assertEqual(legacy["categories"]["UBER"]["n"], 4)
+
+    def test_deltas_percentiles_and_anomalies(self):
+        data = build_data([100.0, 110.0, 95.0, 105.0, 98.0, 400.0])
+        result = CategoryAnalytics(state_path=None).get_month_analytics("SANTANDER_UY$", data)
+
+        uber = result["UBER"]
+        self.assertEqual(uber["previous"], 98.0)
+        self.assertEqual(uber["delta"], 302.0)
+        self.assertAlmostEqual(uber["rolling_mean"], (105.0 + 98.0 + 400.0) / 3)
+        self.assertEqual(uber["percentile"], 100.0)
+        self.assertAlmostEqual(uber["p50"], 102.5)
+        self.assertTrue(uber["anomaly"])
+        self.assertLess(uber["p_value"], 0.05)
+        self.assertFalse(result["OTHER"]["anomaly"])
+
+    def test_not_enough_history(self):
+        result = CategoryAnalytics(state_path=None).get_month_analytics("SANTANDER_UY$", build_data([100.0, 400.0]))
+        self.assertIsNone(result["UBER"]["p_value"])
+        self.assertFalse(result["UBER"]["anomaly"])
+
+    def test_state_is_persisted(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            state_path = os.path.join(tmp_dir, "analytics_state.json")
+            data = build_data([100.0, 110.0, 95.0, 105.0])
+            analytics = CategoryAnalytics(state_path)
+            analytics.update("SANTANDER_UY$", data[:3], signature="rules")
+            analytics.save()
+
+            analytics = CategoryAnalytics(state_path)
+            analytics.update("SANTANDER_UY$", data[1:], signature="rules")
+            self.assertEqual(analytics.accounts["SANTANDER_UY$"]["categories"]["UBER"]["n"], 4)
+
+            analytics.update("SANTANDER_UY$", data[1:], signature="new rules")
+            self.assertEqual(analytics.accounts["SANTANDER_UY$"]["categories"]["UBER"]["n"], 3)
+
+    def test_html_table_includes_the_analytics(self):
+        data = build_data([100.0, 110.0, 95.0, 105.0, 98.0, 400.0])
+        report = ReportService("UY$", "SANTANDER")
+        html = report.get_html_table(data[-1], report.get_analytics(data))
+
+        self.assertIn("Media 3 meses", html)
+        self.assertIn("Gasto inusual", html)
+        self.assertIn("302,00 (+308%)", html)
+        self.assertNotIn("Percentil", report.get_html_table(data[-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
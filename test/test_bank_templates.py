@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import get_ai_env
+from bank_templates import get_bank_template
+from transactions_parser import AITransactionsParserService, TemplateTransactionsParserService
+
+STATEMENT = """
+ESTADO DE CUENTA
+SALDO ANTERIOR                 1.000,00
+27/03/2025   650   UBER   TRIP   260,70
+28/03/2025   651   PAGOS   1.000,00-
+29/03/2025   652   DEVOTO   1.104,50
+SALDO CONTADO                  1.365,20
+"""
+
+
+class FakePage:
+    def __init__(self, text: str):
+        self.text = text
+
+    def extract_text(self) -> str:
+        return self.text
+
+
+def build_parser(text: str, google_ai_api_key: str = None) -> TemplateTransactionsParserService:
+    parser = TemplateTransactionsParserService("santander", "UY$", "2025-03", pdf_path=None,
+                                               google_ai_api_key=google_ai_api_key)
+    parser.get_pdf_reader = mock.Mock(return_value=mock.Mock(pages=[FakePage(text)]))
+    return parser
+
+
+class BankTemplateTest(unittest.TestCase):
+    def test_rows_are_extracted_with_the_template(self):
+        self.assertIsNotNone(get_bank_template("santander"))
+        parser = build_parser(STATEMENT)
+
+        rows, opening_balance, closing_balance = parser.extract_rows()
+        self.assertEqual(rows[0], {"date": "27/03/2025", "concept": "UBER TRIP", "amount": "260,70"})
+        self.assertEqual((opening_balance, closing_balance), (1000.0, 1365.2))
+
+        with mock.patch.object(AITransactionsParserService, "get_transactions") as ai_parser:
+            transactions, total = parser.get_transactions()
+        ai_parser.assert_not_called()
+        # the payment row is skipped
+        self.assertEqual([tran["concept"] for tran in transactions], ["UBER TRIP", "DEVOTO"])
+        self.assertAlmostEqual(total, 1365.2)
+
+    def test_falls_back_to_ai_when_the_balance_does_not_match(self):
+        text = STATEMENT.replace("29/03/2025   652   DEVOTO   1.104,50\n", "")
+        with mock.patch.object(AITransactionsParserService, "get_transactions", return_value=([], 0)) as ai_parser:
+            self.assertEqual(build_parser(text, "key").get_transactions(), ([], 0))
+            ai_parser.assert_called_once()
+
+            with self.assertRaises(ValueError):
+                build_parser(text).get_transactions()
+        # no template and no AI key
+        with self.assertRaises(ValueError):
+            TemplateTransactionsParserService("unknown", "UY$", "2025-03", pdf_path=None).get_transactions()
+
+    def test_local_parser_does_not_need_the_ai_key(self):
+        with mock.patch.dict(os.environ, {"CI_PASSW_PDF": "secret"}, clear=True):
+            self.assertEqual(get_ai_env(require_ai_key=False), ("secret", None))
+            self.assertEqual(get_ai_env(), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from categorizer import Categorizer, CategoryRule
+
+
+class CategorizerTest(unittest.TestCase):
+    def test_first_matching_rule_by_priority_wins(self):
+        categorizer = Categorizer([
+            CategoryRule("UBER", "UBER", priority=10),
+            CategoryRule("COMIDA", "EATS", priority=20),
+            CategoryRule("TRANSPORTE", "BER TRIP", priority=15),
+            CategoryRule("PAGOS", "PAGO", type="prefix"),
+            CategoryRule("DEVOTO", r"DEVOTO\s+(\d+)", type="regex"),
+            CategoryRule("SANTANDER UBER", "UBER", priority=10, bank="santander"),
+        ], other="OTROS")
+
+        # the later, overlapping match has a better priority than the leftmost one
+        self.assertEqual(categorizer.categorize("UBER EATS"), "COMIDA")
+        self.assertEqual(categorizer.categorize("UBER TRIP"), "TRANSPORTE")
+        self.assertEqual(categorizer.categorize("UBER"), "UBER")
+        # same priority: bank overrides before the global rules
+        self.assertEqual(categorizer.categorize("UBER", "SANTANDER"), "SANTANDER UBER")
+        self.assertEqual(categorizer.categorize("PAGO TARJETA"), "PAGOS")
+        self.assertEqual(categorizer.categorize("SU PAGO"), "OTROS")
+        self.assertEqual(categorizer.categorize("DEVOTO  12"), "DEVOTO")
+        self.assertEqual(categorizer.categorize("DEVOTO"), "OTROS")
+
+    def test_same_priority_keeps_the_file_order(self):
+        categorizer = Categorizer([
+            CategoryRule("B", "FOO BAR"),
+            CategoryRule("A", "FOO"),
+            CategoryRule("EMPTY", "X*", type="regex", priority=-1),
+        ])
+        self.assertEqual(categorizer.categorize("FOO BAR"), "B")
+        self.assertEqual(categorizer.categorize("A FOO"), "A")
+        self.assertEqual(categorizer.categorize("NADA"), "EMPTY")
+        self.assertEqual(categorizer.categories, ["B", "A", "EMPTY", "OTHER"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart_renderer import ChartRenderer
+
+
+def fake_render_chart(data, output_path):
+    with open(output_path, "wb") as f:
+        f.write(b"png")
+
+
+def build_data(amount: float) -> list:
+    return [{"month": "Marzo 2025", "agrupations": {"UBER": amount}}]
+
+
+@mock.patch("chart_renderer.render_chart", fake_render_chart)
+class ChartRendererTest(unittest.TestCase):
+    def test_only_the_current_chart_of_each_report_is_kept(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            renderer = ChartRenderer(tmp_dir)
+            other = renderer.render("SANTANDER_UY$", build_data(1.0))
+            old = renderer.render("SANTANDER", build_data(1.0))
+            self.assertEqual(renderer.render("SANTANDER", build_data(1.0)), old)
+
+            current = renderer.render("SANTANDER", build_data(2.0))
+            self.assertEqual(sorted(os.listdir(tmp_dir)), sorted(os.path.basename(path) for path in (other, current)))
+
+            renderer.evict({"SANTANDER_UY$": renderer.get_chart_path("SANTANDER_UY$", build_data(3.0))})
+            self.assertEqual(os.listdir(tmp_dir), [os.path.basename(current)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from transactions_parser import AITransactionsParserService, split_pdf_pages, merge_chunk_rows
+
+
+def build_pdf(pages: int) -> bytes:
+    "Blank pages, the page number is encoded in the page width"
+    writer = PdfWriter()
+    for page in range(pages):
+        writer.add_blank_page(width=100 + page, height=100)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def first_page(chunk: bytes) -> int:
+    return int(PdfReader(io.BytesIO(chunk)).pages[0].mediabox.width) - 100
+
+
+def row(day: int, concept: str, amount: str = "100,00") -> dict:
+    return {"date": f"{day:02d}/03/2025", "concept": concept, "amount": amount}
+
+
+class ChunkedExtractionTest(unittest.TestCase):
+    def test_split_in_page_order(self):
+        chunks = split_pdf_pages(build_pdf(5), 2)
+        self.assertEqual([first_page(chunk) for chunk in chunks], [0, 2, 4])
+        self.assertEqual(len(split_pdf_pages(build_pdf(2), 2)), 1)
+
+    def test_merge_keeps_identical_rows_at_the_boundary(self):
+        chunks_rows = [
+            [row(1, "UBER TRIP"), row(2, "PEDIDOSYA PROPINA", "15,00")],
+            [row(2, "PEDIDOSYA PROPINA", "15,00"), row(3, "LAVOMAT")],
+        ]
+        self.assertEqual([item["concept"] for item in merge_chunk_rows(chunks_rows)],
+                         ["UBER TRIP", "PEDIDOSYA PROPINA", "PEDIDOSYA PROPINA", "LAVOMAT"])
+
+    def test_merge_drops_rows_repeated_at_the_boundary_when_enabled(self):
+        merged = merge_chunk_rows([
+            [row(1, "UBER TRIP"), row(1, "UBER TRIP"), row(2, "DEVOTO")],
+            [row(2, "DEVOTO"), row(3, "LAVOMAT")],
+        ], boundary_rows=2)
+        # the repeated purchase inside the first chunk is kept
+        self.assertEqual([item["concept"] for item in merged], ["UBER TRIP", "UBER TRIP", "DEVOTO", "LAVOMAT"])
+
+    def test_failed_chunk_is_retried_alone(self):
+        responses = {
+            0: [row(1, "UBER TRIP")],
+            2: [row(1, "UBER TRIP"), row(5, "DEVOTO")],
+            4: [row(9, "LAVOMAT")],
+        }
+        calls = []
+
+        def fake_ai(chunk):
+            page = first_page(chunk)
+            calls.append(page)
+            if page == 2 and calls.count(2) == 1:
+                raise ValueError("truncated response")
+            return str(responses[page]).replace("'", '"')
+
+        parser = AITransactionsParserService(
+            "SANTANDER", "UY$", "2025-03", pdf_path="statement.pdf", google_ai_api_key="key",
+            pdf_data=build_pdf(5), pages_per_chunk=2, chunk_workers=3, chunk_boundary_rows=2,
+        )
+        with mock.patch.object(parser, "get_pdf_data_with_ai", side_effect=fake_ai), \
+                mock.patch("transactions_parser.time.sleep"):
+            rows, _ = parser.get_ai_rows()
+
+        self.assertEqual(sorted(calls), [0, 2, 2, 4])
+        self.assertEqual([item["concept"] for item in rows], ["UBER TRIP", "DEVOTO", "LAVOMAT"])
+
+
+if __name__ == "__main__":
+    unittest.main()
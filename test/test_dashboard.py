@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from categorizer import Categorizer
+from dashboard import DashboardBuilder, DependencyGraph
+from month_index import MonthIndex
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_month(data_dir: str, month: str, transactions):
+    path = os.path.join(data_dir, f"SANTANDER_{month}_UY$.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"month": month, "str_month": month, "transactions": transactions}, f)
+    return path
+
+
+class DependencyGraphTest(unittest.TestCase):
+    def test_affected_is_transitive(self):
+        graph = DependencyGraph({
+            "a/2024-01.html": ["2024-01.json"],
+            "a/2024-02.html": ["2024-02.json"],
+            "a/index.html": ["2024-01.json", "2024-02.json"],
+            "index.html": ["a/index.html"],
+        })
+        self.assertEqual(graph.affected(["2024-02.json"]), {"a/2024-02.html", "a/index.html", "index.html"})
+        self.assertEqual(graph.pages_of("2024-01.json"), ["a/2024-01.html"])
+
+
+class DashboardBuilderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.output_dir = os.path.join(self.tmp_dir.name, "site")
+        os.makedirs(self.data_dir)
+        self.categorizer = Categorizer.from_file(os.path.join(ROOT_DIR, "categories.json"))
+        write_month(self.data_dir, "2025-01", [
+            {"date": "2025-01-02", "concept": "UBER TRIP", "amount": 100.0},
+            {"date": "2025-01-03", "concept": "FARMACIA <24H>", "amount": 50.0},
+        ])
+        write_month(self.data_dir, "2025-02", [{"date": "2025-02-02", "concept": "UBER TRIP", "amount": 80.0}])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def builder(self) -> DashboardBuilder:
+        month_index = MonthIndex(self.data_dir, os.path.join(self.tmp_dir.name, "month_index.json"))
+        return DashboardBuilder(self.output_dir, self.data_dir, self.categorizer, month_index)
+
+    def read(self, page: str) -> str:
+        with open(os.path.join(self.output_dir, page), encoding="utf-8") as f:
+            return f.read()
+
+    def test_pages_and_links(self):
+        self.assertEqual(self.builder().build()["written"], 7)
+
+        self.assertIn('href="SANTANDER_UY%24/index.html"', self.read("index.html"))
+        self.assertIn('href="2025-01/UBER.html"', self.read("SANTANDER_UY$/2025-01.html"))
+        other = self.read("SANTANDER_UY$/2025-01/OTHER.html")
+        self.assertIn("FARMACIA &lt;24H&gt;", other)
+        self.assertIn('href="../../index.html"', other)
+
+    def test_new_month_only_rewrites_the_affected_pages(self):
+        self.builder().build()
+        self.assertEqual(self.builder().build(), {"written": 0, "deleted": 0, "unchanged": 7})
+
+        write_month(self.data_dir, "2025-03", [{"date": "2025-03-02", "concept": "DEVOTO", "amount": 10.0}])
+        result = self.builder().build()
+
+        # month page, its DEVOTO page, the account page and the index
+        self.assertEqual(result, {"written": 4, "deleted": 0, "unchanged": 5})
+        self.assertIn("2025-03", self.read("index.html"))
+
+    def test_removed_month_deletes_its_pages(self):
+        self.builder().build()
+        os.remove(os.path.join(self.data_dir, "SANTANDER_2025-01_UY$.json"))
+        result = self.builder().build()
+
+        self.assertEqual(result, {"written": 2, "deleted": 3, "unchanged": 2})
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "SANTANDER_UY$", "2025-01")))
+        self.assertNotIn("2025-01", self.read("SANTANDER_UY$/index.html"))
+
+    def test_changed_month_drops_old_category_pages(self):
+        self.builder().build()
+        write_month(self.data_dir, "2025-01", [{"date": "2025-01-02", "concept": "UBER TRIP", "amount": 1.0}])
+        os.utime(os.path.join(self.data_dir, "SANTANDER_2025-01_UY$.json"), ns=(1, 1))
+        result = self.builder().build()
+
+        self.assertEqual(result["deleted"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "SANTANDER_UY$", "2025-01", "OTHER.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import smtplib
+import tempfile
+import unittest
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_outbox import EmailOutbox, SMTPSender  # noqa: E402
+
+
+class FakeSMTP:
+    "Local SMTP stand-in, records the connections and the sent messages"
+    connections = []
+    # subject -> sends that fail before it goes through
+    failures = {}
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.logged_in = False
+        FakeSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        if password == "wrong":
+            raise smtplib.SMTPAuthenticationError(535, b"bad credentials")
+        self.logged_in = True
+
+    def send_message(self, msg):
+        if msg["Subject"] == "fail":
+            raise smtplib.SMTPRecipientsRefused({})
+        if FakeSMTP.failures.get(msg["Subject"]):
+            FakeSMTP.failures[msg["Subject"]] -= 1
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        self.sent.append(msg["Subject"])
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def build_message(subject: str) -> MIMEText:
+    msg = MIMEText("<p>report</p>", "html")
+    msg["Subject"] = subject
+    return msg
+
+
+class TestEmailOutbox(unittest.TestCase):
+    def setUp(self):
+        FakeSMTP.connections = []
+        FakeSMTP.failures = {}
+        self.outbox = EmailOutbox(tempfile.mkdtemp())
+        self.sender = SMTPSender("localhost", 2525, "user", "passw", smtp_factory=FakeSMTP)
+
+    def test_drain_reuses_one_connection(self):
+        for subject in ("SANTANDER", "ITAU"):
+            self.outbox.enqueue(build_message(subject))
+
+        self.assertEqual(self.sender.drain(self.outbox), 2)
+        self.assertEqual(len(FakeSMTP.connections), 1)
+        self.assertEqual(FakeSMTP.connections[0].sent, ["SANTANDER", "ITAU"])
+        self.assertEqual(self.outbox.pending(), [])
+
+    def test_failed_email_is_retried_with_backoff(self):
+        path = self.outbox.enqueue(build_message("fail"))
+
+        self.assertEqual(self.sender.drain(self.outbox, backoff_seconds=60), 0)
+        self.assertEqual(self.outbox.get_state(path)["attempts"], 1)
+        # not due until the backoff expires
+        self.assertEqual(self.outbox.pending(), [])
+        self.assertEqual(self.outbox.pending(now=self.outbox.get_state(path)["next_attempt_at"]), [path])
+
+    def test_transient_errors_are_retried_in_the_same_drain(self):
+        FakeSMTP.failures = {"SANTANDER": 2}
+        path = self.outbox.enqueue(build_message("SANTANDER"))
+        self.outbox.enqueue(build_message("ITAU"))
+
+        self.assertEqual(self.sender.drain(self.outbox, backoff_seconds=0.01, max_wait_seconds=5), 2)
+        self.assertEqual(self.outbox.next_attempt_at(), None)
+        self.assertFalse(os.path.exists(path))
+        # first pass (reconnecting after the error) + 2 retries, once the backoff was due
+        self.assertEqual(len(FakeSMTP.connections), 4)
+
+    def test_retries_due_after_the_wait_are_left_for_the_next_drain(self):
+        FakeSMTP.failures = {"SANTANDER": 1}
+        path = self.outbox.enqueue(build_message("SANTANDER"))
+
+        self.assertEqual(self.sender.drain(self.outbox, backoff_seconds=60, max_wait_seconds=1), 0)
+        self.assertEqual(self.outbox.get_state(path)["attempts"], 1)
+        self.assertEqual(self.outbox.next_attempt_at(), self.outbox.get_state(path)["next_attempt_at"])
+
+    def test_email_is_discarded_after_max_attempts(self):
+        path = self.outbox.enqueue(build_message("fail"))
+
+        self.sender.drain(self.outbox, max_attempts=1)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(os.path.join(self.outbox.failed_dir, os.path.basename(path))))
+
+    def test_connection_errors_stop_the_drain_without_charging_attempts(self):
+        paths = [self.outbox.enqueue(build_message(subject)) for subject in ("SANTANDER", "ITAU")]
+        sender = SMTPSender("localhost", 2525, "user", "wrong", smtp_factory=FakeSMTP)
+
+        self.assertEqual(sender.drain(self.outbox, max_attempts=1), 0)
+        # a single login attempt, the messages are still due
+        self.assertEqual(len(FakeSMTP.connections), 1)
+        self.assertEqual([self.outbox.get_state(path)["attempts"] for path in paths], [0, 0])
+        self.assertEqual(self.outbox.pending(), paths)
+
+        self.assertEqual(self.sender.drain(self.outbox), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
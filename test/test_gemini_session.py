@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_session import GeminiSession, get_session, set_session, close_sessions
+from transactions_parser import AITransactionsParserService
+
+RESPONSE = json.dumps([
+    {"date": "01/03/2025", "concept": "UBER TRIP", "amount": "260,70"},
+    {"date": "02/03/2025", "concept": "DEVOTO", "amount": "1.104,50"},
+])
+
+
+class FakeFiles:
+    def __init__(self):
+        self.uploaded = []
+        self.deleted = []
+
+    def upload(self, file, config):
+        remote_file = SimpleNamespace(name=f"files/{len(self.uploaded)}", size=len(file.read()))
+        self.uploaded.append(remote_file)
+        return remote_file
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+
+class FakeModels:
+    def __init__(self):
+        self.requests = []
+
+    def generate_content_stream(self, contents, model, config):
+        self.requests.append(contents[0].name)
+        for start in range(0, len(RESPONSE), 10):
+            yield SimpleNamespace(text=RESPONSE[start:start + 10])
+
+
+class FakeClient:
+    def __init__(self, api_key: str):
+        self.files = FakeFiles()
+        self.models = FakeModels()
+
+
+class GeminiSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.clients = []
+
+        def client_factory(api_key):
+            self.clients.append(FakeClient(api_key))
+            return self.clients[-1]
+
+        self.session = GeminiSession("test-key", client_factory=client_factory, cleanup_interval=3600)
+        set_session(self.session)
+
+    def tearDown(self):
+        close_sessions()
+
+    def parse(self, pdf_data: bytes):
+        parser = AITransactionsParserService(
+            "SANTANDER", "UY$", "2025-03", pdf_path=None, google_ai_api_key="test-key", pdf_data=pdf_data
+        )
+        return parser.get_transactions()
+
+    def test_one_client_and_one_upload_per_content(self):
+        self.assertIs(get_session("test-key"), self.session)
+
+        transactions, total = self.parse(b"%PDF statement 1")
+        self.parse(b"%PDF statement 1")
+        self.parse(b"%PDF statement 2")
+
+        self.assertEqual(len(transactions), 2)
+        self.assertAlmostEqual(total, 260.70 + 1104.50)
+        self.assertEqual(len(self.clients), 1)
+        client = self.clients[0]
+        self.assertEqual(len(client.files.uploaded), 2)
+        self.assertEqual(client.models.requests, ["files/0", "files/0", "files/1"])
+
+    def test_expired_uploads_are_deleted_and_uploaded_again(self):
+        self.session.upload(b"%PDF statement")
+        client = self.clients[0]
+
+        self.assertEqual(self.session.expire(), 0)
+        self.assertEqual(self.session.expire(now=float("inf")), 1)
+        self.assertEqual(client.files.deleted, ["files/0"])
+
+        self.session.upload(b"%PDF statement")
+        self.assertEqual(len(client.files.uploaded), 2)
+
+    def test_close_deletes_remaining_uploads(self):
+        self.session.upload(b"%PDF statement")
+        close_sessions()
+        self.assertEqual(self.clients[0].files.deleted, ["files/0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
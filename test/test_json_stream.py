@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_stream import JSONArrayStream, iter_json_array
+from storage import SQLiteStorage
+from transactions_parser import AITransactionsParserService
+
+RESPONSE = (
+    '[{"date": "01/03/2025", "concept": "UBER \\"TRIP\\" ]}", "amount": "260,70"},'
+    ' 42, {"date": broken},'
+    ' {"date": "02/03/2025", "concept": "SALDO ANTERIOR", "amount": "1.000,00"},'
+    ' {"date": "03/03/2025", "concept": "DEVOTO", "amount": "1.104,50-"},'
+    ' {"date": "04/03/2025", "concept": "LAVOMAT"},'
+    ' {"date": "05/03/2025", "concept": "MERPAGO", "amount": "10'
+)
+
+
+def split_text(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class JSONArrayStreamTest(unittest.TestCase):
+    def test_items_are_the_same_for_any_chunk_size(self):
+        for size in (1, 3, 16, len(RESPONSE)):
+            with self.subTest(size=size):
+                stream = JSONArrayStream()
+                items = list(iter_json_array(split_text(RESPONSE, size), stream))
+                self.assertEqual([item["date"] for item in items], ["01/03/2025", "02/03/2025", "03/03/2025", "04/03/2025"])
+                self.assertEqual(items[0]["concept"], 'UBER "TRIP" ]}')
+                # 42, the broken object and the truncated last item
+                self.assertEqual(len(stream.malformed), 3)
+
+    def test_items_are_yielded_before_the_array_ends(self):
+        stream = JSONArrayStream()
+        self.assertEqual(list(stream.feed('```json\n[{"a": 1}, {"a"')), [{"a": 1}])
+        self.assertEqual(list(stream.feed(': 2}]\n```')), [{"a": 2}])
+
+    def test_no_array(self):
+        stream = JSONArrayStream()
+        list(stream.feed("sorry, I can't read this PDF"))
+        with self.assertRaises(ValueError):
+            stream.close()
+
+
+class StreamingPipelineTest(unittest.TestCase):
+    def test_rows_are_transformed_and_stored_while_streaming(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            storage = SQLiteStorage(os.path.join(tmp_dir, "transactions.db"))
+            parser = AITransactionsParserService("SANTANDER", "UY$", "2025-03", pdf_path=None, google_ai_api_key="key")
+            events = []
+
+            def stream():
+                for part in split_text(RESPONSE, 7):
+                    events.append("part")
+                    yield part
+
+            save_month_stream = storage.save_month_stream
+
+            def recording_save_month_stream(bank, currency, month, transactions, **kwargs):
+                def staged():
+                    for transaction in transactions:
+                        events.append("row")
+                        yield transaction
+                return save_month_stream(bank, currency, month, staged(), **kwargs)
+
+            with mock.patch.object(parser, "decrypt_pdf", return_value=b"%PDF"), \
+                    mock.patch.object(parser, "stream_pdf_data_with_ai", return_value=stream()), \
+                    mock.patch.object(storage, "save_month_stream", side_effect=recording_save_month_stream), \
+                    mock.patch.object(parser, "save_quarantine"):
+                transactions, total = parser.get_transactions(storage=storage)
+
+            # the first row was transformed and staged before the last part of the response arrived
+            self.assertLess(events.index("row"), len(events) - 1 - events[::-1].index("part"))
+            self.assertEqual([tran["concept"] for tran in transactions], ['UBER "TRIP" ]}', "DEVOTO"])
+            self.assertAlmostEqual(total, 260.70 - 1104.50)
+            self.assertEqual(len(storage.get_transactions("SANTANDER", "UY$", "2025-03")), 2)
+            # 3 malformed items from the stream, plus the row without amount
+            self.assertEqual(len(parser.quarantined), 4)
+
+            quarantine_path = parser.save_quarantine(os.path.join(tmp_dir, "quarantine.json"))
+            with open(quarantine_path, "r", encoding="utf-8") as f:
+                self.assertEqual(len(json.load(f)), 4)
+
+    def test_storage_is_not_locked_while_streaming(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "transactions.db")
+            storage = SQLiteStorage(db_path)
+            parser = AITransactionsParserService("SANTANDER", "UY$", "2025-03", pdf_path=None, google_ai_api_key="key")
+
+            def stream():
+                for index, part in enumerate(split_text(RESPONSE, 7)):
+                    if index == 3:
+                        # another writer, in the middle of the model response
+                        with closing(sqlite3.connect(db_path, timeout=0)) as conn, conn:
+                            conn.execute("BEGIN IMMEDIATE")
+                            storage_months = conn.execute("SELECT COUNT(*) FROM months").fetchone()[0]
+                            self.assertEqual(storage_months, 0)
+                    yield part
+
+            with mock.patch.object(parser, "decrypt_pdf", return_value=b"%PDF"), \
+                    mock.patch.object(parser, "stream_pdf_data_with_ai", return_value=stream()), \
+                    mock.patch.object(parser, "save_quarantine"):
+                parser.get_transactions(storage=storage)
+            self.assertEqual(len(storage.get_transactions("SANTANDER", "UY$", "2025-03")), 2)
+
+    def test_interrupted_stream_keeps_the_previous_month(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            storage = SQLiteStorage(os.path.join(tmp_dir, "transactions.db"))
+            storage.save_month("SANTANDER", "UY$", "2025-03", [{"date": "2025-03-01", "concept": "OLD", "amount": 1.0}])
+            parser = AITransactionsParserService("SANTANDER", "UY$", "2025-03", pdf_path=None, google_ai_api_key="key")
+
+            def stream():
+                yield from split_text(RESPONSE, 7)[:3]
+                raise ConnectionError("stream interrupted")
+
+            with mock.patch.object(parser, "decrypt_pdf", return_value=b"%PDF"), \
+                    mock.patch.object(parser, "stream_pdf_data_with_ai", return_value=stream()):
+                with self.assertRaises(ConnectionError):
+                    parser.get_transactions(storage=storage)
+
+            def rows():
+                yield {"date": "2025-03-02", "concept": "NEW", "amount": 2.0}
+                raise ConnectionError("stream interrupted")
+
+            with self.assertRaises(ConnectionError):
+                storage.save_month_stream("SANTANDER", "UY$", "2025-03", rows())
+
+            transactions = storage.get_transactions("SANTANDER", "UY$", "2025-03")
+            self.assertEqual([tran["concept"] for tran in transactions], ["OLD"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Metrics
+
+
+class MetricsTest(unittest.TestCase):
+    def test_disabled_records_nothing(self):
+        metrics = Metrics(enabled=False)
+
+        @metrics.timed("stage.decorated", count=len)
+        def run():
+            return [1, 2, 3]
+
+        with metrics.span("stage.block") as span:
+            span.items = 10
+        self.assertEqual(run(), [1, 2, 3])
+        self.assertEqual(metrics.summary(), {})
+        # the disabled span is shared: values set by one caller never reach another
+        with metrics.span("stage.other") as other:
+            self.assertIsNone(other.items)
+
+    def test_spans_are_aggregated_per_stage(self):
+        metrics = Metrics(enabled=True)
+
+        @metrics.timed("parser.transform", count=len)
+        def transform(rows):
+            return rows
+
+        transform([1, 2])
+        transform([3])
+        with metrics.span("ai.upload", size=2048):
+            pass
+        with self.assertRaises(ValueError):
+            with metrics.span("ai.generate"):
+                raise ValueError("quota")
+
+        summary = metrics.summary()
+        self.assertEqual(summary["parser.transform"]["calls"], 2)
+        self.assertEqual(summary["parser.transform"]["items"], 3)
+        self.assertEqual(summary["ai.upload"]["bytes"], 2048)
+        self.assertEqual(summary["ai.generate"]["errors"], 1)
+        self.assertIn('pipeline_stage_items_total{stage="parser.transform"} 3', metrics.to_prometheus())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from month_index import MonthIndex, select_window
+
+
+class MonthIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.manifest_path = os.path.join(self.tmp_dir.name, "month_index.json")
+        os.makedirs(self.data_dir)
+        for filename in [
+            "SANTANDER_2025-01_UY$.json", "santander_2024-11_uy$.json", "SANTANDER_2024-12_UY$.json",
+            "SANTANDER_2024-12_UY$.tbatch", "SANTANDER_2025-01_USD.json", "notes.txt",
+        ]:
+            open(os.path.join(self.data_dir, filename), "w").close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def index(self) -> MonthIndex:
+        return MonthIndex(self.data_dir, self.manifest_path)
+
+    def test_months_in_calendar_order_with_window(self):
+        paths = self.index().get_month_files("SANTANDER", "UY$")
+        self.assertEqual([os.path.basename(path) for path in paths], [
+            "santander_2024-11_uy$.json", "SANTANDER_2024-12_UY$.tbatch", "SANTANDER_2025-01_UY$.json",
+        ])
+        self.assertEqual(self.index().get_month_files("SANTANDER", "UY$", window=1), [paths[-1]])
+
+    def test_manifest_is_reused_until_the_directory_changes(self):
+        self.index().get_entries()
+        cached = self.index()
+        cached.scan = lambda: self.fail("the manifest should be used")
+        self.assertEqual(len(cached.get_entries()), 4)
+
+        open(os.path.join(self.data_dir, "SANTANDER_2025-02_UY$.json"), "w").close()
+        os.utime(self.data_dir, ns=(0, os.stat(self.data_dir).st_mtime_ns + 1))
+        self.assertEqual(len(self.index().get_month_files("SANTANDER", "UY$")), 4)
+
+    def test_select_window(self):
+        paths = ["data/B_2025-01_UY$.json", "data/A_2024-10_UY$.json", "data/C_2024-12_UY$.json"]
+        self.assertEqual(select_window(paths, 2), ["data/C_2024-12_UY$.json", "data/B_2025-01_UY$.json"])
+        self.assertEqual(len(select_window(paths, 0)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import CategoryAnalytics
+from categorizer import Categorizer, CategoryRule
+from multi_account_report import MultiAccountReportService
+from storage import SQLiteStorage
+
+
+class MultiAccountReportTest(unittest.TestCase):
+    def test_storage_sums_only_the_months_in_the_window(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            storage = SQLiteStorage(os.path.join(tmp_dir, "transactions.db"))
+            for bank, periods in (("SANTANDER", ["2025-01", "2025-02", "2025-03"]), ("ITAU", ["2024-11", "2025-03"])):
+                for index, period in enumerate(periods):
+                    storage.save_month(bank, "UY$", period, [
+                        {"date": f"{period}-01", "concept": f"UBER {period}", "amount": 10.0 * (index + 1)},
+                        {"date": f"{period}-02", "concept": f"DEVOTO {bank}", "amount": 1.0},
+                    ])
+
+            categorized = []
+            categorizer = Categorizer([CategoryRule("UBER", "UBER")], other="OTROS")
+            categorize = categorizer.categorize
+            categorizer.categorize = lambda concept, bank=None: categorized.append(concept) or categorize(concept, bank)
+            service = MultiAccountReportService(storage=storage, categorizer=categorizer, window=2,
+                                                analytics=CategoryAnalytics(state_path=None))
+
+            reports = {account: data for account, (_, data) in service.get_reports_data().items()}
+
+        self.assertEqual([entry["period"] for entry in reports[("SANTANDER", "UY$")]], ["2025-02", "2025-03"])
+        self.assertEqual(reports[("SANTANDER", "UY$")][-1]["agrupations"], {"UBER": 30.0, "OTROS": 1.0})
+        self.assertEqual([entry["period"] for entry in reports[("ITAU", "UY$")]], ["2024-11", "2025-03"])
+        # the month before the window was never categorized
+        self.assertNotIn("UBER 2025-01", categorized)
+        self.assertIn("UBER 2024-11", categorized)
+
+
+if __name__ == "__main__":
+    unittest.main()
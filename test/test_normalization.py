@@ -0,0 +1,97 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalization import Normalizer, LocaleProfile, parse_date
+from transactions_parser import AITransactionsParserService, ManualTransactionsParserService, SKIP_CONCEPT_KEYWORDS
+
+
+class NormalizerTest(unittest.TestCase):
+    def setUp(self):
+        self.normalizer = Normalizer.for_bank("santander", SKIP_CONCEPT_KEYWORDS)
+
+    def test_amounts(self):
+        for text, expected in [
+            ("1.234,56", 1234.56), ("1.234,56-", -1234.56), ("-1.234,56", -1234.56),
+            ("260,70", 260.7), ("1.234", 1234.0), ("1234.5", 1234.5), (" 12,00 ", 12.0),
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(self.normalizer.parse_amount(text), expected)
+
+        with self.assertRaises(ValueError):
+            self.normalizer.parse_amount("")
+
+    def test_dates(self):
+        self.assertEqual(parse_date("27/03/2025"), "2025-03-27")
+        self.assertEqual(parse_date("27-03-25"), "2025-03-27")
+        self.assertEqual(parse_date("2025-03-27"), "2025-03-27")
+        self.assertEqual(parse_date("03/27/2025", day_first=False), "2025-03-27")
+        with self.assertRaises(ValueError):
+            parse_date("31/02/2025")
+
+    def test_rows_use_the_same_amount_parsing(self):
+        rows = [
+            {"date": "27/03/2025", "concept": "UBER TRIP", "amount": "1.260,70-"},
+            {"date": "28/03/2025", "concept": "FARMACIA", "amount": "1.234"},
+            {"date": "28/03/2025", "concept": "AJUSTE", "amount": "-1.234,56-"},
+            {"date": "29/03/2025", "concept": "DEVOLUCION", "amount": 10.5},
+        ]
+        amounts = [transaction["amount"] for transaction in self.normalizer.iter_normalize(rows)]
+        self.assertEqual(amounts, [-1260.7, 1234.0, -1234.56, 10.5])
+        self.assertEqual(self.normalizer.parse_amount("-1.234,56-"), -1234.56)
+
+    def test_skips_and_rejects(self):
+        rows = [
+            {"date": "01/03/2025", "concept": "SALDO ANTERIOR", "amount": "100,00"},
+            {"date": "02/03/2025", "concept": "SUPERMERCADO", "amount": "50,25"},
+            {"date": "02/03/2025", "concept": "SIN MONTO"},
+            {"date": "ayer", "concept": "FECHA ROTA", "amount": "1,00"},
+        ]
+        rejected = []
+        transactions = list(self.normalizer.iter_normalize(rows, rejected))
+
+        self.assertEqual(transactions, [{"date": "2025-03-02", "amount": 50.25, "concept": "SUPERMERCADO"}])
+        self.assertEqual([row["concept"] for row, _ in rejected], ["SIN MONTO", "FECHA ROTA"])
+
+        with self.assertRaises(KeyError):
+            list(self.normalizer.iter_normalize(rows))
+
+    def test_ai_rows_with_only_thousands_separators(self):
+        # the AI path used to read "12.500" as 12.5: a group of 3 digits is now a thousands separator
+        parser = AITransactionsParserService("SANTANDER", "UY$", "2025-03", pdf_path=None, google_ai_api_key="key")
+        transactions, total = parser.transform_transactions([
+            {"date": "01/03/2025", "concept": "FARMACIA", "amount": "12.500"},
+            {"date": "02/03/2025", "concept": "UBER TRIP", "amount": "12.5"},
+            {"date": "03/03/2025", "concept": "DEVOTO", "amount": "1.234.567,8-"},
+        ])
+        self.assertEqual([transaction["amount"] for transaction in transactions], [12500.0, 12.5, -1234567.8])
+
+    def test_other_locale(self):
+        normalizer = Normalizer(LocaleProfile(thousands_separator=",", decimal_separator=".", day_first=False))
+        self.assertEqual(normalizer.parse_amount("1,234.56-"), -1234.56)
+        self.assertEqual(normalizer.parse_date("03/27/2025"), "2025-03-27")
+
+
+class ManualParserNormalizationTest(unittest.TestCase):
+    def test_manual_lines_use_the_normalizer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, "santander_2025-03_uy$.txt")
+            with open(input_path, "w", encoding="utf-8") as f:
+                f.write("27/03/2025 650 UBER TRIP 1.260,70\n28/03/2025 651 DEVOLUCION 100,00-\nbroken line\n")
+
+            parser = ManualTransactionsParserService("santander", "UY$", "2025-03", input_path)
+            transactions, total = parser.get_transactions()
+
+        self.assertEqual(transactions, [
+            {"date": "2025-03-27", "amount": 1260.7, "concept": "UBER TRIP"},
+            {"date": "2025-03-28", "amount": -100.0, "concept": "DEVOLUCION"},
+        ])
+        self.assertEqual(total, 2)
+        self.assertEqual(parser.malformed_lines, [(3, "broken line")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from categorizer import Categorizer
+from month_index import MonthIndex
+from query_service import QueryIndex, QueryServer, QueryError
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_month(data_dir: str, bank: str, month: str, transactions):
+    with open(os.path.join(data_dir, f"{bank}_{month}_UY$.json"), "w", encoding="utf-8") as f:
+        json.dump({"month": month, "str_month": month, "transactions": transactions}, f)
+
+
+class QueryIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        os.makedirs(self.data_dir)
+        write_month(self.data_dir, "SANTANDER", "2025-01", [
+            {"date": "2025-01-02", "concept": "UBER TRIP", "amount": 100.0},
+            {"date": "2025-01-03", "concept": "FARMACIA", "amount": 50.0},
+        ])
+        write_month(self.data_dir, "SANTANDER", "2025-02", [{"date": "2025-02-02", "concept": "UBER EATS", "amount": 80.0}])
+        write_month(self.data_dir, "ITAU", "2025-02", [{"date": "2025-02-05", "concept": "DEVOTO", "amount": 30.0}])
+
+        categorizer = Categorizer.from_file(os.path.join(ROOT_DIR, "categories.json"))
+        month_index = MonthIndex(self.data_dir, os.path.join(self.tmp_dir.name, "month_index.json"))
+        self.index = QueryIndex(self.data_dir, categorizer, month_index)
+        self.index.refresh()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get(self, target: str):
+        return json.loads(self.index.get(target))
+
+    def test_aggregates_and_series(self):
+        results = self.get("/aggregates?bank=santander&month=2025-01")["results"]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["total"], 150.0)
+        self.assertEqual(results[0]["categories"]["UBER"], {"total": 100.0, "count": 1})
+
+        series = self.get("/series?bank=SANTANDER&currency=UY$&category=UBER")["series"]
+        self.assertEqual([(point["period"], point["total"]) for point in series], [("2025-01", 100.0), ("2025-02", 80.0)])
+        with self.assertRaises(QueryError):
+            self.index.get("/series?category=UBER")
+
+    def test_search(self):
+        result = self.get("/transactions?q=uber&from=2025-02")
+        self.assertEqual(result["count"], 1)
+        self.assertEqual(result["transactions"][0]["concept"], "UBER EATS")
+        self.assertEqual(self.get("/transactions?category=DEVOTO")["transactions"][0]["bank"], "ITAU")
+        self.assertEqual(len(self.get("/transactions?limit=1")["transactions"]), 1)
+
+    def test_results_are_cached_until_a_reload(self):
+        self.index.get("/aggregates")
+        self.index.get("/aggregates")
+        self.assertEqual(self.index.query.cache_info().hits, 1)
+
+        months = dict(self.index.months)
+        write_month(self.data_dir, "SANTANDER", "2025-02", [{"date": "2025-02-02", "concept": "UBER EATS", "amount": 90.0}])
+        os.utime(os.path.join(self.data_dir, "SANTANDER_2025-02_UY$.json"), ns=(1, 1))
+        self.assertEqual(self.index.refresh(), {("SANTANDER", "UY$")})
+
+        # only the changed month was loaded again
+        for path, month in self.index.months.items():
+            self.assertEqual(month is months[path], not path.endswith("SANTANDER_2025-02_UY$.json"))
+        self.assertEqual(self.get("/aggregates?bank=SANTANDER&month=2025-02")["results"][0]["total"], 90.0)
+        self.assertEqual(self.index.refresh(), set())
+
+    def test_http(self):
+        async def request(server: QueryServer, target: str):
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+            head, _, body = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), json.loads(body)
+
+        async def run():
+            server = QueryServer(self.index, port=0, reload_interval=0)
+            await server.start()
+            async with server.server:
+                return [
+                    await request(server, "/accounts"),
+                    await request(server, "/unknown"),
+                    await request(server, "/transactions?limit=x"),
+                ]
+
+        (status, accounts), (not_found, _), (bad_request, _) = asyncio.run(run())
+        self.assertEqual(status, 200)
+        self.assertEqual([account["bank"] for account in accounts["accounts"]], ["ITAU", "SANTANDER"])
+        self.assertEqual((not_found, bad_request), (404, 400))
+
+
+if __name__ == "__main__":
+    unittest.main()
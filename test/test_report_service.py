@@ -0,0 +1,23 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_service import ReportService
+
+
+class ReportServiceTest(unittest.TestCase):
+    def test_email_text_uses_the_months_in_the_chart(self):
+        data = {"month": "Marzo 2025", "agrupations": {"UBER": 100.0, "OTHER": 5.0}}
+
+        self.assertIn("en los ultimos 6 meses de historico", ReportService("UY$", "SANTANDER").get_html_table(data))
+        report = ReportService("UY$", "SANTANDER", window=12)
+        self.assertIn("en los ultimos 12 meses de historico", report.get_html_table(data))
+        self.assertIn("en los ultimos 3 meses de historico", report.get_html_table(data, months=3))
+        self.assertIn("en el ultimo mes", report.get_html_table(data, months=1))
+        self.assertIn("en todo el historico", ReportService("UY$", "SANTANDER", window=None).get_html_table(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["matplotlib", "google.genai", "PyPDF2", "numpy", "scipy"]
+
+# `import app` measured at ~15 ms (heavy backends take ~2 s), budget leaves room for slow machines
+STARTUP_BUDGET_SECONDS = 0.25
+
+_IMPORT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = {heavy}
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in heavy if m in sys.modules]}}))
+"""
+
+
+def import_in_subprocess(module: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestStartup(unittest.TestCase):
+    def test_app_does_not_import_heavy_modules(self):
+        self.assertEqual(import_in_subprocess("app")["loaded"], [])
+
+    def test_parsers_and_report_do_not_import_heavy_modules(self):
+        for module in ("transactions_parser", "report_service", "storage"):
+            with self.subTest(module=module):
+                self.assertEqual(import_in_subprocess(module)["loaded"], [])
+
+    def test_app_startup_budget(self):
+        elapsed = min(import_in_subprocess("app")["elapsed"] for _ in range(3))
+        self.assertLess(elapsed, STARTUP_BUDGET_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import SQLiteStorage
+
+
+def transaction(concept: str, amount: float, date: str = "2025-03-01") -> dict:
+    return {"date": date, "concept": concept, "amount": amount}
+
+
+class SQLiteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "transactions.db")
+        self.storage = SQLiteStorage(self.db_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_schema_is_created(self):
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        self.assertTrue({"months", "transactions", "idx_transactions_account_month", "idx_transactions_concept"} <= names)
+        # opening an existing database keeps its data
+        self.storage.save_month("santander", "uy$", "2025-03", [transaction("UBER TRIP", 10.0)])
+        self.assertEqual(len(SQLiteStorage(self.db_path).get_transactions("SANTANDER", "UY$", "2025-03")), 1)
+
+    def test_save_month_replaces_the_month(self):
+        self.storage.save_month("SANTANDER", "UY$", "2025-02", [transaction("DEVOTO", 5.0, "2025-02-01")])
+        self.storage.save_month("SANTANDER", "UY$", "2025-03", [transaction("UBER TRIP", 10.0), transaction("DEVOTO", 20.0)])
+        self.storage.save_month("SANTANDER", "UY$", "2025-03", [transaction("FARMACIA", 7.5)])
+
+        self.assertEqual(self.storage.get_transactions("SANTANDER", "UY$", "2025-03"), [transaction("FARMACIA", 7.5)])
+        self.assertEqual(len(self.storage.get_transactions("SANTANDER", "UY$", "2025-02")), 1)
+        months = self.storage.get_months("SANTANDER", "UY$")
+        self.assertEqual([(month["month"], month["transactions_total_amount"]) for month in months],
+                         [("2025-02", 5.0), ("2025-03", 7.5)])
+        self.assertEqual([month["month"] for month in self.storage.get_months("SANTANDER", "UY$", window=1)], ["2025-03"])
+
+    def test_category_sums_use_the_categorize_function(self):
+        self.storage.save_month("SANTANDER", "UY$", "2025-02", [transaction("UBER TRIP", 1.0, "2025-02-01")])
+        self.storage.save_month("SANTANDER", "UY$", "2025-03", [
+            transaction("UBER TRIP", 10.0), transaction("UBER TRIP", 5.0),
+            transaction("UBER EATS", 2.0), transaction("DEVOTO", 20.0),
+        ])
+        calls = []
+
+        def categorize(concept: str) -> str:
+            calls.append(concept)
+            return "UBER" if concept.startswith("UBER") else "OTROS"
+
+        sums = self.storage.get_category_sums("santander", "uy$", categorize, ["UBER", "OTROS", "FARMACIA"], "2025-03")
+
+        self.assertEqual(sums, {"2025-03": {"UBER": 17.0, "OTROS": 20.0, "FARMACIA": 0.0}})
+        # called with the aggregated concepts of the selected months
+        self.assertEqual(set(calls), {"DEVOTO", "UBER EATS", "UBER TRIP"})
+
+
+if __name__ == "__main__":
+    unittest.main()
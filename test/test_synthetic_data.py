@@ -0,0 +1,43 @@
+import os
+import sys
+import json
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic_data
+from transactions_parser import ManualTransactionsParserService, AITransactionsParserService
+
+
+class SyntheticDataTest(unittest.TestCase):
+    "The generated data must parse to the same amounts, otherwise the benchmarks measure nothing"
+
+    def test_input_lines_round_trip(self):
+        rows = list(synthetic_data.generate_rows("2025-03", 500))
+        parser = ManualTransactionsParserService("SANTANDER", "UY$", "2025-03", "synthetic")
+        transactions, count = parser.parse_transactions(synthetic_data.generate_input_lines("2025-03", 500))
+
+        self.assertEqual(count, 500)
+        self.assertEqual(parser.malformed_lines, [])
+        self.assertAlmostEqual(sum(tran["amount"] for tran in transactions), sum(row["amount"] for row in rows), places=2)
+
+    def test_ai_response_round_trip(self):
+        rows = list(synthetic_data.generate_rows("2025-03", 500))
+        parser = AITransactionsParserService("SANTANDER", "UY$", "2025-03", pdf_path=None, google_ai_api_key=None)
+        json_data = parser.json_ai_text_to_transactions(synthetic_data.generate_ai_response("2025-03", 500))
+        transactions, total = parser.transform_transactions(json_data)
+
+        # the SALDO ANTERIOR row is skipped
+        self.assertEqual(len(transactions), 500)
+        self.assertAlmostEqual(total, sum(row["amount"] for row in rows), places=2)
+
+    def test_month_data_is_json(self):
+        month_data = synthetic_data.generate_month_data("santander", "uy$", "2025-03", 10)
+        self.assertEqual(json.loads(json.dumps(month_data))["bank"], "SANTANDER")
+        self.assertEqual(len(month_data["transactions"]), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
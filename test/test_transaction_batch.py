@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from month_index import MonthIndex
+from transaction_batch import TransactionBatch
+from transactions_parser import ManualTransactionsParserService
+
+TRANSACTIONS = [
+    {"date": "2025-03-27", "amount": 260.7, "concept": "UBER TRIP"},
+    {"date": "2025-03-28", "amount": -100.0, "concept": "DEVOLUCION"},
+    {"date": "2025-03-28", "amount": 12.5, "concept": "UBER TRIP"},
+]
+
+
+class TransactionBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        os.makedirs(self.data_dir)
+        self.parser = ManualTransactionsParserService("SANTANDER", "UY$", "2025-03", input_path=None)
+        self.json_path = os.path.join(self.data_dir, "SANTANDER_2025-03_UY$.json")
+        self.batch_path = os.path.join(self.data_dir, "SANTANDER_2025-03_UY$.tbatch")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def month_index(self) -> MonthIndex:
+        return MonthIndex(self.data_dir, os.path.join(self.tmp_dir.name, "month_index.json"))
+
+    def test_save_and_load_round_trip(self):
+        self.parser.save_transactions_in_batch(TRANSACTIONS, self.batch_path)
+        batch = TransactionBatch.load(self.batch_path)
+
+        self.assertEqual(batch.to_transactions(), TRANSACTIONS)
+        self.assertEqual(batch.meta["month"], "2025-03")
+        self.assertEqual(batch.meta["bank"], "SANTANDER")
+        self.assertAlmostEqual(batch.meta["transactions_total_amount"], 173.2)
+        self.assertEqual(batch.sum_by_concept(), {"UBER TRIP": 273.2, "DEVOLUCION": -100.0})
+
+    def test_new_json_replaces_an_outdated_batch(self):
+        self.parser.save_transactions_in_json(TRANSACTIONS, self.json_path)
+        self.parser.save_transactions_in_batch(TRANSACTIONS, self.batch_path)
+        self.assertEqual(self.month_index().get_month_files("SANTANDER", "UY$"), [self.batch_path])
+
+        # parsed again, without --batch-format
+        self.parser.save_transactions_in_json(TRANSACTIONS[:1], self.json_path)
+        self.assertFalse(os.path.exists(self.batch_path))
+        self.assertEqual(self.month_index().get_month_files("SANTANDER", "UY$"), [self.json_path])
+
+    def test_newest_file_of_the_month_is_indexed(self):
+        self.parser.save_transactions_in_batch(TRANSACTIONS, self.batch_path)
+        self.parser.save_transactions_in_json(TRANSACTIONS, self.json_path)
+        # a .tbatch copied from an older run
+        self.parser.save_transactions_in_batch(TRANSACTIONS, self.batch_path)
+        os.utime(self.batch_path, ns=(1, 1))
+        self.assertEqual(self.month_index().get_month_files("SANTANDER", "UY$"), [self.json_path])
+
+
+if __name__ == "__main__":
+    unittest.main()
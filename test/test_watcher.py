@@ -0,0 +1,122 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from watcher import WatchDaemon, WatchState
+
+
+class FakeProcessor:
+    def __init__(self, failures: int = 0):
+        self.processed = []
+        self.failures = failures
+
+    def process(self, statements):
+        self.processed.extend(statement.pdf_path for statement in statements)
+        if self.failures:
+            self.failures -= 1
+            return {}
+        return {(statement.bank, statement.currency): [statement.json_output_path] for statement in statements}
+
+
+class WatchDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        os.makedirs("input")
+        os.makedirs("pdfs")
+        self.changes = []
+        self.processor = FakeProcessor()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def daemon(self) -> WatchDaemon:
+        return WatchDaemon(
+            self.changes.append, processor=self.processor, state=WatchState("tmp/watch_state.json"), settle_seconds=2,
+        )
+
+    def write(self, path: str, content: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def test_files_are_processed_once_they_settle(self):
+        daemon = self.daemon()
+        self.write("input/santander_2025-03_uy$.txt", "27/03/2025 650 UBER TRIP 260,70\n")
+        self.write("pdfs/itau_2025-03.pdf", "%PDF")
+        self.write("pdfs/notes.txt", "ignored")
+
+        self.assertEqual(daemon.run_once(now=100), set())
+        self.assertEqual(daemon.run_once(now=101), set())
+        self.assertEqual(daemon.run_once(now=102), {("SANTANDER", "UY$"), ("ITAU", "UY$")})
+        self.assertTrue(os.path.exists("data/SANTANDER_2025-03_UY$.json"))
+        self.assertEqual(self.processor.processed, ["pdfs/itau_2025-03.pdf"])
+        self.assertEqual(self.changes, [{("SANTANDER", "UY$"), ("ITAU", "UY$")}])
+
+    def test_state_survives_restarts_and_only_changed_content_is_parsed(self):
+        path = "input/santander_2025-03_uy$.txt"
+        self.write(path, "27/03/2025 650 UBER TRIP 260,70\n")
+        daemon = self.daemon()
+        daemon.run_once(now=100)
+        daemon.run_once(now=102)
+
+        # restart: nothing to do
+        daemon = self.daemon()
+        daemon.run_once(now=200)
+        self.assertEqual(daemon.run_once(now=202), set())
+
+        # same content, new mtime: skipped without parsing
+        os.utime(path, (300, 300))
+        daemon.run_once(now=300)
+        self.assertEqual(daemon.run_once(now=302), set())
+
+        self.write(path, "27/03/2025 650 UBER TRIP 300,00\n")
+        daemon.run_once(now=400)
+        self.assertEqual(daemon.run_once(now=402), {("SANTANDER", "UY$")})
+        self.assertEqual(len(self.changes), 2)
+
+    def test_failed_files_are_retried_with_backoff(self):
+        self.processor.failures = 1
+        self.write("pdfs/itau_2025-03.pdf", "%PDF")
+        daemon = self.daemon()
+        daemon.run_once(now=100)
+        self.assertEqual(daemon.run_once(now=102), set())
+        self.assertEqual(self.processor.processed, ["pdfs/itau_2025-03.pdf"])
+
+        # backoff not elapsed, even after a restart
+        daemon = self.daemon()
+        self.assertEqual(daemon.run_once(now=150), set())
+        self.assertEqual(len(self.processor.processed), 1)
+
+        self.assertEqual(daemon.run_once(now=162), {("ITAU", "UY$")})
+        self.assertEqual(len(self.processor.processed), 2)
+        daemon.run_once(now=1000)
+        self.assertEqual(len(self.processor.processed), 2)
+
+    def test_touched_failed_file_is_retried_until_the_attempts_run_out(self):
+        self.processor.failures = 10
+        path = "pdfs/itau_2025-03.pdf"
+        self.write(path, "%PDF")
+        daemon = WatchDaemon(
+            self.changes.append, processor=self.processor, state=WatchState("tmp/watch_state.json", max_attempts=2),
+        )
+        daemon.run_once(now=100)
+        daemon.run_once(now=102)
+
+        # same content, but touched: parsed again right away (the sha256 shortcut is only for successful parses)
+        os.utime(path, (200, 200))
+        daemon.run_once(now=200)
+        daemon.run_once(now=202)
+        self.assertEqual(len(self.processor.processed), 2)
+
+        # gave up after max_attempts
+        daemon.run_once(now=10000)
+        self.assertEqual(len(self.processor.processed), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
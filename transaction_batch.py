@@ -0,0 +1,205 @@
+import sys
+import glob
+import json
+from array import array
+from datetime import date, datetime
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Callable
+
+import numpy as np
+
+from logger import logger
+from utils import BATCH_FILE_EXTENSION
+
+
+BATCH_FILE_MAGIC = b"TXBATCH1"
+# columns are aligned, so they can be memory-mapped without copies
+_ALIGNMENT = 64
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%d-%m-%y", "%d/%m/%y")
+
+
+@lru_cache(maxsize=4096)
+def date_to_epoch_days(str_date: str) -> int:
+    """
+    Days since 1970-01-01 for the dates used by the parsers (DD-MM-YYYY, DD/MM/YYYY or ISO).
+    Cached: the same dates repeat many times in a statement.
+    """
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(str_date, date_format).toordinal() - _EPOCH_ORDINAL
+        except ValueError:
+            continue
+    raise ValueError(f"Unknown date format: {str_date}")
+
+
+def _padding(offset: int) -> int:
+    return (-offset) % _ALIGNMENT
+
+
+class TransactionBatch:
+    """
+    Columnar transactions: dates as datetime64[D], amounts as float64 and
+    concepts dictionary-encoded as int32 codes into `concepts`.
+    `meta` keeps the month info (month, str_month, bank, currency).
+    """
+    def __init__(self, dates: np.ndarray, amounts: np.ndarray, concept_codes: np.ndarray,
+                 concepts: List[str], meta: Dict[str, Any] = None):
+        self.dates = dates
+        self.amounts = amounts
+        self.concept_codes = concept_codes
+        self.concepts = concepts
+        self.meta = meta or {}
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Dict[str, Any]], meta: Dict[str, Any] = None) -> "TransactionBatch":
+        """
+        Builds the batch from any iterable of {"date", "amount", "concept"} dicts (ex: a parser generator),
+        without materializing the dicts.
+        """
+        days = array("q")
+        amounts = array("d")
+        codes = array("i")
+        concept_codes: Dict[str, int] = {}
+
+        for transaction in transactions:
+            concept = transaction["concept"]
+            code = concept_codes.get(concept)
+            if code is None:
+                code = concept_codes[concept] = len(concept_codes)
+            days.append(date_to_epoch_days(transaction["date"]))
+            amounts.append(transaction["amount"])
+            codes.append(code)
+
+        return cls(
+            dates=np.frombuffer(days, dtype=np.int64).view("datetime64[D]"),
+            amounts=np.frombuffer(amounts, dtype=np.float64),
+            concept_codes=np.frombuffer(codes, dtype=np.int32),
+            concepts=list(concept_codes),
+            meta=meta,
+        )
+
+    def to_transactions(self) -> List[Dict[str, Any]]:
+        dates = np.datetime_as_string(self.dates, unit="D")
+        return [
+            {"date": str(dates[i]), "amount": float(self.amounts[i]), "concept": self.concepts[self.concept_codes[i]]}
+            for i in range(len(self))
+        ]
+
+    @property
+    def total_amount(self) -> float:
+        return float(self.amounts.sum())
+
+    def sum_by_concept(self) -> Dict[str, float]:
+        sums = np.bincount(self.concept_codes, weights=self.amounts, minlength=len(self.concepts))
+        return dict(zip(self.concepts, sums.tolist()))
+
+    def sum_by_category(self, categorize: Callable[[str], str], categories: List[str]) -> Dict[str, float]:
+        """
+        Categorizes each distinct concept once, then sums all the amounts with a single bincount.
+        """
+        category_index = {category: i for i, category in enumerate(categories)}
+        concept_to_category = np.array(
+            [category_index[categorize(concept)] for concept in self.concepts], dtype=np.int32
+        )
+        if not len(concept_to_category):
+            return {category: 0.0 for category in categories}
+
+        sums = np.bincount(
+            concept_to_category[self.concept_codes], weights=self.amounts, minlength=len(categories)
+        )
+        return dict(zip(categories, sums.tolist()))
+
+    def save(self, path: str):
+        """
+        Binary format: magic, header length (uint64), json header, and the
+        dates/amounts/codes columns, each one aligned to 64 bytes.
+        """
+        header = json.dumps({"meta": self.meta, "concepts": self.concepts, "count": len(self)}).encode("utf-8")
+        columns = [
+            np.ascontiguousarray(self.dates.view(np.int64)),
+            np.ascontiguousarray(self.amounts, dtype=np.float64),
+            np.ascontiguousarray(self.concept_codes, dtype=np.int32),
+        ]
+
+        with open(path, "wb") as f:
+            f.write(BATCH_FILE_MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            offset = len(BATCH_FILE_MAGIC) + 8 + len(header)
+            for column in columns:
+                f.write(b"\0" * _padding(offset))
+                offset += _padding(offset)
+                f.write(column.tobytes())
+                offset += column.nbytes
+        logger.info("Batch saved in: %s", path)
+
+    @classmethod
+    def _from_buffer(cls, buffer) -> "TransactionBatch":
+        if bytes(buffer[:len(BATCH_FILE_MAGIC)]) != BATCH_FILE_MAGIC:
+            raise ValueError("Not a transactions batch file")
+
+        header_start = len(BATCH_FILE_MAGIC) + 8
+        header_length = int(np.frombuffer(buffer, dtype=np.uint64, count=1, offset=len(BATCH_FILE_MAGIC))[0])
+        header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+        count = header["count"]
+
+        offset = header_start + header_length
+        columns = []
+        for dtype in (np.int64, np.float64, np.int32):
+            offset += _padding(offset)
+            columns.append(np.frombuffer(buffer, dtype=dtype, count=count, offset=offset))
+            offset += count * np.dtype(dtype).itemsize
+
+        return cls(
+            dates=columns[0].view("datetime64[D]"),
+            amounts=columns[1],
+            concept_codes=columns[2],
+            concepts=header["concepts"],
+            meta=header["meta"],
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "TransactionBatch":
+        """
+        Memory-maps the file: the columns are read lazily by the OS, nothing is decoded.
+        """
+        return cls._from_buffer(np.memmap(path, dtype=np.uint8, mode="r"))
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> "TransactionBatch":
+        return cls._from_buffer(content)
+
+
+def load_month_content(path: str, content: bytes) -> Dict[str, Any]:
+    """
+    Decodes a month file (json or batch) in the format used by ReportService:
+    the json month data, or the batch meta plus the batch in the "batch" key.
+    """
+    if path.endswith(BATCH_FILE_EXTENSION):
+        batch = TransactionBatch.from_bytes(content)
+        return {**batch.meta, "batch": batch}
+    return json.loads(content)
+
+
+def convert_json_file(json_path: str) -> str:
+    with open(json_path, "r", encoding="utf-8") as f:
+        month_data = json.load(f)
+
+    transactions = month_data.pop("transactions")
+    batch = TransactionBatch.from_transactions(transactions, meta=month_data)
+    batch_path = json_path[:-len(".json")] + BATCH_FILE_EXTENSION
+    batch.save(batch_path)
+    return batch_path
+
+
+if __name__ == "__main__":
+    # python transaction_batch.py [data/*.json ...] -> writes data/*.tbatch
+    for path in sys.argv[1:] or sorted(glob.glob("data/*.json")):
+        try:
+            convert_json_file(path)
+        except Exception as error:
+            logger.error("Error convirtiendo %s:%s", path, str(error))
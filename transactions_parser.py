@@ -1,17 +1,178 @@
 import os
+import io
 import sys
 import re
 import json
-from typing import List, Dict, Tuple, Any
-import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Any, Iterable, Iterator, TYPE_CHECKING
 from abc import ABC, abstractmethod
 
-from PyPDF2 import PdfReader, PdfWriter
-from google import genai
-
 from logger import logger
+from ai_cache import AIResponseCache
+from rate_limiter import RateLimiter
+from bank_templates import get_bank_template
+from storage import SQLiteStorage
+from metrics import metrics
+from json_stream import JSONArrayStream, iter_json_array
+from gemini_session import GeminiSession, get_session
+from normalization import Normalizer
 import utils
 
+# PyPDF2, google-genai and numpy are imported where they are used, so the
+# manual parser and the CLI don't pay their import time
+if TYPE_CHECKING:
+    from PyPDF2 import PdfReader
+    from transaction_batch import TransactionBatch
+
+
+# TODO : migrar prompt a inglés (??)
+AI_PROMPT = """
+    El PDF proporcionado es un estado de cuenta mensual de mi tarjeta de crédito enviado por el banco.
+    Analiza este documento para extraer la siguiente información de la tabla de movimientos de la tarjeta de crédito:
+
+    Para cada transacción, necesito:
+    - "date": La fecha de la transacción en formato "DD/MM/AAAA".
+    - "concept": La descripción completa de la operación.
+    - "amount": El valor numérico exacto del monto de la transacción, incluyendo su signo (negativo para cargos/débitos, positivo para pagos/créditos).
+
+    **Instrucciones Cruciales para el "amount" (Monto):**
+    Asegúrate de que el monto refleje el signo CORRECTO según la naturaleza de la transacción en el estado de cuenta.
+    - Si una transacción claramente representa un **gasto o débito** (ej. compras, retiros), el "amount" debe ser **POSITIVO**.
+    - Si una transacción claramente representa un **pago o crédito** (ej. pagos a la tarjeta, devoluciones), el "amount" debe ser **NEGATIVO**.
+    - Presta atención a las columnas separadas de débitos y créditos si existen, o a cualquier indicación visual de signo.
+
+    **Reglas de Extracción CRÍTICAS:**
+    1.  **Manejo ESPECÍFICO de "SEGURO SALDO DEUDOR":**
+        * Para la transacción con el concepto "SEGURO SALDO DEUDOR", asegúrate EXPRESAMENTE de que el "amount" sea el **valor numérico directamente asociado a este concepto en la columna de montos del PDF**.
+        * Este valor SIEMPRE es un **cargo** y, por lo tanto, debe ser extraído como un **valor positivo** (por ejemplo, "62,52" si es un cargo de esa cantidad) si en el PDF no aparece el signo. **No uses fechas ni otros datos como monto para este concepto.**
+
+    **Formato de Salida:**
+    Devuélveme la información ESTRICTAMENTE en formato JSON. El JSON debe contener una lista de objetos de transacción.
+
+    **Esquema del JSON:**
+    ```json
+    [
+        {
+            "date": "DD/MM/AAAA",
+            "concept": "string",
+            "amount": "string"
+        }
+    ]
+    """
+
+AI_MODEL = "gemini-2.0-flash"
+
+# schema-constrained output: the model answers a plain JSON array of these rows
+AI_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "date": {"type": "STRING"},
+            "concept": {"type": "STRING"},
+            "amount": {"type": "STRING"},
+        },
+        "required": ["date", "concept", "amount"],
+        "property_ordering": ["date", "concept", "amount"],
+    },
+}
+
+# rows of the statement that are not transactions (balances, payments)
+SKIP_CONCEPT_KEYWORDS = [
+    "SALDO ANTERIOR",
+    "LEY INCL FINANC",
+    "PAGOS",
+    "SALDO CONTADO",
+    "TOTAL DEV LEY 19210",
+]
+
+
+def load_pdf_reader(pdf_path: str, pdf_password: str = None) -> Tuple["PdfReader", bytes]:
+    """
+    Reads the PDF file once into memory and returns the (decrypted) reader
+    together with the raw file content.
+    """
+    from PyPDF2 import PdfReader
+
+    with open(pdf_path, "rb") as pdf_file:
+        content = pdf_file.read()
+
+    reader = PdfReader(io.BytesIO(content))
+    if reader.is_encrypted:
+        reader.decrypt(pdf_password)
+    return reader, content
+
+
+def decrypt_reader(reader: "PdfReader", content: bytes) -> bytes:
+    if not reader.is_encrypted:
+        logger.info("PDF is not encrypted")
+        return content
+
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def decrypt_pdf_file(pdf_path: str, pdf_password: str = None) -> bytes:
+    """
+    Returns the decrypted content of the PDF, without touching the disk.
+    Module level function, so it can run in a process pool.
+    """
+    reader, content = load_pdf_reader(pdf_path, pdf_password)
+    return decrypt_reader(reader, content)
+
+
+def split_pdf_pages(pdf_content: bytes, pages_per_chunk: int) -> List[bytes]:
+    """
+    Splits a decrypted PDF into documents of `pages_per_chunk` pages, in page order.
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(pdf_content))
+    if len(reader.pages) <= pages_per_chunk:
+        return [pdf_content]
+
+    chunks = []
+    for start in range(0, len(reader.pages), pages_per_chunk):
+        writer = PdfWriter()
+        for page in reader.pages[start:start + pages_per_chunk]:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        chunks.append(buffer.getvalue())
+    return chunks
+
+
+def _row_key(row: Dict[str, Any]) -> Tuple[str, str, str]:
+    return str(row.get("date")).strip(), " ".join(str(row.get("concept")).split()), str(row.get("amount")).strip()
+
+
+def merge_chunk_rows(chunks_rows: List[List[Dict[str, Any]]], boundary_rows: int = 0) -> List[Dict[str, Any]]:
+    """
+    Concatenates the rows of each chunk in page order.
+    The chunks are separate documents, so identical rows on both sides of a page break are
+    real repeated charges and are kept. Opt-in (`boundary_rows` > 0): when up to `boundary_rows`
+    first rows of a chunk repeat the last rows of the previous one, they are dropped as re-extractions.
+    """
+    merged: List[Dict[str, Any]] = []
+    for rows in chunks_rows:
+        overlap = 0
+        for size in range(min(boundary_rows, len(merged), len(rows)), 0, -1):
+            if [_row_key(row) for row in merged[-size:]] == [_row_key(row) for row in rows[:size]]:
+                overlap = size
+                break
+        if overlap:
+            logger.info("Skipping %s duplicated rows at chunk boundary", overlap)
+        merged.extend(rows[overlap:])
+    return merged
+
 
 class TransactionsParser(ABC):
     def __init__(self, bank_name: str, currency: str, month: str):
@@ -33,14 +194,44 @@ class TransactionsParser(ABC):
             "transactions": transactions,
         }, indent=2)
 
-        os.makedirs("data", exist_ok=True)
+        os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
 
-        with open(json_path, "w", encoding="utf-8") as f:
-            f.write(json_str)
+        with metrics.span("parser.save_json", items=len(transactions), size=len(json_str)):
+            with open(json_path, "w", encoding="utf-8") as f:
+                f.write(json_str)
         logger.info("File saved in: %s", json_path)
 
+        # a columnar copy of the previous parse would be read instead of this file
+        batch_path = os.path.splitext(json_path)[0] + utils.BATCH_FILE_EXTENSION
+        if os.path.exists(batch_path):
+            os.remove(batch_path)
+            logger.info("Removed outdated %s", batch_path)
+
+    def to_transaction_batch(self, transactions: Iterable[Dict[str, Any]]) -> "TransactionBatch":
+        from transaction_batch import TransactionBatch
+
+        return TransactionBatch.from_transactions(transactions, meta={
+            "month": self.month.upper(),
+            "str_month": utils.month_str_to_month_name(self.month),
+            "bank": self.bank_name.upper(),
+            "currency": self.currency.upper(),
+        })
+
+    def save_transactions_in_batch(self, transactions: Iterable[Dict[str, Any]], batch_path: str):
+        batch = self.to_transaction_batch(transactions)
+        batch.meta["transactions_total_amount"] = batch.total_amount
+        os.makedirs(os.path.dirname(batch_path) or ".", exist_ok=True)
+        batch.save(batch_path)
+
+    def save_transactions(self, transactions, path_file_save_json: str = None, storage: SQLiteStorage = None):
+        if path_file_save_json:
+            self.save_transactions_in_json(transactions, path_file_save_json)
+        if storage:
+            with metrics.span("parser.save_storage", items=len(transactions)):
+                storage.save_month(self.bank_name, self.currency, self.month, transactions)
+
     @abstractmethod
-    def get_transactions(self, path_file_save_json: str = None) -> Tuple[List[Dict[str, Any]], int]:
+    def get_transactions(self, path_file_save_json: str = None, storage: SQLiteStorage = None) -> Tuple[List[Dict[str, Any]], int]:
         """
         Returns a tuple of transactions (List) and total transactions (int)
         """
@@ -49,145 +240,342 @@ class TransactionsParser(ABC):
 
 class AITransactionsParserService(TransactionsParser):
     "Implements GeminiAI for parse transactions data"
-    def __init__(self, bank_name: str, currency: str, month: str, pdf_path: str, google_ai_api_key: str, pdf_password: str = None):
+    def __init__(self, bank_name: str, currency: str, month: str, pdf_path: str, google_ai_api_key: str, pdf_password: str = None,
+                 cache: AIResponseCache = None, refresh_cache: bool = False, rate_limiter: RateLimiter = None,
+                 pdf_data: bytes = None, pages_per_chunk: int = None, chunk_workers: int = 4, chunk_retries: int = 2,
+                 chunk_boundary_rows: int = 0,
+                 session: GeminiSession = None):
         self.bank_name = bank_name
         self.currency = currency
         self.month = month
         self.pdf_path = pdf_path
         self.google_ai_api_key = google_ai_api_key
         self.pdf_password = pdf_password
-
-    def decrypt_pdf(self) -> str:
-        with open(self.pdf_path, "rb") as pdf_file:
-            reader = PdfReader(pdf_file)
-
-            if reader.is_encrypted:
-                reader.decrypt(self.pdf_password)
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.rate_limiter = rate_limiter
+        # shared client and uploads, the process-wide session by default
+        self.session = session
+        # chunked mode: long statements are sent in page ranges, extracted concurrently
+        self.pages_per_chunk = pages_per_chunk
+        self.chunk_workers = chunk_workers
+        self.chunk_retries = chunk_retries
+        self.chunk_boundary_rows = chunk_boundary_rows
+        self.normalizer = Normalizer.for_bank(bank_name, SKIP_CONCEPT_KEYWORDS)
+        # (text, reason) of the items/rows that could not be parsed
+        self.quarantined: List[Tuple[str, str]] = []
+        # already decrypted content (ex: decrypted in a process pool by the batch mode)
+        self._decrypted_pdf: bytes = pdf_data
+        self._pdf_reader: "PdfReader" = None
+        self._pdf_content: bytes = None
+
+    def get_pdf_reader(self) -> "PdfReader":
+        if self._pdf_reader is None:
+            if self._decrypted_pdf is not None:
+                from PyPDF2 import PdfReader
+
+                self._pdf_content = self._decrypted_pdf
+                self._pdf_reader = PdfReader(io.BytesIO(self._decrypted_pdf))
             else:
-                logger.info("PDF is not encrypted")
-                return self.pdf_path
+                self._pdf_reader, self._pdf_content = load_pdf_reader(self.pdf_path, self.pdf_password)
+        return self._pdf_reader
+
+    def decrypt_pdf(self) -> bytes:
+        if self._decrypted_pdf is None:
+            with metrics.span("parser.decrypt") as span:
+                reader = self.get_pdf_reader()
+                self._decrypted_pdf = decrypt_reader(reader, self._pdf_content)
+                span.bytes = len(self._decrypted_pdf)
+        return self._decrypted_pdf
+
+    def _wait_rate_limit(self):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+    def get_session(self) -> GeminiSession:
+        return self.session or get_session(self.google_ai_api_key)
+
+    def get_generation_config(self):
+        from google.genai import types
+
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=AI_RESPONSE_SCHEMA,
+            temperature=0,
+        )
 
-            temp_pdf_file = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
-            temp_pdf_path = temp_pdf_file.name
-            temp_pdf_file.close()
+    def stream_pdf_data_with_ai(self, pdf_content: bytes = None) -> Iterator[str]:
+        """
+        Yields the text chunks of the response while the model generates it.
+        The output is constrained to AI_RESPONSE_SCHEMA (a plain JSON array, no Markdown).
+        """
+        pdf_content = pdf_content or self.decrypt_pdf()
+
+        session = self.get_session()
+        uploaded_file = session.upload(pdf_content, "application/pdf", before_upload=self._wait_rate_limit)
+
+        self._wait_rate_limit()
+        with metrics.span("ai.generate") as span:
+            received = 0
+            for chunk in session.client.models.generate_content_stream(
+                contents=[
+                    uploaded_file,
+                    {"text": AI_PROMPT}
+                ],
+                model=AI_MODEL,
+                config=self.get_generation_config(),
+            ):
+                if chunk.text:
+                    received += len(chunk.text)
+                    span.bytes = received
+                    yield chunk.text
+
+    def get_pdf_data_with_ai(self, pdf_content: bytes = None) -> str:
+        return "".join(self.stream_pdf_data_with_ai(pdf_content))
+
+    def iter_ai_rows(self, pdf_content: bytes = None, response_parts: List[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields each row as soon as the model finishes writing it.
+        The response text is appended to `response_parts`, malformed items go to `self.quarantined`.
+        """
+        stream = JSONArrayStream()
+        for text in self.stream_pdf_data_with_ai(pdf_content):
+            if response_parts is not None:
+                response_parts.append(text)
+            yield from stream.feed(text)
+        stream.close()
+        self.quarantined.extend(stream.malformed)
+
+    def _extract_chunk(self, index: int, chunk: bytes) -> List[Dict[str, Any]]:
+        """
+        Extracts the rows of one page range. Only this chunk is retried when it fails.
+        """
+        for attempt in range(self.chunk_retries + 1):
+            try:
+                with metrics.span("ai.chunk", size=len(chunk)) as span:
+                    rows = self.json_ai_text_to_transactions(self.get_pdf_data_with_ai(chunk))
+                    span.items = len(rows)
+                return rows
+            except Exception as error:
+                if attempt == self.chunk_retries:
+                    raise
+                logger.warning("Error en chunk %s (intento %s): %s", index, attempt + 1, str(error))
+                time.sleep(2 ** attempt)
+
+    def get_chunked_rows(self, chunks: List[bytes]) -> List[Dict[str, Any]]:
+        with ThreadPoolExecutor(max_workers=min(self.chunk_workers, len(chunks))) as executor:
+            chunks_rows = list(executor.map(self._extract_chunk, range(len(chunks)), chunks))
+        return merge_chunk_rows(chunks_rows, self.chunk_boundary_rows)
+
+    def _get_chunks(self, pdf_content: bytes) -> List[bytes]:
+        if not self.pages_per_chunk:
+            return [pdf_content]
+        chunks = split_pdf_pages(pdf_content, self.pages_per_chunk)
+        if len(chunks) > 1:
+            logger.info("Extracting %s in %s chunks of %s pages", self.pdf_path, len(chunks), self.pages_per_chunk)
+        return chunks
+
+    def iter_extracted_rows(self, pdf_content: bytes, response_parts: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the rows extracted by the AI: as the model writes them, or the merged rows in chunked mode.
+        The raw response text (the merged rows as json in chunked mode) is appended to `response_parts`.
+        """
+        chunks = self._get_chunks(pdf_content)
+        if len(chunks) > 1:
+            rows = self.get_chunked_rows(chunks)
+            response_parts.append(json.dumps(rows, ensure_ascii=False))
+            yield from rows
+        else:
+            yield from self.iter_ai_rows(pdf_content, response_parts)
+
+    def get_ai_rows(self, pdf_content: bytes = None) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Returns the rows extracted by the AI and the raw response text.
+        """
+        response_parts = []
+        rows = list(self.iter_extracted_rows(pdf_content or self.decrypt_pdf(), response_parts))
+        return rows, "".join(response_parts)
 
-            writer = PdfWriter()
-            for page in reader.pages:
-                writer.add_page(page)
+    def json_ai_text_to_transactions(self, json_text: str) -> List[Dict[str, Any]]:
+        """
+        Converts the IA response (str) to Python List.
+        If the text is not valid json, the valid items are kept and the rest is quarantined.
+        """
+        with metrics.span("parser.json_parse", size=len(json_text)) as span:
+            json_text = json_text.replace("```json", "").replace("```", "")
+            try:
+                transactions = json.loads(json_text)
+            except ValueError:
+                stream = JSONArrayStream()
+                transactions = list(iter_json_array([json_text], stream))
+                self.quarantined.extend(stream.malformed)
+            span.items = len(transactions)
+        return transactions
+
+    def iter_transform_transactions(self, transactions: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the rows converted to transactions, skipping the balance/payment rows.
+        Rows that can't be converted are quarantined.
+        """
+        rejected = []
+        for transaction in self.normalizer.iter_normalize(transactions, rejected):
+            if rejected:
+                self._quarantine_rows(rejected)
+            yield transaction
+        self._quarantine_rows(rejected)
+
+    def _quarantine_rows(self, rejected: List[Tuple[Dict[str, Any], str]]):
+        for row, error in rejected:
+            logger.warning("Fila descartada (%s): %r", error, row)
+            self.quarantined.append((json.dumps(row, ensure_ascii=False, default=str), error))
+        rejected.clear()
+
+    @metrics.timed("parser.transform", count=lambda result: len(result[0]))
+    def transform_transactions(self, transactions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        data = list(self.iter_transform_transactions(transactions))
+        return data, sum(transaction["amount"] for transaction in data)
 
-            with open(temp_pdf_path, "wb") as f:
-                writer.write(f)
+    def stream_transactions(self, pdf_content: bytes, storage: SQLiteStorage = None) -> Tuple[List[Dict[str, Any]], int, str]:
+        """
+        Pipeline: rows are transformed and staged in the storage while the model is still generating.
+        `save_month_stream` stages them in a temp table and only takes the write lock to replace
+        the month once the response is complete.
+        Returns the transactions, the total and the response text.
+        """
+        response_parts = []
+        transactions = []
 
-            return temp_pdf_path
+        def collect(rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+            for transaction in rows:
+                transactions.append(transaction)
+                yield transaction
 
-    def get_pdf_data_with_ai(self) -> str:
-        self.pdf_path = self.decrypt_pdf()
+        rows = self.iter_transform_transactions(self.iter_extracted_rows(pdf_content, response_parts))
+        if storage:
+            with metrics.span("parser.save_storage") as span:
+                span.items = storage.save_month_stream(self.bank_name, self.currency, self.month, collect(rows))
+        else:
+            transactions.extend(rows)
 
-        client = genai.Client(api_key=self.google_ai_api_key)
-        uploaded_file = client.files.upload(
-            file=self.pdf_path,
-        )
+        return transactions, sum(transaction["amount"] for transaction in transactions), "".join(response_parts)
 
-        # TODO : migrar prompt a inglés (??)
-        prompt = """
-        El PDF proporcionado es un estado de cuenta mensual de mi tarjeta de crédito enviado por el banco.
-        Analiza este documento para extraer la siguiente información de la tabla de movimientos de la tarjeta de crédito:
-
-        Para cada transacción, necesito:
-        - "date": La fecha de la transacción en formato "DD/MM/AAAA".
-        - "concept": La descripción completa de la operación.
-        - "amount": El valor numérico exacto del monto de la transacción, incluyendo su signo (negativo para cargos/débitos, positivo para pagos/créditos).
-
-        **Instrucciones Cruciales para el "amount" (Monto):**
-        Asegúrate de que el monto refleje el signo CORRECTO según la naturaleza de la transacción en el estado de cuenta.
-        - Si una transacción claramente representa un **gasto o débito** (ej. compras, retiros), el "amount" debe ser **POSITIVO**.
-        - Si una transacción claramente representa un **pago o crédito** (ej. pagos a la tarjeta, devoluciones), el "amount" debe ser **NEGATIVO**.
-        - Presta atención a las columnas separadas de débitos y créditos si existen, o a cualquier indicación visual de signo.
-
-        **Reglas de Extracción CRÍTICAS:**
-        1.  **Manejo ESPECÍFICO de "SEGURO SALDO DEUDOR":**
-            * Para la transacción con el concepto "SEGURO SALDO DEUDOR", asegúrate EXPRESAMENTE de que el "amount" sea el **valor numérico directamente asociado a este concepto en la columna de montos del PDF**.
-            * Este valor SIEMPRE es un **cargo** y, por lo tanto, debe ser extraído como un **valor positivo** (por ejemplo, "62,52" si es un cargo de esa cantidad) si en el PDF no aparece el signo. **No uses fechas ni otros datos como monto para este concepto.**
-
-        **Formato de Salida:**
-        Devuélveme la información ESTRICTAMENTE en formato JSON. El JSON debe contener una lista de objetos de transacción.
-
-        **Esquema del JSON:**
-        ```json
-        [
-            {
-                "date": "DD/MM/AAAA",
-                "concept": "string",
-                "amount": "string"
-            }
-        ]
+    def save_quarantine(self, path: str = None) -> str:
         """
-        response = client.models.generate_content(
-            contents=[
-                uploaded_file,
-                {"text": prompt}
-            ],
-            model="gemini-2.0-flash",
-            # generation_config=genai.types.GenerationConfig(
-            #     response_mime_type="application/json",
-            #     temperature=0.0 # Añade esto para reducir la aleatoriedad
-            # )
-        )
-        # logger.info("AI Response:")
-        # print(response.text)
-        return response.text
+        Writes the quarantined items (if any) for manual review, returns the file path.
+        """
+        if not self.quarantined:
+            return None
+        path = path or f"tmp/quarantine/{self.bank_name}_{self.month}_{self.currency}.json"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"text": text, "reason": reason} for text, reason in self.quarantined], f, indent=2, ensure_ascii=False)
+        logger.warning("%s items en cuarentena: %s", len(self.quarantined), path)
+        return path
+
+    def get_transactions(self, path_file_save_json: str = None, storage: SQLiteStorage = None) -> Tuple[List[Dict[str, Any]], int]:
+        pdf_content = self.decrypt_pdf()
+        cache_key = AIResponseCache.build_key(pdf_content, AI_PROMPT + json.dumps(AI_RESPONSE_SCHEMA), AI_MODEL)
+
+        entry = self.cache.get(cache_key) if self.cache and not self.refresh_cache else None
+        if entry:
+            transactions, total = self.transform_transactions(self.json_ai_text_to_transactions(entry["response_text"]))
+            self.save_transactions(transactions, path_file_save_json, storage)
+            self.save_quarantine()
+            return transactions, total
+
+        transactions, total, ai_response_text = self.stream_transactions(pdf_content, storage)
+        # the storage was already written by the pipeline
+        self.save_transactions(transactions, path_file_save_json)
+
+        if self.cache:
+            self.cache.set(cache_key, ai_response_text)
+        self.save_quarantine()
+        return transactions, total
 
-    def json_ai_text_to_transactions(self, json_text: str) -> List[Dict[str, Any]]:
+
+class TemplateTransactionsParserService(AITransactionsParserService):
+    """
+    Extracts the PDF text locally and matches it against the bank layout template.
+    Gemini is only used as a fallback, when the bank has no template or the
+    extracted rows don't add up to the statement balance.
+    """
+    BALANCE_TOLERANCE = 0.01
+
+    def __init__(self, bank_name: str, currency: str, month: str, pdf_path: str, pdf_password: str = None,
+                 google_ai_api_key: str = None, **ai_kwargs):
+        super().__init__(bank_name, currency, month, pdf_path, google_ai_api_key, pdf_password, **ai_kwargs)
+        self.template = get_bank_template(bank_name)
+
+    def _amount_to_float(self, amount: str) -> float:
+        return self.normalizer.parse_amount(amount)
+
+    @metrics.timed("parser.extract_rows", count=lambda result: len(result[0]))
+    def extract_rows(self) -> Tuple[List[Dict[str, Any]], float, float]:
         """
-        Converts the IA response (str) to Python List.
+        Returns the table rows (same shape as the AI response), the opening and the closing balance.
+        """
+        rows = []
+        opening_balance = None
+        closing_balance = None
+
+        for page in self.get_pdf_reader().pages:
+            for line in page.extract_text().splitlines():
+                opening = self.template.opening_pattern.search(line)
+                if opening:
+                    opening_balance = self._amount_to_float(opening["amount"])
+                    continue
+
+                closing = self.template.closing_pattern.search(line)
+                if closing:
+                    closing_balance = self._amount_to_float(closing["amount"])
+                    continue
+
+                row = self.template.row_pattern.match(line)
+                if row:
+                    rows.append({
+                        "date": row["date"],
+                        "concept": " ".join(row["concept"].split()),
+                        "amount": row["amount"],
+                    })
+
+        return rows, opening_balance, closing_balance
+
+    def is_valid_extraction(self, rows: List[Dict[str, Any]], opening_balance: float, closing_balance: float) -> bool:
+        if not rows or opening_balance is None or closing_balance is None:
+            return False
+
+        total = opening_balance + sum(self._amount_to_float(row["amount"]) for row in rows)
+        return abs(total - closing_balance) <= self.BALANCE_TOLERANCE
+
+    def get_local_transactions(self) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Returns None when the statement can't be parsed with the local template.
         """
-        json_text = json_text.replace("```json", "").replace("```", "")
-        return json.loads(json_text)
+        if not self.template:
+            logger.info("No template for bank %s", self.bank_name)
+            return None
+
+        rows, opening_balance, closing_balance = self.extract_rows()
+        if not self.is_valid_extraction(rows, opening_balance, closing_balance):
+            logger.warning(
+                "Template extraction doesn't match the statement balance (%s rows, opening: %s, closing: %s)",
+                len(rows), opening_balance, closing_balance
+            )
+            return None
 
-    def transform_transactions(self, transactions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
-        data = []
-        keywords_skip = [
-            "SALDO ANTERIOR",
-            "LEY INCL FINANC",
-            "PAGOS",
-            "SALDO CONTADO",
-            "TOTAL DEV LEY 19210",
-        ]
-        skip_concept_patters = re.compile("|".join(re.escape(word) for word in keywords_skip))
-        total_amount = 0
-
-        for trans in transactions:
-            concept = trans["concept"]
-            if not skip_concept_patters.search(concept):
-                str_date: str = trans["date"]
-                amount: str = trans["amount"]
-
-                if amount[-1] == "-":
-                    amount = amount.replace("-", "")
-                    amount = "-" + amount
-
-                if "," in amount:
-                    amount = float(amount.replace(".", "").replace(",", "."))
-                else:
-                    amount = float(amount)
-
-                data.append({
-                    "date": str_date.replace("/", "-"),
-                    "amount": amount,
-                    "concept": concept,
-                })
-                total_amount += amount
-
-        return data, total_amount
-
-    def get_transactions(self, path_file_save_json: str = None) -> Tuple[List[Dict[str, Any]], int]:
-        ai_response_text = self.get_pdf_data_with_ai()
-        json_data = self.json_ai_text_to_transactions(ai_response_text)
-        transactions, total = self.transform_transactions(json_data)
+        return self.transform_transactions(rows)
 
-        if path_file_save_json:
-            self.save_transactions_in_json(transactions, path_file_save_json)
+    def get_transactions(self, path_file_save_json: str = None, storage: SQLiteStorage = None) -> Tuple[List[Dict[str, Any]], int]:
+        result = self.get_local_transactions()
+
+        if result is None:
+            if not self.google_ai_api_key:
+                raise ValueError(f"Unable to parse {self.pdf_path} locally and there is no AI fallback configured")
+            logger.info("Falling back to AI parser")
+            return super().get_transactions(path_file_save_json, storage)
 
+        transactions, total = result
+        self.save_transactions(transactions, path_file_save_json, storage)
         return transactions, total
 
 
@@ -198,48 +586,99 @@ class ManualTransactionsParserService(TransactionsParser):
         self.currency: str = currency
         self.month: str = month
         self.input_path: str = input_path
+        self.normalizer = Normalizer.for_bank(bank_name)
         # self.transactions: List[Dict[str, Any]] = None
 
-    def load_input_data(self) -> List[str]:
+    def iter_input_lines(self) -> Iterator[str]:
         with open(self.input_path, "r", encoding="utf-8") as file:
-            data = file.read()
-        return data.split("\n")
+            for line in file:
+                yield line.rstrip("\r\n")
 
-    def parse_transactions(self, data: List[str]):
-        transactions = []
-        total_amount = 0
+    def parse_line(self, line: str) -> Dict[str, Any]:
+        transaction_data = line.split(" ")
+        if len(transaction_data) < 4:
+            raise ValueError("expected: date, code, concept and amount")
+
+        return {
+            "date": self.normalizer.parse_date(transaction_data[0]),
+            "amount": self.normalizer.parse_amount(transaction_data[-1]),
+            "concept": " ".join(transaction_data[2:-1]),
+        }
+
+    def iter_transactions(self, lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the transactions line by line, dates and amounts normalized by the Normalizer.
+        Malformed lines are logged (and kept in `self.malformed_lines`) instead of stopping the import.
+        """
+        self.malformed_lines = []
+        parse_line = self.parse_line
 
-        for line in data:
+        for line_number, line in enumerate(lines, start=1):
             if not line:
                 continue
-            total_amount += 1
+            try:
+                yield parse_line(line)
+            except ValueError as error:
+                logger.warning("%s:%s malformed line (%s): %r", self.input_path, line_number, str(error), line)
+                self.malformed_lines.append((line_number, line))
+
+    @metrics.timed("parser.manual_parse", count=lambda result: result[1])
+    def parse_transactions(self, data: List[str]):
+        transactions = list(self.iter_transactions(data))
+        return transactions, len(transactions)
+
+    def get_transactions(self, path_file_save_json: str = None, storage: SQLiteStorage = None):
+        transactions, total = self.parse_transactions(self.iter_input_lines())
 
-            transaction_data = line.split(" ")
-            last_index = len(transaction_data) - 1
-            amount = transaction_data[-1]
-            if "-" in amount:
-                amount = amount.replace("-", "")
-                amount = "-" + amount
+        self.save_transactions(transactions, path_file_save_json, storage)
+        return transactions, total
+
+    def get_transaction_batch(self) -> "TransactionBatch":
+        """
+        Streams the input file straight into a columnar batch.
+        """
+        return self.to_transaction_batch(self.iter_transactions(self.iter_input_lines()))
 
-            amount = float(
-                amount.replace(".", "").replace(",", ".")
+    def import_to_storage(self, storage: SQLiteStorage, chunk_size: int = 5000) -> int:
+        """
+        Streams the input file into the storage, without keeping the transactions in memory.
+        Returns the number of imported transactions.
+        """
+        with metrics.span("parser.import_storage") as span:
+            imported = span.items = storage.save_month_stream(
+                self.bank_name, self.currency, self.month,
+                self.iter_transactions(self.iter_input_lines()),
+                chunk_size=chunk_size,
             )
+        return imported
 
-            transactions.append({
-                "date": transaction_data[0],
-                "amount": amount,
-                "concept": " ".join(transaction_data[2:last_index]),
-            })
 
-        return transactions, total_amount
+INPUT_FILENAME_PATTERN = re.compile(r"^(?P<bank>[A-Za-z0-9]+)_(?P<month>\d{4}-\d{2})_(?P<currency>[^_.]+)\.txt$")
 
-    def get_transactions(self, path_file_save_json: str = None):
-        data = self.load_input_data()
-        transactions, total = self.parse_transactions(data)
 
-        if path_file_save_json:
-            self.save_transactions_in_json(transactions, path_file_save_json)
-        return transactions, total
+def import_input_directory(input_dir: str, storage: SQLiteStorage, chunk_size: int = 5000) -> Dict[str, int]:
+    """
+    Bulk mode: imports every input/{bank}_{YYYY-MM}_{currency}.txt into the storage,
+    taking bank, month and currency from the filename.
+    Returns the number of imported transactions per file.
+    """
+    imported = {}
+
+    for filename in sorted(os.listdir(input_dir)):
+        match = INPUT_FILENAME_PATTERN.match(filename)
+        if not match:
+            logger.warning("Skipping file with unexpected name: %s", filename)
+            continue
+
+        parser = ManualTransactionsParserService(
+            bank_name=match["bank"].upper(),
+            currency=match["currency"].upper(),
+            month=match["month"],
+            input_path=os.path.join(input_dir, filename),
+        )
+        imported[filename] = parser.import_to_storage(storage, chunk_size)
+
+    return imported
 
 
 def print_transactions(transactions, total, input_path):
@@ -1,4 +1,20 @@
+import os
+import re
 from datetime import datetime
+from typing import Optional, Tuple
+
+
+BATCH_FILE_EXTENSION = ".tbatch"
+
+# data/{BANK}_{YYYY-MM}_{CURRENCY}.json (or .tbatch), as written by the parsers
+DATA_FILENAME_PATTERN = re.compile(
+    r"^(?P<bank>[^_]+)_(?P<month>\d{4}-\d{2})_(?P<currency>[^_]+)(?P<extension>\.json|\.tbatch)$"
+)
+
+
+def format_amount(value: float) -> str:
+    "1234.5 -> '1.234,50'"
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 
 def get_actual_month() -> str:
@@ -8,3 +24,13 @@ def get_actual_month() -> str:
 def month_str_to_month_name(month_str: str) -> str:
     date = datetime.strptime(month_str, "%Y-%m")
     return date.strftime("%B, %Y")
+
+
+def parse_data_filename(path: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Returns (bank, month, currency) of a data file, or None if the name doesn't follow the format.
+    """
+    match = DATA_FILENAME_PATTERN.match(os.path.basename(path))
+    if not match:
+        return None
+    return match["bank"], match["month"], match["currency"]
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import select
+import hashlib
+import threading
+from typing import List, Dict, Any, Callable, Set, Tuple
+
+from logger import logger
+from storage import SQLiteStorage
+from batch_processor import BatchProcessor, Statement, PDF_FILENAME_PATTERN
+from transactions_parser import ManualTransactionsParserService, INPUT_FILENAME_PATTERN
+
+
+Account = Tuple[str, str]
+
+# failed files are parsed again after 1, 2, 4... minutes, at most MAX_ATTEMPTS times
+# (touching or changing the file always retries it right away)
+RETRY_BACKOFF_SECONDS = 60
+MAX_ATTEMPTS = 5
+
+
+class PollingWatcher:
+    "Fallback watcher: just waits, the daemon rescans the folders after each wait"
+    def __init__(self, poll_interval: float = 5):
+        self.poll_interval = poll_interval
+
+    def wait(self, timeout: float) -> bool:
+        time.sleep(min(timeout, self.poll_interval))
+        return True
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux inotify through libc (no extra dependency): `wait` returns as soon as
+    a file is created, written, moved or deleted in the watched folders.
+    """
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+
+    def __init__(self, dirs: List[str]):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        for directory in dirs:
+            if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+                error = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(error, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout: float) -> bool:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        # the events are only a wake up signal, the daemon rescans the folders
+        while True:
+            try:
+                if not os.read(self.fd, 65536):
+                    break
+            except BlockingIOError:
+                break
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(dirs: List[str], poll_interval: float = 5):
+    try:
+        return InotifyWatcher(dirs)
+    except (OSError, AttributeError) as error:
+        logger.info("inotify no disponible (%s), usando polling cada %s s", str(error), poll_interval)
+        return PollingWatcher(poll_interval)
+
+
+class WatchState:
+    """
+    Processed files, persisted as json so a restart doesn't parse them again:
+    {path: {"mtime_ns", "size", "sha256", "processed_at", "error", "attempts", "retry_at"}}.
+    Files whose parse failed are not processed: they are retried with backoff, up to `max_attempts`.
+    """
+    def __init__(self, state_path: str = "tmp/watch_state.json", max_attempts: int = MAX_ATTEMPTS,
+                 retry_backoff: float = RETRY_BACKOFF_SECONDS):
+        self.state_path = state_path
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.files: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)["files"]
+        except (OSError, ValueError, KeyError) as error:
+            logger.error("Error leyendo %s:%s", self.state_path, str(error))
+            return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _get_entry(self, path: str, stat: os.stat_result) -> Dict[str, Any]:
+        "Entry of the file, only if it didn't change since it was marked"
+        entry = self.files.get(os.path.abspath(path))
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry
+        return None
+
+    def is_processed(self, path: str, stat: os.stat_result) -> bool:
+        """
+        True when the file was parsed without errors (or it failed `max_attempts` times and is not retried anymore).
+        """
+        entry = self._get_entry(path, stat)
+        return bool(entry) and (not entry.get("error") or entry.get("attempts", 1) >= self.max_attempts)
+
+    def get_retry_at(self, path: str, stat: os.stat_result) -> float:
+        "When a failed (and unchanged) file is due for a retry, None if it didn't fail"
+        entry = self._get_entry(path, stat)
+        if not entry or not entry.get("error"):
+            return None
+        return entry.get("retry_at", 0)
+
+    def get_sha256(self, path: str) -> str:
+        "sha256 of the last successful parse of the file"
+        entry = self.files.get(os.path.abspath(path))
+        return entry["sha256"] if entry and not entry.get("error") else None
+
+    def mark(self, path: str, stat: os.stat_result, sha256: str, error: str = None, now: float = None):
+        now = time.time() if now is None else now
+        attempts = 0
+        if error:
+            # failures of the same content add up, even if the file was touched in between
+            previous = self.files.get(os.path.abspath(path))
+            same_failure = previous and previous.get("error") and previous["sha256"] == sha256
+            attempts = (previous.get("attempts", 1) if same_failure else 0) + 1
+            if attempts >= self.max_attempts:
+                logger.error("%s fallo %s veces, no se reintenta hasta que cambie", path, attempts)
+
+        self.files[os.path.abspath(path)] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": sha256,
+            "processed_at": now,
+            "error": error,
+            "attempts": attempts,
+            "retry_at": now + self.retry_backoff * 2 ** (attempts - 1) if error else None,
+        }
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class WatchDaemon:
+    """
+    Long running mode: watches `pdfs_dir` and `input_dir`, parses only the new or
+    changed statements and calls `on_accounts_changed` with the (bank, currency)
+    accounts whose data changed, so only those reports are regenerated.
+    A file is processed once its size and mtime didn't change for `settle_seconds`
+    (it may still be being copied). Parsers and report modules stay loaded between files.
+    """
+    def __init__(self, on_accounts_changed: Callable[[Set[Account]], None], pdfs_dir: str = "pdfs",
+                 input_dir: str = "input", currency: str = "UY$", storage: SQLiteStorage = None,
+                 pdf_password: str = None, google_ai_api_key: str = None, processor: BatchProcessor = None,
+                 state: WatchState = None, settle_seconds: float = 2, poll_interval: float = 5):
+        self.on_accounts_changed = on_accounts_changed
+        self.pdfs_dir = pdfs_dir
+        self.input_dir = input_dir
+        self.currency = currency.upper()
+        self.storage = storage
+        self.processor = processor or BatchProcessor(
+            google_ai_api_key=google_ai_api_key, pdf_password=pdf_password, storage=storage,
+        )
+        self.state = state or WatchState()
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        # path -> ((mtime_ns, size), first time seen with that signature)
+        self._pending: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        self._stop = threading.Event()
+
+    def _iter_candidates(self):
+        for directory, pattern in ((self.pdfs_dir, PDF_FILENAME_PATTERN), (self.input_dir, INPUT_FILENAME_PATTERN)):
+            if not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                if pattern.match(filename):
+                    yield os.path.join(directory, filename)
+
+    def get_ready_files(self, now: float = None) -> List[str]:
+        """
+        New or changed files whose size and mtime are stable for `settle_seconds`.
+        """
+        now = time.time() if now is None else now
+        ready = []
+        seen = set()
+
+        for path in self._iter_candidates():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if self.state.is_processed(path, stat):
+                continue
+            retry_at = self.state.get_retry_at(path, stat)
+            if retry_at is not None:
+                # failed before and unchanged since: already settled, only waits for the backoff
+                if now >= retry_at:
+                    ready.append(path)
+                continue
+
+            seen.add(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+                continue
+            if stat.st_size and now - pending[1] >= self.settle_seconds:
+                ready.append(path)
+
+        # files deleted before they settled
+        for path in set(self._pending) - seen:
+            del self._pending[path]
+        return ready
+
+    def _parse_input(self, path: str) -> Account:
+        match = INPUT_FILENAME_PATTERN.match(os.path.basename(path))
+        bank, currency = match["bank"].upper(), match["currency"].upper()
+        parser = ManualTransactionsParserService(bank, currency, match["month"], path)
+        parser.get_transactions(f"data/{bank}_{match['month']}_{currency}.json", self.storage)
+        return bank, currency
+
+    def process_files(self, paths: List[str], now: float = None) -> Set[Account]:
+        """
+        Parses the files and returns the accounts that changed. Files whose content
+        is the same as the last successfully processed one (ex: only touched) are skipped.
+        """
+        changed: Set[Account] = set()
+        statements: Dict[str, Tuple[Statement, os.stat_result, str]] = {}
+        to_parse = []
+
+        for path in paths:
+            self._pending.pop(path, None)
+            stat = os.stat(path)
+            sha256 = file_sha256(path)
+            if sha256 == self.state.get_sha256(path):
+                self.state.mark(path, stat, sha256, now=now)
+                continue
+            to_parse.append((path, stat, sha256))
+
+        for path, stat, sha256 in to_parse:
+            pdf_match = PDF_FILENAME_PATTERN.match(os.path.basename(path))
+            if pdf_match:
+                statement = Statement(path, pdf_match["bank"].upper(), pdf_match["month"], self.currency)
+                statements[statement.json_output_path] = (statement, stat, sha256)
+                continue
+            try:
+                changed.add(self._parse_input(path))
+                self.state.mark(path, stat, sha256, now=now)
+                logger.info("Procesado: %s", path)
+            except Exception as error:
+                logger.error("Error procesando %s: %s", path, str(error))
+                self.state.mark(path, stat, sha256, error=str(error), now=now)
+
+        if statements:
+            # decryption and AI calls of all the ready statements run concurrently
+            written = self.processor.process([statement for statement, _, _ in statements.values()])
+            written_paths = {path for paths in written.values() for path in paths}
+            changed.update(written)
+            for json_path, (statement, stat, sha256) in statements.items():
+                error = None if json_path in written_paths else "parse failed"
+                self.state.mark(statement.pdf_path, stat, sha256, error=error, now=now)
+                if not error:
+                    logger.info("Procesado: %s", statement.pdf_path)
+
+        self.state.save()
+        return changed
+
+    def run_once(self, now: float = None) -> Set[Account]:
+        ready = self.get_ready_files(now)
+        if not ready:
+            return set()
+
+        changed = self.process_files(ready, now)
+        if changed:
+            self.on_accounts_changed(changed)
+        return changed
+
+    def run(self):
+        dirs = [directory for directory in (self.pdfs_dir, self.input_dir) if os.path.isdir(directory)]
+        watcher = create_watcher(dirs, self.poll_interval)
+        logger.info("Watching %s", ", ".join(dirs))
+        try:
+            while not self._stop.is_set():
+                self.run_once()
+                # pending files are checked again once they had time to settle
+                watcher.wait(self.settle_seconds if self._pending else self.poll_interval)
+        finally:
+            watcher.close()
+
+    def stop(self):
+        self._stop.set()